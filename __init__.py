@@ -44,13 +44,12 @@ def open_settings():
     dialog.exec()
 
 def start_anki_to_notion():
-    config = mw.addonManager.getConfig(__name__)  # 获取当前插件配置
     executor = SyncExecutor()
-    executor.execute_strategy(AnkiToNotionStrategy(config))  # 传入配置参数
+    executor.execute_strategy(AnkiToNotionStrategy(config_manager))  # 传入配置管理器
 
 def start_notion_to_anki():
     executor = SyncExecutor()
-    executor.execute_strategy(NotionToAnkiStrategy())
+    executor.execute_strategy(NotionToAnkiStrategy(config_manager))  # 传入配置管理器
 
 # 插件加载时初始化
 mw.addonManager.setWebExports(__name__, r"lib/.*(css|js)")
@@ -0,0 +1,130 @@
+# HTML → Notion children 转换的微基准：对比当前实现（NotionBlockBuilder）与最初的多遍 re.sub 实现的吞吐量（MB/s）
+# 两者输出不同：最初的实现把格式改写为 markdown 风格的纯文本，当前实现输出带 annotations 的 rich_text
+#
+# 用法：
+#   python benchmarks/bench_html_converter.py                 使用内置的模拟笔记语料
+#   python benchmarks/bench_html_converter.py <目录>          使用目录下的 *.html 文件（每个文件一条笔记的 notion正文）
+#   python benchmarks/bench_html_converter.py <目录> --repeat 20
+#
+# 从 Anki 导出语料：在调试控制台中执行
+#   for nid in mw.col.find_notes("notion正文:_*"):
+#       open(f"/tmp/corpus/{nid}.html", "w", encoding="utf-8").write(mw.col.get_note(nid)["notion正文"])
+import argparse
+import glob
+import os
+import random
+import re
+import sys
+import time
+from html import unescape
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.models.parse_and_converter import ToNotionConverter, VALID_LANGUAGES
+
+
+def legacy_convert(html_content):
+    """原先的实现（逐类 re.sub、列表嵌套 finditer），仅用于对比"""
+    code_blocks = []
+
+    def code_replacer(m):
+        lang = (m.group(1) or '').replace('language-', '').lower()
+        code_blocks.append({'lang': lang, 'content': unescape(m.group(2))})
+        return f'__CODE_BLOCK_{len(code_blocks)-1}__'
+
+    html_content = re.sub(r'<pre><code(?: class="([^"]*)")?>(.*?)</code></pre>', code_replacer, html_content, flags=re.DOTALL)
+    for pattern, replacement in [
+        (r'<code>(.*?)</code>', r'`\1`'),
+        (r'<strong>(.*?)</strong>', r'**\1**'),
+        (r'<em>(.*?)</em>', r'_\1_'),
+        (r'<del>(.*?)</del>', r'~~\1~~'),
+        (r'<span[^>]*>(.*?)</span>', r'\1')
+    ]:
+        html_content = re.sub(pattern, replacement, html_content, flags=re.DOTALL)
+    html_content = re.sub(r'<ul>(.*?)</ul>',
+        lambda m: '\n'.join(f"- {x.group(1)}" for x in re.finditer(r'<li>(.*?)</li>', m.group(1), re.DOTALL)),
+        html_content, flags=re.DOTALL)
+    children = []
+    for part in re.split(r'__CODE_BLOCK_(\d+)__', html_content):
+        if part.isdigit():
+            block = code_blocks[int(part)]
+            children.append({
+                "object": "block",
+                "type": "code",
+                "code": {
+                    "rich_text": [{"type": "text", "text": {"content": block['content']}}],
+                    "language": block['lang'] if block['lang'] in VALID_LANGUAGES else "plain text"
+                }
+            })
+        elif part.strip():
+            children.append({
+                "object": "block",
+                "type": "paragraph",
+                "paragraph": {"rich_text": [{"type": "text", "text": {"content": part.strip()}}]}
+            })
+    return children
+
+
+def synthetic_corpus(count=5000, seed=0):
+    """模拟笔记正文：以普通文字为主，夹杂少量内联格式（约 8% 的词），以及列表与代码块"""
+    rng = random.Random(seed)
+    words = ["间隔重复", "retrieval", "稳定性", "difficulty", "FSRS", "复习", "card", "memory", "interval", "the", "of"]
+    inline = ["<strong>稳定性</strong>", "<em>difficulty</em>", "<code>ivl</code>",
+              "<span style=\"color: red\">due</span>", "<del>ease</del>", "&nbsp;", "<br>"]
+
+    def sentence(low, high, markup=0.0):
+        return " ".join(rng.choice(inline) if rng.random() < markup else rng.choice(words)
+                        for _ in range(rng.randint(low, high)))
+
+    corpus = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 8)):
+            kind = rng.random()
+            if kind < 0.7:
+                parts.append("<div>" + sentence(10, 120, markup=0.08) + "</div>")
+            elif kind < 0.85:
+                parts.append("<ul>" + "".join("<li>" + sentence(3, 12) + "</li>" for _ in range(rng.randint(2, 6))) + "</ul>")
+            else:
+                code = "\n".join(f"x{i} = x{i - 1} &lt; {i}" for i in range(1, rng.randint(3, 30)))
+                parts.append(f'<pre><code class="language-python">{code}</code></pre>')
+        corpus.append("".join(parts))
+    return corpus
+
+
+def measure(converters, corpus, repeat):
+    """两种实现交替各转换 repeat 遍语料，取最快一遍的吞吐量（MB/s），减小机器负载波动的影响"""
+    size = sum(len(html.encode("utf-8")) for html in corpus)
+    best = {name: float("inf") for name, _ in converters}
+    for _ in range(repeat):
+        for name, convert in converters:
+            started = time.perf_counter()
+            for html in corpus:
+                convert(html)
+            best[name] = min(best[name], time.perf_counter() - started)
+    return {name: (size / elapsed / 1e6, elapsed) for name, elapsed in best.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML → Notion children 转换吞吐量基准")
+    parser.add_argument("corpus_dir", nargs="?", help="包含 *.html 笔记正文的目录")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.corpus_dir:
+        corpus = []
+        for path in sorted(glob.glob(os.path.join(args.corpus_dir, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                corpus.append(f.read())
+    else:
+        corpus = synthetic_corpus()
+    size = sum(len(html.encode("utf-8")) for html in corpus)
+    print(f"语料: {len(corpus)} 条笔记，{size / 1e6:.2f} MB，交替重复 {args.repeat} 次")
+
+    converters = (("多遍 re.sub（原实现）", legacy_convert),
+                  ("NotionBlockBuilder", ToNotionConverter.convert_anki_html_to_notion_children))
+    for name, (throughput, elapsed) in measure(converters, corpus, args.repeat).items():
+        print(f"{name}: {throughput:.1f} MB/s（最快一遍 {elapsed:.2f} 秒）")
+
+
+if __name__ == "__main__":
+    main()
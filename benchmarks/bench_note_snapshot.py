@@ -0,0 +1,98 @@
+# 笔记快照的内存与序列化基准：对比 NoteSnapshot 与原先的载荷字典（每条笔记的字节数）
+# 两种表示取自同一批模拟笔记；牌组、笔记类型名称与字段名在两种表示中都是共享对象（与 ExtractionContext 的缓存一致）
+#
+# 用法：
+#   python benchmarks/bench_note_snapshot.py                 10000 条模拟笔记
+#   python benchmarks/bench_note_snapshot.py --notes 50000 --slice 50
+import argparse
+import os
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.models.note_snapshot import NoteSnapshot
+
+NOTE_TYPES = {
+    "Basic": ("Front", "Back"),
+    "Cloze": ("Text", "Back Extra"),
+    "Vocabulary": ("Word", "Reading", "Meaning"),
+}
+DECKS = ["新牌组::系统默认", "English::Vocabulary", "Math"]
+
+
+def synthetic_snapshots(count=10000, seed=0):
+    """模拟 BulkExtractor 的结果：三种笔记类型，一半卡片带 FSRS 参数，部分笔记带正文"""
+    rng = random.Random(seed)
+    tzinfo = datetime.now().astimezone().tzinfo
+    snapshots = []
+    for i in range(count):
+        name = rng.choice(list(NOTE_TYPES))
+        field_names = NOTE_TYPES[name]
+        has_fsrs = rng.random() < 0.5
+        snapshots.append(NoteSnapshot(
+            1700000000000 + i * 1000, 1710000000 + i, tzinfo,
+            rng.choice(DECKS), ", ".join(rng.sample(["fsrs", "math", "week1", "hard"], rng.randint(0, 2))),
+            name, field_names[0],
+            2, rng.choice([None, "2024-07-01T00:00:00"]), rng.randint(0, 50), 2.5, rng.randint(0, 300), rng.randint(0, 5), False,
+            round(rng.uniform(1, 10), 3) if has_fsrs else None,
+            round(rng.uniform(0.1, 200), 3) if has_fsrs else None,
+            round(rng.random(), 3) if has_fsrs else None,
+            field_names, tuple(f"{field} of note {i} " * rng.randint(1, 4) for field in field_names),
+            "<div>body</div>" if rng.random() < 0.3 else ""
+        ))
+    return snapshots
+
+
+def legacy_payload(snapshot) -> dict:
+    """原先 BulkExtractor 产出的载荷字典：属性在提取时就全部展开"""
+    return {
+        "note_id": snapshot.note_id,
+        "mod": snapshot.mod,
+        "properties": snapshot.properties(),
+        "body_html": snapshot.body_html
+    }
+
+
+def retained_bytes(build, items) -> int:
+    """build(item) 的结果全部保留时新分配的字节数"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(item) for item in items]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="笔记快照内存基准")
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--slice", type=int, default=50, help="投递给子进程时每批的笔记数（sync_slice_size）")
+    args = parser.parse_args()
+
+    snapshots = synthetic_snapshots(args.notes)
+    # 字段值字符串在两种表示中都与提取结果共享，不计入；快照计入自身与每条笔记的字段值元组
+    snapshot_bytes = retained_bytes(
+        lambda s: NoteSnapshot(*s.astuple()[:-2], tuple(list(s.field_values)), s.body_html), snapshots)
+    payload_bytes = retained_bytes(legacy_payload, snapshots)
+    print(f"语料: {len(snapshots)} 条笔记")
+    print(f"常驻内存（不含共享的字段值）: 快照 {snapshot_bytes / len(snapshots):,.0f} 字节/条，"
+          f"载荷字典 {payload_bytes / len(snapshots):,.0f} 字节/条")
+
+    slices = [snapshots[i:i + args.slice] for i in range(0, len(snapshots), args.slice)]
+    for name, encode in (("快照（NoteSnapshot.pack）", NoteSnapshot.pack),
+                         ("载荷字典", lambda chunk: [legacy_payload(s) for s in chunk])):
+        batches = [encode(chunk) for chunk in slices]
+        started = time.perf_counter()
+        dumped = [pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL) for batch in batches]
+        elapsed = time.perf_counter() - started
+        size = sum(len(data) for data in dumped)
+        print(f"{name}: pickle {size / len(snapshots):,.0f} 字节/条，序列化 {elapsed:.3f} 秒")
+
+
+if __name__ == "__main__":
+    main()
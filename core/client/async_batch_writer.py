@@ -0,0 +1,318 @@
+# 基于 notion_client.AsyncClient 的并发写入引擎，在有界并发窗口内同时保持多个请求在途
+import asyncio
+import json
+import traceback
+from notion_client.errors import APIErrorCode, APIResponseError
+from .retry_policy import RetryPolicy
+from .throttled_client import ThrottledAsyncClient
+
+_EXHAUSTED = object()
+
+
+def compact_result(op, **fields) -> dict:
+    """结果记录只保留笔记id和必要字段，不保留请求数据与响应，内存占用与笔记内容大小无关"""
+    return {'operation': {'note_id': op['note_id']}, **fields}
+
+
+def body_hash(content_hash):
+    """content_hash（"属性摘要:正文摘要"）中的正文摘要，未知时为 None"""
+    if not content_hash or ":" not in content_hash:
+        return None
+    return content_hash.rpartition(":")[2]
+
+
+def is_missing_page(error) -> bool:
+    """页面已在 Notion 侧删除（404）或归档（无法编辑），本地映射需要作废"""
+    if not isinstance(error, APIResponseError):
+        return False
+    if error.code == APIErrorCode.ObjectNotFound.value:
+        return True
+    return error.code == APIErrorCode.ValidationError.value and 'archived' in str(error)
+
+
+class AsyncBatchWriter:
+    """并发批量写入 Notion 数据库（固定数量的工作协程，结果按原始操作顺序返回）"""
+
+    def __init__(self, token, limiter, concurrency=3, retry_policy=None, lookup_batch_size=100):
+        self.token = token
+        self.limiter = limiter
+        self.concurrency = max(1, int(concurrency))
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.lookup_batch_size = lookup_batch_size
+        self.duplicate_index = None
+        self.page_map = None
+
+    def run(self, database_id, operations, mode, progress_callback=None, is_cancelled=None, on_result=None,
+            duplicate_index=None, page_map=None):
+        """同步入口：在当前线程中运行事件循环直至全部操作完成
+        on_result(是否成功, 结果记录) 在每条操作完成时立即调用，便于流式回传结果
+        提供 duplicate_index 时重复检查在本地完成，不再逐条查询数据库；
+        索引未经整库扫描（complete 为 False）时，操作先经过 prefetch 按批查询各自的键"""
+        self.duplicate_index = duplicate_index
+        self.page_map = page_map
+        return asyncio.run(self._run(database_id, operations, mode, progress_callback, is_cancelled, on_result))
+
+    async def _run(self, database_id, operations, mode, progress_callback, is_cancelled, on_result):
+        # 与同步客户端共享限速器，并发窗口只决定在途请求数，总速率仍受令牌桶约束
+        client = ThrottledAsyncClient(self.limiter, auth=self.token)
+        results = {}
+        key_locks = {}
+        state = {'done': 0, 'next_index': 0, 'cancelled': False}
+        if self.duplicate_index is not None and not self.duplicate_index.complete:
+            operations = self.duplicate_index.prefetch(
+                client, database_id, operations, self.lookup_batch_size, self.retry_policy
+            )
+        next_operation = self._puller(operations)
+
+        async def worker():
+            while True:
+                if is_cancelled and is_cancelled():
+                    state['cancelled'] = True
+                    return
+                op = await next_operation()
+                if op is _EXHAUSTED:
+                    return
+                index = state['next_index']
+                state['next_index'] += 1
+                results[index] = await self._write_one(client, database_id, op, mode, key_locks)
+                self._remember(database_id, op, *results[index])
+                state['done'] += 1
+                if on_result:
+                    on_result(*results[index])
+                if progress_callback:
+                    progress_callback(state['done'])
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            await client.aclose()
+            if self.page_map is not None:
+                self.page_map.flush()
+
+        success = []
+        failed = []
+        for index in sorted(results):
+            succeeded, item = results[index]
+            (success if succeeded else failed).append(item)
+        return {
+            'success': success,
+            'failed': failed,
+            'cancelled': state['cancelled'],
+            'retries': sum(item['retries'] for item in success + failed)
+        }
+
+    @staticmethod
+    def _puller(operations):
+        """返回一个协程函数，每次调用取出下一条操作，取完返回 _EXHAUSTED
+        异步生成器不允许并发 __anext__，多个工作协程之间用锁串行拉取"""
+        if hasattr(operations, '__aiter__'):
+            source = operations.__aiter__()
+            lock = asyncio.Lock()
+
+            async def next_async():
+                async with lock:
+                    try:
+                        return await source.__anext__()
+                    except StopAsyncIteration:
+                        return _EXHAUSTED
+            return next_async
+
+        source = iter(operations)
+
+        async def next_sync():
+            # 单线程事件循环中 next() 不会被并发调用
+            return next(source, _EXHAUSTED)
+        return next_sync
+
+    async def _write_one(self, client, database_id, op, mode, key_locks):
+        """处理单条操作，返回 (是否成功, 结果记录)"""
+        counter = {'retries': 0}
+        try:
+            # 已推送过的笔记：内容未变时直接跳过；否则处理映射中的页面，页面已被删除时作废映射，按新笔记处理
+            if self.page_map is not None and mode != "copy":
+                known = self.page_map.get(op['note_id'], database_id)
+                if known is not None:
+                    page_id, _, pushed_hash = known
+                    if pushed_hash is not None and pushed_hash == op.get('content_hash'):
+                        return True, compact_result(op, action='unchanged', page_id=page_id, retries=0)
+                    result = await self._write_known(client, database_id, op, mode, counter, page_id, pushed_hash)
+                    if result is not None:
+                        return True, result
+
+            # copy 模式：直接创建新页面（没有可核实的重复条件）
+            if mode == "copy":
+                return True, await self._create(client, database_id, op, counter, verify_filter=None)
+
+            # 其它模式：先进行重复检查；相同检查条件的操作共用一把锁，无人等待时即释放
+            dup_filter = op['duplicate_check']['filter']
+            key = json.dumps(dup_filter, sort_keys=True, ensure_ascii=False)
+            entry = key_locks.setdefault(key, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    return True, await self._write_checked(client, database_id, op, mode, counter, dup_filter)
+            finally:
+                entry[1] -= 1
+                if not entry[1]:
+                    del key_locks[key]
+        except Exception as e:
+            traceback.print_exc()
+            return False, compact_result(
+                op,
+                error=str(e),
+                trace=traceback.format_exc(),
+                retries=counter['retries']
+            )
+
+    async def _write_checked(self, client, database_id, op, mode, counter, dup_filter):
+        """先查找重复页面（本地索引或按条件查询），再根据模式创建、覆盖或跳过"""
+        page_id = await self._find_duplicate(client, database_id, op, counter, dup_filter)
+        # 若不存在重复，则创建新的 Notion 页面，并写回本地索引
+        if page_id is None:
+            result = await self._create(client, database_id, op, counter, verify_filter=dup_filter)
+            if self.duplicate_index is not None:
+                self.duplicate_index.add(op['duplicate_key'], result['page_id'])
+            return result
+
+        if mode == "overwrite":
+            # 覆盖：页面正文的现状未知，属性与正文都重写
+            await self._overwrite(client, op, page_id, counter)
+            return compact_result(op, action='update', page_id=page_id, retries=counter['retries'])
+        # keep 及其它未知模式：跳过更新，保持现有页面
+        return compact_result(op, action='skip', page_id=page_id, retries=counter['retries'])
+
+    async def _write_known(self, client, database_id, op, mode, counter, page_id, pushed_hash=None):
+        """更新映射中的页面；keep 模式直接跳过。页面已不存在时返回 None"""
+        if mode != "overwrite":
+            return compact_result(op, action='skip', page_id=page_id, retries=counter['retries'])
+        try:
+            await self._overwrite(client, op, page_id, counter, pushed_hash)
+        except Exception as e:
+            if not is_missing_page(e):
+                raise
+            self.page_map.forget_pages(database_id, [page_id])
+            return None
+        return compact_result(op, action='update', page_id=page_id, retries=counter['retries'])
+
+    async def _overwrite(self, client, op, page_id, counter, pushed_hash=None):
+        """覆盖页面：pages.update 只能更新属性（幂等，可直接重试）；
+        正文与上次推送的正文摘要不同（或未知）时，归档原有的顶层块后按批追加新的正文"""
+        await self.retry_policy.call_async(client.pages.update, counter, page_id=page_id, properties=op['data'])
+        if pushed_hash is not None and body_hash(pushed_hash) == body_hash(op.get('content_hash')):
+            return
+        for block_id in await self._child_ids(client, page_id, counter):
+            try:
+                await self.retry_policy.call_async(client.blocks.delete, counter, block_id=block_id)
+            except Exception as e:
+                # 重试前的请求已生效时，块已被归档
+                if not is_missing_page(e):
+                    raise
+        batches = [batch for batch in [op.get('children', []), *(op.get('extra_children') or ())] if batch]
+        await self._append_children(client, page_id, batches, counter)
+
+    def _remember(self, database_id, op, succeeded, item):
+        """把写入成功的页面记入 page_map；跳过的笔记只记录页面，不更新推送时间"""
+        if self.page_map is None or not succeeded or not item.get('page_id') or item['action'] == 'unchanged':
+            return
+        if item['action'] in ('create', 'update'):
+            self.page_map.record(op['note_id'], database_id, item['page_id'], op.get('mod'), op.get('content_hash'))
+        else:
+            self.page_map.record(op['note_id'], database_id, item['page_id'])
+
+    async def _find_duplicate(self, client, database_id, op, counter, dup_filter):
+        """返回重复页面的id，不存在时返回 None"""
+        if self.duplicate_index is not None:
+            return self.duplicate_index.lookup(op['duplicate_key'])
+        query = await self.retry_policy.call_async(
+            client.databases.query, counter, database_id=database_id, filter=dup_filter
+        )
+        return query['results'][0]['id'] if query.get('results') else None
+
+    async def _create(self, client, database_id, op, counter, verify_filter):
+        """创建页面。pages.create 不是幂等的：
+        超时或 5xx 时页面可能已经创建，重试前先用重复检查条件核实，查到则直接视为创建成功；
+        没有核实条件（copy 模式）时只重试确定未生效的失败（如 409）"""
+        attempt = 0
+        while True:
+            try:
+                create_response = await client.pages.create(
+                    parent={'database_id': database_id},
+                    properties=op['data'],
+                    children=op.get('children', [])
+                )
+                break
+            except Exception as e:
+                policy = self.retry_policy
+                ambiguous = policy.is_ambiguous(e)
+                if attempt >= policy.max_retries or not policy.is_retryable(e) or (ambiguous and verify_filter is None):
+                    raise
+                await asyncio.sleep(policy.backoff(attempt))
+                attempt += 1
+                counter['retries'] += 1
+                if ambiguous:
+                    query = await policy.call_async(
+                        client.databases.query, counter, database_id=database_id, filter=verify_filter
+                    )
+                    if query.get('results'):
+                        create_response = query['results'][0]
+                        break
+        try:
+            await self._append_children(
+                client, create_response['id'], op.get('extra_children') or (), counter, appended=len(op.get('children', []))
+            )
+        except Exception:
+            await self._discard_partial(client, database_id, op, create_response['id'], counter)
+            raise
+        return compact_result(op, action='create', page_id=create_response['id'], retries=counter['retries'])
+
+    async def _discard_partial(self, client, database_id, op, page_id, counter):
+        """正文追加失败时归档只有部分正文的新页面，下次同步重新创建；
+        归档也失败时把页面记入 page_map（不带内容摘要），下次覆盖时重写整个正文"""
+        try:
+            await self.retry_policy.call_async(client.pages.update, counter, page_id=page_id, archived=True)
+        except Exception as e:
+            print("归档正文不完整的页面失败:", page_id, e)
+            if self.page_map is not None:
+                self.page_map.record(op['note_id'], database_id, page_id)
+
+    async def _append_children(self, client, page_id, batches, counter, appended=0):
+        """按顺序追加正文块批次（appended 为页面已有的顶层块数）：同一页面的批次按顺序发送，不同页面之间照常并发
+        blocks.children.append 不是幂等的：超时或 5xx 时先核对页面的顶层块数，已追加则不再重试"""
+        for batch in batches:
+            attempt = 0
+            while True:
+                try:
+                    await client.blocks.children.append(block_id=page_id, children=batch)
+                    break
+                except Exception as e:
+                    policy = self.retry_policy
+                    if attempt >= policy.max_retries or not policy.is_retryable(e):
+                        raise
+                    await asyncio.sleep(policy.backoff(attempt))
+                    attempt += 1
+                    counter['retries'] += 1
+                    if policy.is_ambiguous(e):
+                        count = await self._count_children(client, page_id, counter)
+                        if count == appended + len(batch):
+                            break
+                        if count != appended:
+                            raise
+            appended += len(batch)
+
+    async def _count_children(self, client, page_id, counter):
+        """页面的顶层块数"""
+        return len(await self._child_ids(client, page_id, counter))
+
+    async def _child_ids(self, client, page_id, counter) -> list:
+        """页面全部顶层块的id"""
+        block_ids = []
+        cursor = None
+        while True:
+            kwargs = {'block_id': page_id, 'page_size': 100}
+            if cursor:
+                kwargs['start_cursor'] = cursor
+            response = await self.retry_policy.call_async(client.blocks.children.list, counter, **kwargs)
+            block_ids.extend(block['id'] for block in response.get('results', []))
+            if not response.get('has_more'):
+                return block_ids
+            cursor = response.get('next_cursor')
@@ -0,0 +1,75 @@
+# 并发读取页面正文的完整块树：广度优先逐层展开，批次内所有页面的父块共用一个有界并发窗口
+import asyncio
+import traceback
+from .retry_policy import RetryPolicy
+from .throttled_client import ThrottledAsyncClient
+
+# 这些块的子内容是独立的页面或数据库，不属于当前页面的正文
+DETACHED_BLOCK_TYPES = {"child_page", "child_database", "link_to_page"}
+
+
+class BlockTreeFetcher:
+    """并发读取多个页面的完整块树（广度优先，子块写入父块的 children 键）"""
+
+    def __init__(self, token, limiter, concurrency=3, retry_policy=None):
+        self.token = token
+        self.limiter = limiter
+        self.concurrency = max(1, int(concurrency))
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.requests = 0
+
+    def fetch(self, page_ids):
+        """同步入口：返回 ({页面id: 顶层块列表}, {读取失败的页面id: 错误信息})"""
+        return asyncio.run(self._fetch(list(page_ids)))
+
+    async def _fetch(self, page_ids):
+        client = ThrottledAsyncClient(self.limiter, auth=self.token)
+        trees = {page_id: [] for page_id in page_ids}
+        errors = {}
+        pending = asyncio.Queue()
+        for page_id in page_ids:
+            pending.put_nowait((page_id, page_id, trees[page_id]))
+
+        async def worker():
+            while True:
+                page_id, block_id, children = await pending.get()
+                try:
+                    # 同一页面已有请求失败时，其余父块不再读取
+                    if page_id not in errors:
+                        async for block in self._iter_children(client, block_id):
+                            children.append(block)
+                            if block.get("has_children") and block.get("type") not in DETACHED_BLOCK_TYPES:
+                                block["children"] = []
+                                pending.put_nowait((page_id, block["id"], block["children"]))
+                except Exception as e:
+                    traceback.print_exc()
+                    errors[page_id] = str(e)
+                finally:
+                    pending.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            await pending.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await client.aclose()
+        for page_id in errors:
+            trees.pop(page_id, None)
+        return trees, errors
+
+    async def _iter_children(self, client, block_id):
+        """逐页读取一个父块的直接子块"""
+        cursor = None
+        while True:
+            kwargs = {'block_id': block_id, 'page_size': 100}
+            if cursor:
+                kwargs['start_cursor'] = cursor
+            response = await self.retry_policy.call_async(client.blocks.children.list, **kwargs)
+            self.requests += 1
+            for block in response.get('results', []):
+                yield block
+            if not response.get('has_more'):
+                return
+            cursor = response.get('next_cursor')
@@ -0,0 +1,139 @@
+# 本地重复索引：一次分页扫描目标数据库，或按批用 or 组合条件只查询待上传笔记的键，之后所有重复检查都在本地完成
+import json
+import threading
+from .retry_policy import RetryPolicy
+
+# 构造键所必需的属性：笔记类型，以及记录“首字段名称”的 First Field
+KEY_PROPERTIES = ("Note Type", "First Field")
+# Notion 组合条件的限制：每个 or/and 数组最多 100 个条件，最多嵌套两层（or → and → 属性条件）
+MAX_OR_CONDITIONS = 100
+# 单次查询中 or 条件序列化后的长度上限，首字段很长时提前分批，避免请求体过大
+MAX_FILTER_CHARS = 50000
+
+
+def rich_text_value(prop) -> str:
+    """取出 rich_text/title 属性的纯文本"""
+    if not prop:
+        return ""
+    segments = prop.get("rich_text") or prop.get("title") or []
+    return "".join(seg.get("plain_text") or seg.get("text", {}).get("content", "") for seg in segments)
+
+
+class DuplicateIndex:
+    """(笔记类型, 首字段值) → 页面id 的重复检查索引"""
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.complete = False
+        # prefetch 已查询过的键（查询后仍不在索引中即表示数据库中没有）
+        self._queried = set()
+        self.scanned_pages = 0
+        self.scan_requests = 0
+        # 扫描到的全部页面id，可用于修复本地的页面映射（PageMap.prune）
+        self.page_ids = set()
+
+    @staticmethod
+    def key_of_page(page):
+        """根据页面自身的 First Field 找到首字段属性，返回键；缺少信息时返回 None"""
+        properties = page.get("properties", {})
+        note_type = rich_text_value(properties.get("Note Type"))
+        first_field_name = rich_text_value(properties.get("First Field"))
+        if not note_type or not first_field_name:
+            return None
+        return note_type, rich_text_value(properties.get(first_field_name))
+
+    def load(self, client, database_id, property_names=None, retry_policy=None, max_requests=None):
+        """分页扫描数据库（page_size=100），只请求构造键所需的属性
+        client 为 notion_client 的 Client；property_names 为可能作为首字段的属性名，为空时请求全部属性
+        max_requests 限制查询次数：超出时停止扫描，complete 保持 False，已扫描的页面仍然留在索引中"""
+        retry_policy = retry_policy or RetryPolicy()
+        query_kwargs = {"database_id": database_id, "page_size": 100}
+        if property_names is not None:
+            schema = retry_policy.call(client.databases.retrieve, database_id=database_id)["properties"]
+            wanted = set(KEY_PROPERTIES) | set(property_names)
+            query_kwargs["filter_properties"] = [schema[name]["id"] for name in wanted if name in schema]
+
+        requests = 0
+        while max_requests is None or requests < max_requests:
+            requests += 1
+            self.scan_requests += 1
+            response = retry_policy.call(client.databases.query, **query_kwargs)
+            for page in response.get("results", []):
+                self.scanned_pages += 1
+                self.page_ids.add(page["id"])
+                key = self.key_of_page(page)
+                if key is not None:
+                    # 同一个键对应多个页面时保留最先扫描到的页面
+                    with self._lock:
+                        self._pages.setdefault(key, page["id"])
+            if not response.get("has_more"):
+                self.complete = True
+                break
+            query_kwargs["start_cursor"] = response.get("next_cursor")
+        return self
+
+    async def prefetch(self, client, database_id, operations, batch_size=MAX_OR_CONDITIONS, retry_policy=None):
+        """异步生成器：逐批收集操作，用一次 or 组合查询取回这批键对应的页面写入索引，再原样产出这批操作
+        client 为 notion_client 的 AsyncClient；operations 可以是普通或异步可迭代对象"""
+        retry_policy = retry_policy or RetryPolicy()
+        batch_size = max(1, min(int(batch_size), MAX_OR_CONDITIONS))
+        batch, filters, size = [], {}, 0
+        async for op in _aiterate(operations):
+            key = op.get('duplicate_key')
+            if key is not None and key not in filters and key not in self._queried and self.lookup(key) is None:
+                condition = op['duplicate_check']['filter']
+                condition_size = len(json.dumps(condition, ensure_ascii=False))
+                if filters and (len(filters) >= batch_size or size + condition_size > MAX_FILTER_CHARS):
+                    await self._query_keys(client, database_id, filters, retry_policy)
+                    for pending in batch:
+                        yield pending
+                    batch, filters, size = [], {}, 0
+                filters[key] = condition
+                size += condition_size
+            batch.append(op)
+        if filters:
+            await self._query_keys(client, database_id, filters, retry_policy)
+        for pending in batch:
+            yield pending
+
+    async def _query_keys(self, client, database_id, filters, retry_policy):
+        """一次 or 组合查询（含分页）取回若干键的页面，只保留查询的键，避免误收其它页面"""
+        self._queried.update(filters)
+        cursor = None
+        while True:
+            kwargs = {"database_id": database_id, "filter": {"or": list(filters.values())}, "page_size": 100}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            self.scan_requests += 1
+            response = await retry_policy.call_async(client.databases.query, **kwargs)
+            for page in response.get("results", []):
+                self.scanned_pages += 1
+                self.page_ids.add(page["id"])
+                key = self.key_of_page(page)
+                if key in filters:
+                    self.add(key, page["id"])
+            if not response.get("has_more"):
+                return
+            cursor = response.get("next_cursor")
+
+    def lookup(self, key):
+        with self._lock:
+            return self._pages.get(key)
+
+    def add(self, key, page_id):
+        with self._lock:
+            self._pages.setdefault(key, page_id)
+
+    def __len__(self):
+        return len(self._pages)
+
+
+async def _aiterate(items):
+    """把普通或异步可迭代对象统一为异步迭代"""
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
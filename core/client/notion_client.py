@@ -1,104 +1,188 @@
 # 封装 Notion API 的操作，处理与外部系统的交互
 
-from notion_client import Client
-import traceback
+from notion_client.helpers import iterate_paginated_api
+from .async_batch_writer import AsyncBatchWriter
+from .block_tree_fetcher import BlockTreeFetcher
+from .duplicate_index import DuplicateIndex, MAX_OR_CONDITIONS
+from .rate_limiter import get_shared_rate_limiter
+from .retry_policy import RetryPolicy
+from .throttled_client import ThrottledClient
 
 
 class NotionClient:
-    def __init__(self, token):
+    def __init__(self, token, requests_per_second=None, burst=None):
         """
         初始化 NotionClient 实例，接收 token 并创建 Notion SDK 的 Client 实例
+        所有请求都经过进程级共享的令牌桶限速器，requests_per_second/burst 为空时使用 Notion 文档的平均速率
         """
         self.token = token
-        self.client = Client(auth=token)
+        self.limiter = get_shared_rate_limiter(requests_per_second, burst)
+        self.client = ThrottledClient(self.limiter, auth=token)
 
-    def batch_update_database(self, database_id, operations, delete_source, config):
+    def rate_limit_stats(self) -> dict:
+        """限速器计数：请求数、等待令牌的时长、429 次数与 Retry-After 暂停时长"""
+        return self.limiter.stats()
+
+    def ensure_database_properties(self, database_id, expected_types, retry_policy=None):
         """
-        批量更新 Notion 数据库：
-          - copy 模式直接创建新页面，不检查重复
-          - 对于其它模式：如果存在重复页面，则根据模式进行覆盖或跳过；如果无重复，则创建新页面
-        返回一个字典：{'success': [...], 'failed': [...]}
+        对比数据库现有属性与预期类型映射，补充缺失或类型不匹配的属性
+        返回实际更新的属性名列表
         """
-        success = []
-        failed = []
+        retry_policy = retry_policy or RetryPolicy()
+        try:
+            db_info = retry_policy.call(self.client.databases.retrieve, database_id=database_id)
+        except Exception as e:
+            print("无法获取数据库结构信息:", e)
+            return []
+
+        current_properties = db_info.get("properties", {})
+        new_properties = {}
+        for field, expected_type in expected_types.items():
+            if field not in current_properties or current_properties[field].get("type") != expected_type:
+                new_properties[field] = {expected_type: {}}
 
-        for op in operations:
+        if new_properties:
+            try:
+                retry_policy.call(
+                    self.client.databases.update,
+                    database_id=database_id,
+                    properties=new_properties
+                )
+                print("自动更新数据库结构，添加/更新属性：", list(new_properties.keys()))
+            except Exception as e:
+                print("自动更新数据库属性失败:", e)
+                return []
+        return list(new_properties.keys())
+
+    def iter_pages_edited_since(self, database_id, since=None, tag="readyMove", tag_property="Tags", retry_policy=None):
+        """增量读取：带 tag 标签、且 last_edited_time 不早于 since（ISO 时间字符串）的页面，按编辑时间升序逐页产出
+        Notion 的 last_edited_time 只精确到分钟，因此使用 on_or_after，由调用方去掉水位线所在时刻已处理过的页面"""
+        retry_policy = retry_policy or RetryPolicy()
+        conditions = [{"property": tag_property, "multi_select": {"contains": tag}}]
+        if since:
+            conditions.append({"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": since}})
+
+        def query_page(**kwargs):
+            return retry_policy.call(self.client.databases.query, **kwargs)
+
+        yield from iterate_paginated_api(
+            query_page,
+            database_id=database_id,
+            filter={"and": conditions},
+            sorts=[{"timestamp": "last_edited_time", "direction": "ascending"}],
+            page_size=100
+        )
+
+    def archive_pages(self, page_ids, retry_policy=None) -> list:
+        """归档（移入回收站）页面，返回归档失败的页面id"""
+        retry_policy = retry_policy or RetryPolicy()
+        failed = []
+        for page_id in page_ids:
             try:
-                # 每次循环时从最新的配置中读取处理模式
-                mode = config.get("duplicate_handling_way", "keep").lower()
-
-                # copy 模式：直接创建新页面
-                if mode == "copy":
-                    create_response = self.client.pages.create(
-                        parent={'database_id': database_id},
-                        properties=op['data'],
-                        children=op.get('children', [])
-                    )
-                    success.append({
-                        'operation': op,
-                        'action': 'create',
-                        'page_id': create_response['id'],
-                        'response': create_response,
-                    })
-                    continue
-
-                # 其它模式：先进行重复检查
-                dup_filter = op['duplicate_check']['filter']
-                query = self.client.databases.query(database_id=database_id, filter=dup_filter)
-                # 如果存在重复页面
-                if query.get('results'):
-                    if mode == "overwrite":
-                        # 覆盖：更新已存在页面
-                        page_id = query['results'][0]['id']
-                        update_response = self.client.pages.update(
-                            page_id=page_id,
-                            properties=op['data'],
-                            children=op.get('children', [])
-                        )
-                        success.append({
-                            'operation': op,
-                            'action': 'update',
-                            'page_id': page_id,
-                            'response': update_response,
-                        })
-                    elif mode == "keep":
-                        # 保留：跳过更新，保持现有页面
-                        success.append({
-                            'operation': op,
-                            'action': 'skip',
-                            'page_id': query['results'][0]['id'],
-                            'response': None,
-                        })
-                    else:
-                        # 默认情况，同 keep
-                        success.append({
-                            'operation': op,
-                            'action': 'skip',
-                            'page_id': query['results'][0]['id'],
-                            'response': None,
-                        })
-                else:
-                    # 若不存在重复，则创建新的 Notion 页面
-                    create_response = self.client.pages.create(
-                        parent={'database_id': database_id},
-                        properties=op['data'],
-                        children=op.get('children', [])
-                    )
-                    success.append({
-                        'operation': op,
-                        'action': 'create',
-                        'page_id': create_response['id'],
-                        'response': create_response,
-                    })
+                retry_policy.call(self.client.pages.update, page_id=page_id, archived=True)
             except Exception as e:
-                traceback.print_exc()
-                failed.append({
-                    'operation': op,
-                    'error': str(e),
-                    'trace': traceback.format_exc()
-                })
-
-        return {
-            'success': success,
-            'failed': failed
-        }
\ No newline at end of file
+                print(f"归档页面 {page_id} 失败:", e)
+                failed.append(page_id)
+        return failed
+
+    def fetch_block_trees(self, page_ids, config):
+        """并发读取多个页面的完整正文块树（广度优先，同时在途的请求数由 notion_concurrency 控制）
+        返回 ({页面id: 顶层块列表}, {读取失败的页面id: 错误信息})"""
+        fetcher = BlockTreeFetcher(
+            self.token,
+            self.limiter,
+            concurrency=config.get("notion_concurrency", 3),
+            retry_policy=RetryPolicy.from_config(config)
+        )
+        return fetcher.fetch(page_ids)
+
+    @staticmethod
+    def uses_duplicate_index(config) -> bool:
+        """copy 模式不做重复检查；duplicate_lookup 为 "query" 时逐条查询，
+        为 "index"（整库扫描）、"batch"（按批 or 查询）或 "auto"（按估算的请求数自动选择）时使用本地索引"""
+        mode = config.get("duplicate_handling_way", "keep").lower()
+        return mode != "copy" and config.get("duplicate_lookup", "auto") in ("index", "batch", "auto")
+
+    def build_lookup_index(self, database_id, config, pending_count, property_names=None, page_map=None, retry_policy=None):
+        """按 duplicate_lookup 构建重复索引：
+          - "index"：整库扫描，约 ceil(数据库页数 / 100) 次请求
+          - "batch"：返回空索引，上传时按批 or 查询，约 ceil(待检查笔记数 / 批大小) 次请求
+          - "auto"：先扫描，扫描请求数达到按批查询的请求数仍未结束就改为按批查询（总请求数不超过较优方案的两倍）；
+            本地页面映射中的页数只是数据库页数的下限，仅用于提前判定扫描一定更贵、直接按批查询"""
+        lookup = config.get("duplicate_lookup", "auto")
+        if lookup == "index":
+            return self.build_duplicate_index(database_id, property_names, retry_policy)
+        batch_size = max(1, min(int(config.get("duplicate_batch_size", MAX_OR_CONDITIONS)), MAX_OR_CONDITIONS))
+        batch_requests = -(-pending_count // batch_size)
+        if lookup == "batch":
+            return DuplicateIndex()
+        known_pages = page_map.count(database_id) if page_map is not None else 0
+        if -(-known_pages // 100) > batch_requests:
+            return DuplicateIndex()
+        return self.build_duplicate_index(database_id, property_names, retry_policy, max_requests=batch_requests)
+
+    def build_duplicate_index(self, database_id, property_names=None, retry_policy=None, max_requests=None):
+        """一次分页扫描目标数据库，构建本地重复索引（同步过程中新建的页面会自动写回）"""
+        return DuplicateIndex().load(self.client, database_id, property_names, retry_policy, max_requests)
+
+    def verify_page_map(self, database_id, page_map, property_names=None, retry_policy=None):
+        """修复本地页面映射：扫描一次数据库，删除指向已删除页面的映射
+        扫描结果本身就是一份重复索引，返回 (重复索引, 删除的映射条数)"""
+        index = self.build_duplicate_index(database_id, property_names, retry_policy)
+        return index, page_map.prune(database_id, index.page_ids)
+
+    def prepare_duplicate_lookup(self, database_id, config, note_ids, property_names=None, page_map=None):
+        """上传前准备重复检查，返回本次使用的重复索引（不需要时返回 None，逐条查询或无需检查）
+          - verify_page_map 开启时先修复页面映射，顺带得到重复索引
+          - 所有笔记都已在页面映射中时不需要扫描数据库"""
+        retry_policy = RetryPolicy.from_config(config)
+        if page_map is not None and config.get("verify_page_map", False):
+            index, removed = self.verify_page_map(database_id, page_map, property_names, retry_policy)
+            if removed:
+                print(f"页面映射修复：移除 {removed} 条指向已删除页面的记录")
+            return index if self.uses_duplicate_index(config) else None
+        if not self.uses_duplicate_index(config):
+            return None
+        note_ids = list(note_ids)
+        pending_count = len(note_ids)
+        if page_map is not None:
+            pending_count -= len(page_map.known_note_ids(database_id, note_ids))
+            if not pending_count:
+                return None
+        # 未完成整库扫描的索引由 batch_update_database 在上传前按批补充查询
+        return self.build_lookup_index(database_id, config, pending_count, property_names, page_map, retry_policy)
+
+    def batch_update_database(self, database_id, operations, config, progress_callback=None, is_cancelled=None, on_result=None,
+                              duplicate_index=None, page_map=None):
+        """
+        批量更新 Notion 数据库：
+          - copy 模式直接创建新页面，不检查重复
+          - 对于其它模式：如果存在重复页面，则根据模式进行覆盖或跳过；如果无重复，则创建新页面
+        请求由 AsyncBatchWriter 并发发送，同时在途的请求数由配置 notion_concurrency 控制，结果保持原始顺序
+        operations 可以是列表、生成器或异步生成器，按需逐条拉取
+        progress_callback(已处理条数) 在每条笔记处理完后调用；is_cancelled() 返回 True 时在两条笔记之间停止
+        on_result(是否成功, 结果记录) 在每条笔记完成时立即调用
+        提供 duplicate_index（见 build_duplicate_index）时重复检查在本地完成，省去每条笔记一次的查询
+        提供 page_map（见 models.page_map.PageMap）时，已推送过的笔记直接更新对应页面，并记录本次写入的页面
+        瞬时故障（超时、5xx 等）按 retry_max_retries 等配置指数退避重试；429 由限速客户端按 Retry-After 重发
+        返回一个字典：{'success': [...], 'failed': [...], 'cancelled': bool, 'retries': 总重试次数}
+        """
+        # 每次调用时从最新的配置中读取处理模式
+        mode = config.get("duplicate_handling_way", "keep").lower()
+        writer = AsyncBatchWriter(
+            self.token,
+            self.limiter,
+            concurrency=config.get("notion_concurrency", 3),
+            retry_policy=RetryPolicy.from_config(config),
+            lookup_batch_size=config.get("duplicate_batch_size", MAX_OR_CONDITIONS)
+        )
+        return writer.run(
+            database_id,
+            operations,
+            mode,
+            progress_callback=progress_callback,
+            is_cancelled=is_cancelled,
+            on_result=on_result,
+            duplicate_index=duplicate_index,
+            page_map=page_map
+        )
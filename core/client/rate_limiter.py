@@ -0,0 +1,106 @@
+# 进程级共享的令牌桶限速器，所有 Notion 请求（同步与异步客户端）都经过同一个令牌桶
+import asyncio
+import threading
+import time
+
+# Notion 文档给出的平均速率：每个集成每秒约 3 个请求
+DEFAULT_REQUESTS_PER_SECOND = 3.0
+DEFAULT_BURST = 3
+
+
+def parse_retry_after(value, default=1.0) -> float:
+    """解析 Retry-After 响应头（Notion 返回秒数），无法解析时使用默认值"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucketRateLimiter:
+    """令牌桶限速器（线程安全，可同时服务多个线程和协程）"""
+
+    def __init__(self, requests_per_second=DEFAULT_REQUESTS_PER_SECOND, burst=DEFAULT_BURST):
+        self._lock = threading.Lock()
+        self.configure(requests_per_second, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self.reset_stats()
+
+    def configure(self, requests_per_second, burst):
+        """调整速率与突发容量，已预约的令牌不受影响"""
+        with self._lock:
+            self.requests_per_second = max(float(requests_per_second), 0.01)
+            self.burst = max(int(burst), 1)
+
+    def acquire(self):
+        """同步调用方：阻塞直到获得令牌"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """异步调用方：挂起当前协程直到获得令牌"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_rate_limited(self, retry_after):
+        """收到 429 时调用：在 Retry-After 到期前暂停整个令牌桶，所有调用方一起等待"""
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            self._tokens = min(self._tokens, 0.0)
+            self._stats["rate_limited_responses"] += 1
+            self._stats["retry_after_seconds"] += retry_after
+
+    def stats(self) -> dict:
+        """返回自上次 reset_stats 以来的计数"""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                "requests": 0,                 # 经过限速器的请求数（含重发）
+                "throttled_requests": 0,       # 需要等待令牌的请求数
+                "throttled_seconds": 0.0,      # 等待令牌（含 Retry-After 暂停）的累计时长，并发请求分别计时
+                "rate_limited_responses": 0,   # 收到的 429 响应数
+                "retry_after_seconds": 0.0,    # 429 响应要求暂停的总时长
+            }
+
+    def _reserve(self) -> float:
+        """扣除一个令牌，返回调用方需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.requests_per_second)
+            self._updated = now
+            self._tokens -= 1
+            delay = 0.0 if self._tokens >= 0 else -self._tokens / self.requests_per_second
+            delay = max(delay, self._blocked_until - now)
+            self._stats["requests"] += 1
+            if delay > 0:
+                self._stats["throttled_requests"] += 1
+                self._stats["throttled_seconds"] += delay
+            return delay
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_rate_limiter(requests_per_second=None, burst=None) -> TokenBucketRateLimiter:
+    """获取进程级共享限速器；传入参数时按最新配置调整速率"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = TokenBucketRateLimiter(
+                requests_per_second or DEFAULT_REQUESTS_PER_SECOND,
+                burst or DEFAULT_BURST
+            )
+        elif requests_per_second or burst:
+            _shared_limiter.configure(
+                requests_per_second or _shared_limiter.requests_per_second,
+                burst or _shared_limiter.burst
+            )
+        return _shared_limiter
@@ -0,0 +1,78 @@
+# 针对 Notion 瞬时故障的重试策略：指数退避（有上限）+ 随机抖动
+import asyncio
+import random
+import time
+from notion_client.errors import APIErrorCode, APIResponseError, HTTPResponseError, RequestTimeoutError
+
+# 视为瞬时故障、可以重试的 API 错误码
+# 429（rate_limited）不在其中：ThrottledClient 已按 Retry-After 暂停令牌桶后重发，到这里说明重发次数已用完
+RETRYABLE_API_CODES = {
+    APIErrorCode.ServiceUnavailable.value,
+    APIErrorCode.InternalServerError.value,
+    APIErrorCode.ConflictError.value,
+}
+
+
+class RetryPolicy:
+    """瞬时故障的重试策略（指数退避 + 抖动）"""
+
+    def __init__(self, max_retries=3, base_delay=1.0, max_delay=30.0):
+        self.max_retries = max(int(max_retries), 0)
+        self.base_delay = max(float(base_delay), 0.0)
+        self.max_delay = max(float(max_delay), self.base_delay)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_retries=config.get("retry_max_retries", 3),
+            base_delay=config.get("retry_base_delay", 1.0),
+            max_delay=config.get("retry_max_delay", 30.0)
+        )
+
+    @staticmethod
+    def is_retryable(error) -> bool:
+        if isinstance(error, RequestTimeoutError):
+            return True
+        if isinstance(error, APIResponseError):
+            return error.code in RETRYABLE_API_CODES or error.status >= 500
+        if isinstance(error, HTTPResponseError):
+            return error.status >= 500
+        return False
+
+    @staticmethod
+    def is_ambiguous(error) -> bool:
+        """请求是否可能已被服务端执行（429 表示请求被拒绝，一定没有生效）"""
+        if isinstance(error, RequestTimeoutError):
+            return True
+        return isinstance(error, HTTPResponseError) and error.status >= 500
+
+    def backoff(self, attempt) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, function, counter=None, **kwargs):
+        """同步调用幂等请求，失败时按策略重试；counter['retries'] 累计重试次数"""
+        attempt = 0
+        while True:
+            try:
+                return function(**kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                if counter is not None:
+                    counter['retries'] = counter.get('retries', 0) + 1
+
+    async def call_async(self, function, counter=None, **kwargs):
+        """异步调用幂等请求，失败时按策略重试"""
+        attempt = 0
+        while True:
+            try:
+                return await function(**kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                if counter is not None:
+                    counter['retries'] = counter.get('retries', 0) + 1
@@ -0,0 +1,52 @@
+# 在 notion_client 的 Client/AsyncClient 之上加一层限速：所有端点最终都经过 request()，
+# 因此只需重写 request 即可覆盖 databases.retrieve/update/query、pages.create/update 等全部调用
+from notion_client import AsyncClient, Client
+from notion_client.errors import HTTPResponseError
+from .rate_limiter import parse_retry_after
+
+
+def is_rate_limited(error) -> bool:
+    """判断异常是否为 HTTP 429（APIResponseError 是 HTTPResponseError 的子类）"""
+    return isinstance(error, HTTPResponseError) and error.status == 429
+
+
+class ThrottledClient(Client):
+    """同步客户端：每个请求先从共享令牌桶取令牌；遇到 429 按 Retry-After 暂停令牌桶后重发"""
+
+    def __init__(self, limiter, max_rate_limit_retries=5, **kwargs):
+        self.limiter = limiter
+        self.max_rate_limit_retries = max_rate_limit_retries
+        super().__init__(**kwargs)
+
+    def request(self, path, method, query=None, body=None, auth=None):
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                return super().request(path, method, query, body, auth)
+            except HTTPResponseError as e:
+                if not is_rate_limited(e) or attempt >= self.max_rate_limit_retries:
+                    raise
+                attempt += 1
+                self.limiter.on_rate_limited(parse_retry_after(e.headers.get("Retry-After")))
+
+
+class ThrottledAsyncClient(AsyncClient):
+    """异步客户端：与 ThrottledClient 共享同一个令牌桶"""
+
+    def __init__(self, limiter, max_rate_limit_retries=5, **kwargs):
+        self.limiter = limiter
+        self.max_rate_limit_retries = max_rate_limit_retries
+        super().__init__(**kwargs)
+
+    async def request(self, path, method, query=None, body=None, auth=None):
+        attempt = 0
+        while True:
+            await self.limiter.acquire_async()
+            try:
+                return await super().request(path, method, query, body, auth)
+            except HTTPResponseError as e:
+                if not is_rate_limited(e) or attempt >= self.max_rate_limit_retries:
+                    raise
+                attempt += 1
+                self.limiter.on_rate_limited(parse_retry_after(e.headers.get("Retry-After")))
@@ -0,0 +1,134 @@
+# HTML → Notion 块转换结果的缓存：以输入 HTML 的摘要为键的有界 LRU，可选持久化到插件目录的 user_files 中
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from .page_map import PLUGIN_ROOT
+
+DEFAULT_CONVERSION_CACHE_PATH = os.path.join(PLUGIN_ROOT, 'user_files', 'conversion_cache.sqlite3')
+# 转换或载荷整形的逻辑变化时递增，旧版本的缓存条目不再命中
+CONVERTER_VERSION = 1
+
+
+class ConversionCache:
+    """HTML 摘要 → 转换结果（紧凑 JSON 文本）的 LRU 缓存"""
+
+    def __init__(self, max_entries=2000, path=None, max_persisted=20000, flush_every=200):
+        self.max_entries = max(1, int(max_entries))
+        self.max_persisted = max_persisted
+        self.flush_every = flush_every
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {}      # 待写入磁盘：键 → 转换结果（None 表示只更新最近使用时间）
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversion_cache ("
+                " key TEXT PRIMARY KEY,"
+                " blocks TEXT NOT NULL,"
+                " used REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        """conversion_cache_size 为 0 时不启用缓存（返回 None），conversion_cache_persist 决定是否跨同步保存"""
+        size = int(config.get("conversion_cache_size", 2000) or 0)
+        if size <= 0:
+            return None
+        path = DEFAULT_CONVERSION_CACHE_PATH if config.get("conversion_cache_persist", True) else None
+        return cls(max_entries=size, path=path)
+
+    @staticmethod
+    def key(html) -> str:
+        return hashlib.sha256(f"{CONVERTER_VERSION}:{html}".encode("utf-8")).hexdigest()
+
+    def get_or_convert(self, html, convert):
+        """返回 convert(html) 的结果，相同的 HTML 只转换一次"""
+        key = self.key(html)
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(encoded)
+            encoded = self._load_locked(key)
+            if encoded is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._pending.setdefault(key, None)
+                self._store_locked(key, encoded)
+                return json.loads(encoded)
+        # 转换在锁外进行，不阻塞其它线程的命中
+        blocks = convert(html)
+        encoded = json.dumps(blocks, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self.misses += 1
+            self._store_locked(key, encoded)
+            if self._conn is not None:
+                self._pending[key] = encoded
+                if len(self._pending) >= self.flush_every:
+                    self._flush_locked()
+        return blocks
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """写入待保存的条目并裁剪磁盘缓存"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_locked()
+            self._conn.execute(
+                "DELETE FROM conversion_cache WHERE key NOT IN "
+                "(SELECT key FROM conversion_cache ORDER BY used DESC LIMIT ?)",
+                (self.max_persisted,)
+            )
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    def _store_locked(self, key, encoded):
+        self._entries[key] = encoded
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load_locked(self, key):
+        if self._conn is None:
+            return None
+        encoded = self._pending.get(key)
+        if encoded is not None:
+            return encoded
+        row = self._conn.execute("SELECT blocks FROM conversion_cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _flush_locked(self):
+        if self._conn is None or not self._pending:
+            return
+        used = time.time()
+        self._conn.executemany(
+            "INSERT INTO conversion_cache (key, blocks, used) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET used = excluded.used",
+            [(key, encoded, used) for key, encoded in self._pending.items() if encoded is not None]
+        )
+        self._conn.executemany(
+            "UPDATE conversion_cache SET used = ? WHERE key = ?",
+            [(used, key) for key, encoded in self._pending.items() if encoded is None]
+        )
+        self._conn.commit()
+        self._pending = {}
@@ -0,0 +1,43 @@
+# 提取笔记时在一次同步内共享的只读状态，每次同步创建一次，传给所有笔记
+import time
+from datetime import date, datetime
+from .parse_and_converter import BODY_FIELD
+
+
+class ExtractionContext:
+    """一次同步的提取上下文"""
+
+    def __init__(self, col, now=None):
+        self.col = col
+        self.now = time.time() if now is None else now
+        self.tzinfo = datetime.fromtimestamp(self.now).astimezone().tzinfo
+        self.today = col.sched.today
+        # sched.today 对应的日历日期：午夜到换日时刻之间 sched.today 仍是前一天，不能取 now 的日期
+        self.today_date = date.fromtimestamp(col.sched.day_cutoff - 86400)
+        self._deck_names = {}
+        self._note_types = {}
+        self._field_layouts = {}
+
+    def deck_name(self, did) -> str:
+        name = self._deck_names.get(did)
+        if name is None:
+            name = self._deck_names[did] = self.col.decks.get(did)["name"]
+        return name
+
+    def note_type(self, mid):
+        """返回 (笔记类型名称, 按顺序排列的字段名)，笔记类型不存在时为 ("", [])"""
+        note_type = self._note_types.get(mid)
+        if note_type is None:
+            model = self.col.models.get(mid)
+            note_type = (model["name"], [field["name"] for field in model["flds"]]) if model else ("", [])
+            self._note_types[mid] = note_type
+        return note_type
+
+    def field_layout(self, mid):
+        """返回 (不含正文字段的模板字段名元组, 正文字段的位置或 None)；同一笔记类型的快照共用这一个元组"""
+        layout = self._field_layouts.get(mid)
+        if layout is None:
+            field_names = self.note_type(mid)[1]
+            body_index = field_names.index(BODY_FIELD) if BODY_FIELD in field_names else None
+            layout = self._field_layouts[mid] = (tuple(name for name in field_names if name != BODY_FIELD), body_index)
+        return layout
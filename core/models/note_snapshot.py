@@ -0,0 +1,86 @@
+# 笔记快照：同步流水线中“提取 → 转换”之间传递的最小单元
+# 只保存导出所需的 id、字段值、调度数值与 FSRS 参数，派生的属性（时间、Anki ID 字符串等）在转换时才生成
+from datetime import datetime
+from .parse_and_converter import CARD_SCHEDULE_FIELD
+
+
+class NoteSnapshot:
+    """一条笔记的不可变快照（__slots__，无 __dict__）"""
+
+    __slots__ = (
+        "note_id", "mod", "tzinfo",
+        "deck", "tags", "note_type", "first_field",
+        "card_type", "due", "reps", "ease", "ivl", "lapses", "suspended",
+        "difficulty", "stability", "retrievability",
+        "field_names", "field_values", "body_html",
+        "card_schedule",
+    )
+
+    def __init__(self, note_id, mod, tzinfo, deck, tags, note_type, first_field,
+                 card_type, due, reps, ease, ivl, lapses, suspended,
+                 difficulty, stability, retrievability,
+                 field_names, field_values, body_html, card_schedule=None):
+        for name, value in zip(self.__slots__, (
+                note_id, mod, tzinfo, deck, tags, note_type, first_field,
+                card_type, due, reps, ease, ivl, lapses, suspended,
+                difficulty, stability, retrievability,
+                field_names, field_values, body_html, card_schedule)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"NoteSnapshot 不可修改: {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"NoteSnapshot 不可修改: {name}")
+
+    def __reduce__(self):
+        return NoteSnapshot, self.astuple()
+
+    def __eq__(self, other):
+        return isinstance(other, NoteSnapshot) and self.astuple() == other.astuple()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"NoteSnapshot(note_id={self.note_id}, note_type={self.note_type!r})"
+
+    def astuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @staticmethod
+    def pack(snapshots) -> list:
+        """转为只含基本类型的元组列表，供投递给子进程"""
+        return [snapshot.astuple() for snapshot in snapshots]
+
+    @staticmethod
+    def unpack(rows) -> list:
+        return [NoteSnapshot(*row) for row in rows]
+
+    def properties(self) -> dict:
+        """标准化属性字典，供 ToNotionConverter 编码"""
+        properties = {
+            "Anki ID": str(self.note_id),
+            "Deck": self.deck,
+            "Tags": self.tags,
+            "Note Type": self.note_type,
+            "Card Type": self.card_type,
+            "First Field": self.first_field,
+            "Creation Time": datetime.fromtimestamp(self.note_id / 1000, tz=self.tzinfo).isoformat(),
+            "Modification Time": datetime.fromtimestamp(self.mod, tz=self.tzinfo).isoformat(),
+            "Due Date": self.due,
+            "Review Count": self.reps,
+            "Ease Factor": self.ease,
+            "Interval": self.ivl,
+            "Lapses": self.lapses,
+            "Suspended": self.suspended,
+        }
+        if self.difficulty is not None:
+            properties["Difficulty"] = {"number": self.difficulty}
+        if self.stability is not None:
+            properties["Stability"] = {"number": self.stability}
+        if self.retrievability is not None:
+            properties["Retrievability"] = {"number": self.retrievability}
+        if self.card_schedule is not None:
+            properties[CARD_SCHEDULE_FIELD] = self.card_schedule
+        properties.update(zip(self.field_names, self.field_values))
+        return properties
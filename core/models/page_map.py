@@ -0,0 +1,141 @@
+# 持久化的 Anki 笔记id → Notion 页面id 映射，保存在插件目录的 user_files 中（插件升级时不会被覆盖）
+import os
+import sqlite3
+import threading
+
+PLUGIN_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_PAGE_MAP_PATH = os.path.join(PLUGIN_ROOT, 'user_files', 'page_map.sqlite3')
+
+
+class PageMap:
+    """(笔记id, 数据库id) → (页面id, 最近一次推送时笔记的 mod, 内容摘要)"""
+
+    def __init__(self, path=DEFAULT_PAGE_MAP_PATH, flush_every=200):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._pending = {}     # (笔记id, 数据库id) → (页面id, mod, 内容摘要)，尚未写入 SQLite
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_map ("
+            " note_id INTEGER NOT NULL,"
+            " database_id TEXT NOT NULL,"
+            " page_id TEXT NOT NULL,"
+            " mod INTEGER,"
+            " content_hash TEXT,"
+            " PRIMARY KEY (note_id, database_id))"
+        )
+        self._conn.commit()
+
+    def lookup(self, note_id, database_id):
+        """返回已知的页面id，未推送过时返回 None"""
+        row = self.get(note_id, database_id)
+        return row[0] if row else None
+
+    def get(self, note_id, database_id):
+        """返回 (页面id, mod, 内容摘要)，未推送过时返回 None；尚未写入的记录在内存中合并，读取不触发提交"""
+        with self._lock:
+            pending = self._pending.get((note_id, database_id))
+            if pending is not None and None not in pending:
+                return pending
+            row = self._conn.execute(
+                "SELECT page_id, mod, content_hash FROM page_map WHERE note_id = ? AND database_id = ?",
+                (note_id, database_id)
+            ).fetchone()
+        if pending is None:
+            return row
+        return self._merge(row, pending)
+
+    @staticmethod
+    def _merge(old, new):
+        """与写入 SQLite 时相同的合并规则：mod、content_hash 为 None 时保留原有值"""
+        if old is None:
+            return new
+        return new[0], old[1] if new[1] is None else new[1], old[2] if new[2] is None else new[2]
+
+    def known_note_ids(self, database_id, note_ids) -> set:
+        """返回 note_ids 中已有映射的笔记id"""
+        note_ids = list(note_ids)
+        with self._lock:
+            requested = set(note_ids)
+            known = {note_id for note_id, pending_database_id in self._pending
+                     if pending_database_id == database_id and note_id in requested}
+            # 分批查询，避免超出 SQLite 的参数个数上限
+            for i in range(0, len(note_ids), 500):
+                chunk = note_ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT note_id FROM page_map WHERE database_id = ? AND note_id IN ({','.join('?' * len(chunk))})",
+                    (database_id, *chunk)
+                )
+                known.update(row[0] for row in rows)
+        return known
+
+    def count(self, database_id) -> int:
+        """某个数据库已记录的页面数"""
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM page_map WHERE database_id = ?", (database_id,)
+            ).fetchone()[0]
+
+    def record(self, note_id, database_id, page_id, mod=None, content_hash=None):
+        """记录一次推送结果；mod、content_hash 为 None 时保留原有值（例如 keep 模式跳过的笔记）"""
+        key = (note_id, database_id)
+        with self._lock:
+            self._pending[key] = self._merge(self._pending.get(key), (page_id, mod, content_hash))
+            if len(self._pending) >= self.flush_every:
+                self._flush_locked()
+
+    def forget_pages(self, database_id, page_ids):
+        """删除指向指定页面的映射（页面已在 Notion 侧删除或归档）"""
+        page_ids = list(page_ids)
+        with self._lock:
+            self._flush_locked()
+            self._conn.executemany(
+                "DELETE FROM page_map WHERE database_id = ? AND page_id = ?",
+                [(database_id, page_id) for page_id in page_ids]
+            )
+            self._conn.commit()
+
+    def prune(self, database_id, live_page_ids) -> int:
+        """修复：删除数据库中已不存在的页面的映射，返回删除条数
+        live_page_ids 为一次完整扫描得到的全部页面id"""
+        live_page_ids = set(live_page_ids)
+        with self._lock:
+            self._flush_locked()
+            stale = [
+                page_id for (page_id,) in self._conn.execute(
+                    "SELECT page_id FROM page_map WHERE database_id = ?", (database_id,)
+                ) if page_id not in live_page_ids
+            ]
+        self.forget_pages(database_id, stale)
+        return len(stale)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        self._conn.executemany(
+            "INSERT INTO page_map (note_id, database_id, page_id, mod, content_hash) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (note_id, database_id) DO UPDATE SET "
+            " page_id = excluded.page_id,"
+            " mod = COALESCE(excluded.mod, page_map.mod),"
+            " content_hash = COALESCE(excluded.content_hash, page_map.content_hash)",
+            [(note_id, database_id, *entry) for (note_id, database_id), entry in self._pending.items()]
+        )
+        self._conn.commit()
+        self._pending = {}
+
+    def __len__(self):
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute("SELECT COUNT(*) FROM page_map").fetchone()[0]
@@ -1,87 +1,607 @@
-#处理anki笔记和各平台之间的笔记转换的问题
-import re
-
-VALID_LANGUAGES = {'python', 'javascript', 'java', 'c', 'c++', 'c#', 'html', 'css', 
-                  'sql', 'typescript', 'php', 'ruby', 'go', 'swift', 'kotlin', 
-                  'plain text'}  # 根据Notion API支持的语言列表精简
-
-def parse_notion_https_for_database_id(url):
-    """从 Notion 数据库链接中提取数据库 ID"""
-    try:
-        # 去除 URL 中的连字符和查询参数
-        url_clean = url.replace('-', '').split('?', 1)[0]
-        # 匹配 32 位十六进制的数据库 ID
-        match = re.search(r'([0-9a-fA-F]{32})', url_clean)
-        if match:
-            database_id = match.group(1)
-            # 格式化为带连字符的 UUID 形式
-            database_id = f"{database_id[0:8]}-{database_id[8:12]}-{database_id[12:16]}-{database_id[16:20]}-{database_id[20:]}"
-            return database_id
-        else:
-            return None
-    except Exception as e:
-        return None
-
-class ToNotionConverter:
-
-    def __init__(self) -> None:
-        pass
-    @staticmethod
-    def convert_anki_html_to_notion_children(html_content: str):
-        # 转换函数：将 Anki 笔记中的 HTML 正文转换为 Notion children 块
-        import re
-        from html import unescape
-        
-        # 处理代码块（提取语言参数）
-        code_blocks = []
-        def code_replacer(m):
-            lang = m.group(1) or ''
-            # 清理语言前缀（处理类似 language-python 的情况）
-            lang = lang.replace('language-', '').lower()
-            code = m.group(2)
-            code_blocks.append({'lang': lang, 'content': unescape(code)})
-            return f'__CODE_BLOCK_{len(code_blocks)-1}__'
-        
-        html_content = re.sub(
-            r'<pre><code(?: class="([^"]*)")?>(.*?)</code></pre>',
-            code_replacer, html_content, flags=re.DOTALL
-        )
-        
-        # 处理内联格式
-        replacements = [
-            (r'<code>(.*?)</code>', r'`\1`'),
-            (r'<strong>(.*?)</strong>', r'**\1**'),
-            (r'<em>(.*?)</em>', r'_\1_'),
-            (r'<del>(.*?)</del>', r'~~\1~~'),
-            (r'<span[^>]*>(.*?)</span>', r'\1')
-        ]
-        for pattern, replacement in replacements:
-            html_content = re.sub(pattern, replacement, html_content, flags=re.DOTALL)
-
-        # 处理列表和段落
-        html_content = re.sub(r'<ul>(.*?)</ul>', 
-            lambda m: '\n'.join(f"- {x.group(1)}" for x in re.finditer(r'<li>(.*?)</li>', m.group(1), re.DOTALL)),
-            html_content, flags=re.DOTALL)
-        
-        # 重建代码块结构
-        children = []
-        for part in re.split(r'__CODE_BLOCK_(\d+)__', html_content):
-            if part.isdigit():
-                index = int(part)
-                children.append({
-                    "object": "block",
-                    "type": "code",
-                    "code": {
-                        "rich_text": [{"type": "text", "text": {"content": code_blocks[index]['content']}}],
-                        "language": code_blocks[index]['lang'] if code_blocks[index]['lang'] in VALID_LANGUAGES else "plain text"
-                    }
-                })
-            elif part.strip():
-                children.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {"rich_text": [{"type": "text", "text": {"content": part.strip()}}]}
-                })
-        
-        return children
-    pass
\ No newline at end of file
+#处理anki笔记和各平台之间的笔记转换的问题
+import hashlib
+import json
+import math
+import re
+from html import escape, unescape
+from functools import partial
+from .payload_shaper import MAX_RICH_TEXT_SEGMENTS, MAX_TEXT_LENGTH, batch_blocks, encoded_size, shape_blocks, split_text
+
+VALID_LANGUAGES = {'python', 'javascript', 'java', 'c', 'c++', 'c#', 'html', 'css', 
+                  'sql', 'typescript', 'php', 'ruby', 'go', 'swift', 'kotlin', 
+                  'plain text'}  # 根据Notion API支持的语言列表精简
+
+# 同步时必须存在的元数据属性
+META_FIELDS = {'Anki ID', 'Deck', 'Tags', 'Note Type', 'First Field',
+               'Creation Time', 'Modification Time', 'Review Count',
+               'Ease Factor', 'Interval', 'Card Type', 'Due Date',
+               'Suspended', 'Lapses', 'Difficulty', 'Stability', 'Retrievability'}
+DATE_FIELDS = {"Creation Time", "Modification Time", "Due Date"}
+NUMBER_FIELDS = {"Anki ID", "Review Count", "Ease Factor", "Interval", "Lapses", "Difficulty", "Stability", "Retrievability"}
+BODY_FIELD = "notion正文"   # 该字段写入页面正文（children），而不是属性
+CARD_SCHEDULE_FIELD = "Card Scheduling"    # 全部卡片的调度信息（card_scheduling_export 为 all_cards 时导出）
+
+# NotionBlockBuilder 使用的标签映射
+_ANNOTATION_NAMES = ("bold", "italic", "code", "strikethrough", "underline")
+_ANNOTATION_TAGS = {"strong": 0, "b": 0, "em": 1, "i": 1, "code": 2,
+                    "del": 3, "s": 3, "strike": 3, "u": 4}    # 标签 → _ANNOTATION_NAMES 中的位
+_ANNOTATION_DICTS = tuple({name: True for bit, name in enumerate(_ANNOTATION_NAMES) if mask >> bit & 1}
+                          for mask in range(1 << len(_ANNOTATION_NAMES)))    # 位掩码 → annotations（生成片段时复制）
+# 位掩码 → 格式键 (annotations, 链接)：没有链接时的正文与代码块（代码块不带 annotations）
+_PLAIN_FORMAT_KEYS = tuple((annotations, None) for annotations in _ANNOTATION_DICTS)
+_CODE_FORMAT_KEYS = (({}, None),) * len(_ANNOTATION_DICTS)
+_HEADING_TAGS = {"h1": "heading_1", "h2": "heading_2", "h3": "heading_3"}
+_BLOCK_TAGS = {"div", "p", "blockquote", "tr", "hr"}
+_STRUCTURE_TAGS = {"a", "br", "pre", "code", "ul", "ol", "li", *_HEADING_TAGS, *_BLOCK_TAGS}
+_LINK_SCHEMES = ("http://", "https://", "mailto:")
+_BLOCK_BOUNDARY = "block"
+_LINE_BREAK = "br"
+_LIST_ITEM = "li"
+# 格式元素 → 位掩码（span、font 不带格式，只是把文字原样接上）
+_ELEMENT_BITS = {**{tag: 1 << bit for tag, bit in _ANNOTATION_TAGS.items()}, "span": 0, "font": 0}
+# 标签名 → 格式标签在 _ANNOTATION_NAMES 中的位，_BLOCK_BOUNDARY、_LINE_BREAK、_LIST_ITEM，或其余结构标签的名称（其余标签忽略）
+_TAG_KINDS = {**{tag: tag for tag in _STRUCTURE_TAGS if tag != "code"},
+              **dict.fromkeys(_BLOCK_TAGS, _BLOCK_BOUNDARY), "br": _LINE_BREAK, "li": _LIST_ITEM,
+              **_ANNOTATION_TAGS}
+# 内部没有标签的格式元素（如 <b>x</b>、<span style="…">x</span>，组：标签名、文字），整个元素一次处理，
+# 只有 span、font 可以带属性（其余带属性的按开始/结束标签处理，例如 <pre> 内带语言的 <code>）；
+# <script>、<style> 元素（内容不是正文，连同标签一起跳过，没有结束标签时跳到末尾）、注释与声明；
+# 或 开始/结束标签（组：斜杠、标签名、属性串；属性值中的 > 须在引号内）
+# 标签名之后必须是空白、/ 或 >，引号外的属性串中不能有 <：`a<b: pass`、`a<b and c<d` 中的 < 按文字处理
+_HTML_TAG = re.compile(r'<(?:(?i:(strong|b|em|i|code|del|s|strike|u|span|font))(?:(?<=[nNtT])\s[^<>]*)?>'
+                       r'([^<]*)</(?i:\1)\s*>|'
+                       r'(?i:script)(?=[\s/>]).*?(?:</(?i:script)\s*>|$)|(?i:style)(?=[\s/>]).*?(?:</(?i:style)\s*>|$)|'
+                       r'!--.*?-->|![^>]*>|'
+                       r'(/?)([a-zA-Z][a-zA-Z0-9-]*(?::[a-zA-Z][a-zA-Z0-9-]*)?)(?=[\s/>])'
+                       r'((?:"[^"]*"|\'[^\']*\'|[^\'"<>])*)>)', re.DOTALL)
+_HTML_ATTRIBUTE = re.compile(r'([^\s=/>]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+
+def parse_notion_https_for_database_id(url):
+    """从 Notion 数据库链接中提取数据库 ID"""
+    try:
+        # 去除 URL 中的连字符和查询参数
+        url_clean = url.replace('-', '').split('?', 1)[0]
+        # 匹配 32 位十六进制的数据库 ID
+        match = re.search(r'([0-9a-fA-F]{32})', url_clean)
+        if match:
+            database_id = match.group(1)
+            # 格式化为带连字符的 UUID 形式
+            database_id = f"{database_id[0:8]}-{database_id[8:12]}-{database_id[12:16]}-{database_id[16:20]}-{database_id[20:]}"
+            return database_id
+        else:
+            return None
+    except Exception as e:
+        return None
+
+def _unescape(text):
+    """解码字符引用：最常见的几个直接替换，其余的交给 html.unescape"""
+    text = text.replace("&nbsp;", "\xa0").replace("&lt;", "<").replace("&gt;", ">")
+    return unescape(text) if "&" in text else text
+
+
+def _attribute(attrs, name):
+    """从属性串中取一个属性的值（同名取最后一个），不存在时为 None"""
+    value = None
+    for match in _HTML_ATTRIBUTE.finditer(attrs):
+        if match.group(1).lower() == name:
+            value = unescape(next(group for group in match.groups()[1:] if group is not None))
+    return value
+
+
+class NotionBlockBuilder:
+    """流式 HTML → Notion 块转换（一次 split 切分标签，原地遍历生成块）"""
+
+    def __init__(self):
+        self.blocks = []
+        self._containers = [self.blocks]    # 新块写入的位置：顶层，或上一级列表项的 children
+        self._lists = []                    # 列表栈：[列表项块类型, 本层最近的列表项块, 是否压入了 children 容器]
+        self._block_type = "paragraph"
+        self._rich_text = []                # 当前块的片段；格式键相同的文字接在最后一个片段上
+        self._segment_key = None            # 最后一个片段的格式键与 text 对象
+        self._segment_text = None
+        self._depths = [0] * len(_ANNOTATION_NAMES)
+        self._mask = 0                      # 生效的 annotations（_ANNOTATION_NAMES 的位掩码）
+        self._links = []
+        self._format_keys = _PLAIN_FORMAT_KEYS    # 当前链接与是否在代码块内对应的 位掩码 → 格式键
+        self._link_format_keys = {}               # (链接, 是否在代码块内) → 位掩码 → 格式键
+        self._format_key = _PLAIN_FORMAT_KEYS[0]
+        self._code_language = None          # 不为 None 时位于 <pre> 内
+
+    def feed(self, html_content):
+        """扫描一段完整的 HTML（标签不能跨两次调用）"""
+        # split 的结果依次为：文字、格式元素的标签名与文字、斜杠、标签名、属性串、文字……；未匹配的组为 None
+        pieces = _HTML_TAG.split(html_content)
+        depths, tag_kinds, element_bits, new_segment = self._depths, _TAG_KINDS, _ELEMENT_BITS, self._new_segment
+        block_boundary, list_item, line_break = _BLOCK_BOUNDARY, _LIST_ITEM, _LINE_BREAK
+        # 格式键不变的文字直接接到当前片段上，格式键变化后才生成新片段
+        mask, keys, key = self._mask, self._format_keys, self._format_key
+        segment_key, segment_text = self._segment_key, self._segment_text
+        for text, element, content, slash, tag, attrs in zip(
+                pieces[0::6], pieces[1::6], pieces[2::6], pieces[3::6], pieces[4::6], pieces[5::6]):
+            if text:
+                if "&" in text:
+                    text = _unescape(text)
+                if segment_key is key:
+                    segment_text["content"] += text
+                else:
+                    segment_text = new_segment(text, key)
+                    segment_key = key
+            if element is not None:
+                # <b>x</b>：文字使用加上该格式后的格式键，之后的格式不变（<pre> 内的 <code>x</code> 同样只是文字）
+                if content:
+                    if "&" in content:
+                        content = _unescape(content)
+                    bits = element_bits.get(element)
+                    if bits is None:
+                        bits = element_bits[element.lower()]
+                    element_key = keys[mask | bits] if bits else key
+                    if segment_key is element_key:
+                        segment_text["content"] += content
+                    else:
+                        segment_text = new_segment(content, element_key)
+                        segment_key = element_key
+                continue
+            if tag is None:
+                continue
+            kind = tag_kinds.get(tag)
+            if kind is None:
+                kind = tag_kinds.get(tag.lower())
+                if kind is None:
+                    continue
+            if kind is block_boundary:
+                # div、p 等：开始与结束都只是结束当前块
+                if segment_key is not None:
+                    self._flush()
+                    segment_key = None
+                continue
+            if kind is list_item:
+                if segment_key is not None:
+                    self._flush()
+                    segment_key = None
+                if not slash and self._lists:
+                    self._block_type = self._lists[-1][0]
+                continue
+            if kind is line_break:
+                if not slash:
+                    if segment_key is key:
+                        segment_text["content"] += "\n"
+                    else:
+                        segment_text = new_segment("\n", key)
+                        segment_key = key
+                continue
+            if kind.__class__ is str or (kind == 2 and self._code_language is not None):
+                # 其余结构标签（<pre> 内的 <code> 也按结构标签处理）
+                tag = kind if kind.__class__ is str else "code"
+                self._mask, self._format_key = mask, key
+                if slash:
+                    self._end_tag(tag)
+                else:
+                    self._start_tag(tag, attrs)
+                    if attrs and attrs[-1] == "/":
+                        self._end_tag(tag)
+                keys, key = self._format_keys, self._format_key
+                segment_key, segment_text = self._segment_key, self._segment_text
+                continue
+            # 格式标签：只在层数 0 ↔ 1 变化时切换位掩码；自闭合的格式标签没有效果
+            depth = depths[kind]
+            if slash:
+                if depth != 1:
+                    if depth:
+                        depths[kind] = depth - 1
+                    continue
+                depths[kind] = 0
+            elif attrs and attrs[-1] == "/":
+                continue
+            else:
+                depths[kind] = depth + 1
+                if depth:
+                    continue
+            mask ^= 1 << kind
+            key = keys[mask]
+        self._mask, self._format_key = mask, key
+        if pieces[-1]:
+            self._text(_unescape(pieces[-1]))
+
+    def close(self):
+        self._flush()
+
+    def _text(self, text):
+        if self._segment_key is self._format_key:
+            self._segment_text["content"] += text
+        else:
+            self._new_segment(text, self._format_key)
+
+    def _new_segment(self, text, key):
+        """在当前块的 rich_text 末尾开始一个新片段，返回其 text 对象（之后格式不变的文字直接接在上面）"""
+        annotations, link = key
+        segment_text = {"content": text, "link": {"url": link}} if link else {"content": text}
+        segment = {"type": "text", "text": segment_text}
+        if annotations:
+            segment["annotations"] = annotations.copy()
+        self._rich_text.append(segment)
+        self._segment_key, self._segment_text = key, segment_text
+        return segment_text
+
+    def _start_tag(self, tag, attrs):
+        """结构标签的开始（div 等块边界、li 与 br 在 feed 中直接处理）"""
+        if tag == "code":
+            language = (_attribute(attrs, "class") or "").replace("language-", "").lower()
+            self._code_language = language if language in VALID_LANGUAGES else "plain text"
+        elif tag == "a":
+            href = _attribute(attrs, "href") or ""
+            self._links.append(href if href.startswith(_LINK_SCHEMES) else None)
+            self._update_format()
+        elif tag == "pre":
+            self._flush()
+            self._code_language = "plain text"
+            self._update_format()
+        elif tag in ("ul", "ol"):
+            self._flush()
+            parent = self._lists[-1][1] if self._lists else None
+            if parent is not None:
+                self._containers.append(parent[parent["type"]].setdefault("children", []))
+            self._lists.append(["bulleted_list_item" if tag == "ul" else "numbered_list_item", None, parent is not None])
+        elif tag in _HEADING_TAGS:
+            self._flush()
+            self._block_type = _HEADING_TAGS[tag]
+
+    def _end_tag(self, tag):
+        if tag == "code":
+            return
+        if tag == "a":
+            if self._links:
+                self._links.pop()
+                self._update_format()
+        elif tag == "pre":
+            self._flush()
+            self._code_language = None
+            self._update_format()
+        elif tag in ("ul", "ol"):
+            self._flush()
+            if self._lists and self._lists.pop()[2]:
+                self._containers.pop()
+            self._block_type = "paragraph"
+        else:
+            self._flush()
+
+    def _update_format(self):
+        """格式键：(annotations, 链接)；代码块不带 annotations，块内只有链接会分开片段
+        同一组格式只对应一个格式键对象，写入文字时用 is 判断格式是否变化"""
+        link = self._links[-1] if self._links else None
+        in_code = self._code_language is not None
+        if link is None:
+            self._format_keys = _CODE_FORMAT_KEYS if in_code else _PLAIN_FORMAT_KEYS
+        else:
+            keys = self._link_format_keys.get((link, in_code))
+            if keys is None:
+                keys = self._link_format_keys[link, in_code] = (
+                    (({}, link),) * len(_ANNOTATION_DICTS) if in_code
+                    else tuple((annotations, link) for annotations in _ANNOTATION_DICTS))
+            self._format_keys = keys
+        self._format_key = self._format_keys[self._mask]
+
+    def _flush(self):
+        """结束当前块：把 rich_text 写入当前容器；没有文字的块不生成"""
+        rich_text = self._rich_text
+        if not rich_text:
+            return
+        self._rich_text = []
+        self._segment_key = self._segment_text = None
+        is_code = self._code_language is not None
+        if not is_code:
+            # 去掉块首尾的空白（代码块保留原样）；只有空白的片段整个去掉
+            while rich_text:
+                content = rich_text[0]["text"]["content"].lstrip()
+                if content:
+                    rich_text[0]["text"]["content"] = content
+                    break
+                del rich_text[0]
+            while rich_text:
+                content = rich_text[-1]["text"]["content"].rstrip()
+                if content:
+                    rich_text[-1]["text"]["content"] = content
+                    break
+                rich_text.pop()
+            if not rich_text:
+                return
+        block_type = "code" if is_code else self._block_type
+        block = {"object": "block", "type": block_type, block_type: {"rich_text": rich_text}}
+        if is_code:
+            block["code"]["language"] = self._code_language
+        elif block_type in ("bulleted_list_item", "numbered_list_item") and self._lists:
+            self._lists[-1][1] = block
+        self._containers[-1].append(block)
+        self._block_type = "paragraph"
+
+
+class ToNotionConverter:
+    """Anki → Notion 转换（不依赖 aqt，可在子进程中使用）"""
+
+    def __init__(self) -> None:
+        pass
+
+    @staticmethod
+    def property_type(field) -> str:
+        """字段对应的 Notion 属性类型"""
+        if field in DATE_FIELDS:
+            return "date"
+        if field == "Tags":
+            return "multi_select"
+        if field in NUMBER_FIELDS:
+            return "number"
+        if field == "Suspended":
+            return "checkbox"
+        return "rich_text"
+
+    @staticmethod
+    def expected_property_types(required_fields) -> dict:
+        """根据字段集合生成数据库属性的预期类型映射（自动补充元数据字段）"""
+        required_fields = set(required_fields) | META_FIELDS
+        required_fields.discard(BODY_FIELD)   #notion正文并不是必要字段（应该放到notion_children中，而不是属性中）
+        return {field: ToNotionConverter.property_type(field) for field in required_fields}
+
+    @staticmethod
+    def convert_properties(note_properties):
+        """
+        根据处理后的笔记数据构建 Notion 页面属性字典（编码表按字段集合编译一次，见 PropertyEncoder）
+        """
+        return PropertyEncoder.for_fields(note_properties).encode(note_properties)
+
+    @staticmethod
+    def content_hash(data, children) -> str:
+        """转换后内容的稳定摘要 "属性摘要:正文摘要"（键排序后序列化），正文摘要单独比较，正文未变时覆盖不必重写正文"""
+        return f"{ToNotionConverter._digest(data)}:{ToNotionConverter._digest(children)}"
+
+    @staticmethod
+    def _digest(value) -> str:
+        encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def build_operation(snapshot, conversion_cache=None) -> dict:
+        """将笔记快照（NoteSnapshot）转换为 batch_update_database 所需的操作
+        提供 conversion_cache（ConversionCache）时，正文相同的笔记只转换一次"""
+        # 载荷整形：长文字切成不超过 2000 字符的片段；正文块第一批随创建请求发送，其余批次（extra_children）创建后依次追加
+        data = ToNotionConverter.convert_properties(snapshot.properties())
+        children = []
+        if snapshot.body_html:
+            if conversion_cache is not None:
+                children = conversion_cache.get_or_convert(snapshot.body_html, ToNotionConverter.convert_body)
+            else:
+                children = ToNotionConverter.convert_body(snapshot.body_html)
+        batches = batch_blocks(children, first_reserved=encoded_size(data))
+        operation = {
+            "data": data,
+            "children": batches[0],
+            "extra_children": batches[1:],
+            "note_id": snapshot.note_id,
+            "mod": snapshot.mod,
+            "content_hash": ToNotionConverter.content_hash(data, children)
+        }
+        # 修改重复检查条件：
+        # 1. 从 "First Field" 读取真实的首字段名称
+        # 2. 再从 properties 中取出该字段的实际值（可能被切成多个片段）
+        first_field_property_name = operation["data"]["First Field"]["rich_text"][0]["text"]["content"]
+        first_field_value = "".join(segment["text"]["content"] for segment in operation["data"][first_field_property_name]["rich_text"])
+        note_type = operation["data"]["Note Type"]["rich_text"][0]["text"]["content"]
+        # duplicate_key 供本地重复索引（DuplicateIndex）使用，duplicate_check 供逐条查询与创建后核实使用
+        operation["duplicate_key"] = (note_type, first_field_value)
+        operation["duplicate_check"] = {
+            "filter": {
+                "and": [
+                    {
+                        "property": "Note Type",
+                        "rich_text": {
+                            "equals": note_type
+                        }
+                    },
+                    {
+                        "property": first_field_property_name,
+                        "rich_text": {
+                            "equals": first_field_value
+                        }
+                    }
+                ]
+            }
+        }
+        return operation
+    @staticmethod
+    def convert_body(html_content: str) -> list:
+        """正文 HTML → 经过载荷整形的 children 块"""
+        return shape_blocks(ToNotionConverter.convert_anki_html_to_notion_children(html_content))
+
+    @staticmethod
+    def convert_anki_html_to_notion_children(html_content: str):
+        # 转换函数：将 Anki 笔记中的 HTML 正文转换为 Notion children 块（格式见 NotionBlockBuilder）
+        builder = NotionBlockBuilder()
+        builder.feed(html_content)
+        builder.close()
+        return builder.blocks
+    pass
+
+
+def _encode_date(value):
+    return {"date": {"start": str(value)}}
+
+
+def _encode_tags(value):
+    if isinstance(value, str):
+        return {"multi_select": [{"name": tag.strip()} for tag in value.split(",") if tag.strip()]}
+    return {"multi_select": value}
+
+
+def _encode_number(field, value):
+    if type(value) is int:
+        return {"number": value}
+    if type(value) is float and math.isfinite(value):
+        return {"number": value}
+    # 处理可能存在的嵌套数值结构（如 FSRS 参数）
+    if isinstance(value, dict) and 'number' in value:
+        return {"number": value['number']}
+    try:
+        return {"number": int(value)}
+    except (ValueError, TypeError):
+        pass
+    try:
+        number = float(value)
+        if math.isfinite(number):
+            return {"number": number}
+    except (ValueError, TypeError):
+        pass
+    print(f"警告：字段 {field} 的值 {value} 无法转换为数字，已设置为 0")
+    return {"number": 0}
+
+
+def _encode_checkbox(value):
+    return {"checkbox": bool(value)}
+
+
+def _encode_rich_text(field, value):
+    text = value if type(value) is str else str(value)
+    if len(text) <= MAX_TEXT_LENGTH // 2:
+        # 不超过 1000 个字符时 UTF-16 码元数一定不超过 2000，无需切分
+        return {"rich_text": [{"text": {"content": text}}]}
+    # 长文本切成不超过 2000 字符的片段；属性值无法拆分，超过 100 个片段的部分被截断
+    pieces = split_text(text)
+    if len(pieces) > MAX_RICH_TEXT_SEGMENTS:
+        print(f"警告：属性 {field} 超过 Notion 的长度上限，超出部分已截断")
+        pieces = pieces[:MAX_RICH_TEXT_SEGMENTS]
+    return {"rich_text": [{"text": {"content": piece}} for piece in pieces]}
+
+
+class PropertyEncoder:
+    """按字段集合编译一次的属性编码表：字段 → 编码函数"""
+
+    MAX_COMPILED = 256
+    _compiled = {}
+
+    def __init__(self, fields):
+        self.table = {field: self.compile_field(field) for field in fields}
+
+    @classmethod
+    def for_fields(cls, fields):
+        key = tuple(fields)
+        encoder = cls._compiled.get(key)
+        if encoder is None:
+            if len(cls._compiled) >= cls.MAX_COMPILED:
+                cls._compiled.clear()
+            encoder = cls._compiled[key] = cls(key)
+        return encoder
+
+    @staticmethod
+    def compile_field(field):
+        property_type = ToNotionConverter.property_type(field)
+        if property_type == "date":
+            return _encode_date
+        if property_type == "multi_select":
+            return _encode_tags
+        if property_type == "number":
+            return partial(_encode_number, field)
+        if property_type == "checkbox":
+            return _encode_checkbox
+        return partial(_encode_rich_text, field)
+
+    def encode(self, note_properties) -> dict:
+        table = self.table
+        return {field: table[field](value) for field, value in note_properties.items() if value is not None}
+
+
+# ToAnkiConverter 使用的映射；格式标签由内向外包裹
+_RENDER_ANNOTATIONS = (("code", "code"), ("bold", "b"), ("italic", "i"), ("strikethrough", "s"), ("underline", "u"))
+_RENDER_HEADINGS = {"heading_1": "h1", "heading_2": "h2", "heading_3": "h3"}
+_RENDER_LISTS = {"bulleted_list_item": "ul", "numbered_list_item": "ol"}
+
+
+class ToAnkiConverter:
+    """Notion → Anki 转换（不依赖 aqt，可在子进程中使用）"""
+
+    @staticmethod
+    def render_rich_text(rich_text) -> str:
+        parts = []
+        for segment in rich_text or []:
+            if segment.get("type") == "equation":
+                parts.append(f"\\({escape(segment['equation'].get('expression', ''), quote=False)}\\)")
+                continue
+            text = segment.get("text") or {}
+            content = text.get("content", segment.get("plain_text", ""))
+            if not content:
+                continue
+            html = escape(content, quote=False).replace("\n", "<br>")
+            annotations = segment.get("annotations") or {}
+            for name, tag in _RENDER_ANNOTATIONS:
+                if annotations.get(name):
+                    html = f"<{tag}>{html}</{tag}>"
+            url = (text.get("link") or {}).get("url") or segment.get("href")
+            if url and url.startswith(_LINK_SCHEMES):
+                html = f'<a href="{escape(url)}">{html}</a>'
+            parts.append(html)
+        return "".join(parts)
+
+    @staticmethod
+    def render_blocks(blocks) -> str:
+        out = []
+        ToAnkiConverter._render_into(out, blocks)
+        return "".join(out)
+
+    @staticmethod
+    def _render_into(out, blocks):
+        open_list = None    # 连续的同类列表项共用一个 <ul>/<ol>
+        for block in blocks:
+            block_type = block.get("type")
+            content = block.get(block_type) or {}
+            children = block.get("children") or content.get("children") or []
+            list_tag = _RENDER_LISTS.get(block_type)
+            if list_tag != open_list:
+                if open_list:
+                    out.append(f"</{open_list}>")
+                if list_tag:
+                    out.append(f"<{list_tag}>")
+                open_list = list_tag
+
+            if list_tag:
+                out.append("<li>" + ToAnkiConverter.render_rich_text(content.get("rich_text")))
+                ToAnkiConverter._render_into(out, children)
+                out.append("</li>")
+            elif block_type == "code":
+                code = "".join(segment.get("plain_text") or (segment.get("text") or {}).get("content", "")
+                               for segment in content.get("rich_text") or [])
+                language = escape(content.get("language") or "plain text")
+                out.append(f'<pre><code class="language-{language}">{escape(code, quote=False)}</code></pre>')
+            elif block_type in _RENDER_HEADINGS:
+                tag = _RENDER_HEADINGS[block_type]
+                out.append(f"<{tag}>{ToAnkiConverter.render_rich_text(content.get('rich_text'))}</{tag}>")
+                ToAnkiConverter._render_into(out, children)
+            elif block_type == "quote":
+                out.append("<blockquote>" + ToAnkiConverter.render_rich_text(content.get("rich_text")))
+                ToAnkiConverter._render_into(out, children)
+                out.append("</blockquote>")
+            elif block_type == "toggle":
+                out.append(f"<details><summary>{ToAnkiConverter.render_rich_text(content.get('rich_text'))}</summary>")
+                ToAnkiConverter._render_into(out, children)
+                out.append("</details>")
+            elif block_type == "to_do":
+                mark = "☑ " if content.get("checked") else "☐ "
+                out.append(f"<div>{mark}{ToAnkiConverter.render_rich_text(content.get('rich_text'))}</div>")
+                ToAnkiConverter._render_into(out, children)
+            elif block_type == "equation":
+                out.append(f"<div>\\[{escape(content.get('expression', ''), quote=False)}\\]</div>")
+            elif block_type == "divider":
+                out.append("<hr>")
+            elif block_type == "image":
+                url = (content.get(content.get("type")) or {}).get("url")
+                if url:
+                    out.append(f'<img src="{escape(url)}">')
+            elif block_type == "table":
+                out.append("<table>")
+                for row in children:
+                    cells = (row.get("table_row") or {}).get("cells") or []
+                    out.append("<tr>" + "".join(f"<td>{ToAnkiConverter.render_rich_text(cell)}</td>" for cell in cells) + "</tr>")
+                out.append("</table>")
+            else:
+                # 段落、callout 以及其它带 rich_text 的块按段落输出，空段落省略
+                text = ToAnkiConverter.render_rich_text(content.get("rich_text"))
+                if text:
+                    out.append(f"<div>{text}</div>")
+                ToAnkiConverter._render_into(out, children)
+        if open_list:
+            out.append(f"</{open_list}>")
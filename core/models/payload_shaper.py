@@ -0,0 +1,115 @@
+# Notion 请求载荷整形：把转换得到的属性与正文块调整到 Notion API 的限制之内
+# - rich_text 每个片段的 text.content 不超过 2000 个字符（按 UTF-16 码元计），每个 rich_text 数组不超过 100 个片段
+# - 每个 children 数组不超过 100 个块，单次请求的块最多嵌套两层
+# - 单次请求的块总数不超过 1000，请求体不超过约 500KB
+import json
+
+MAX_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_SEGMENTS = 100
+MAX_CHILDREN = 100
+MAX_NESTING = 2
+MAX_REQUEST_BLOCKS = 1000
+MAX_REQUEST_BYTES = 450_000     # Notion 的上限约为 500KB，留出请求中其它部分的余量
+
+
+def _utf16_length(text) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def encoded_size(value) -> int:
+    """与 httpx 发送请求体时相同的序列化方式（紧凑、不转义非 ASCII 字符）下的字节数"""
+    return len(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def split_text(text, limit=MAX_TEXT_LENGTH) -> list:
+    """把文本切成若干段，每段不超过 limit 个 UTF-16 码元（emoji 等字符占两个）"""
+    if len(text) <= limit and (text.isascii() or _utf16_length(text) <= limit):
+        return [text]
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(start + limit, len(text))
+        excess = _utf16_length(text[start:end]) - limit
+        while excess > 0:
+            # 每个字符最多占两个码元，至少需要去掉 excess / 2 个字符
+            end -= (excess + 1) // 2
+            excess = _utf16_length(text[start:end]) - limit
+        pieces.append(text[start:end])
+        start = end
+    return pieces
+
+
+def chunk_rich_text(rich_text) -> list:
+    """把超长的文字片段切成多个格式相同的片段；非文字片段（mention、equation）原样保留"""
+    shaped = []
+    for segment in rich_text:
+        text = segment.get("text")
+        pieces = split_text(text.get("content", "")) if text else None
+        if not pieces or len(pieces) == 1:
+            shaped.append(segment)
+            continue
+        for piece in pieces:
+            shaped.append({**segment, "text": {**text, "content": piece}})
+    return shaped
+
+
+def shape_blocks(blocks, depth=1) -> list:
+    """切分块内的 rich_text，超过 100 个片段的块拆成多个同类型的块；
+    超出嵌套层数或超过 100 个的子块提升到当前层，紧随其父块之后"""
+    shaped = []
+    for block in blocks:
+        block_type = block.get("type")
+        content = block.get(block_type)
+        if not isinstance(content, dict):
+            shaped.append(block)
+            continue
+        children = content.get("children") or []
+        content = {key: value for key, value in content.items() if key != "children"}
+        if "rich_text" in content:
+            rich_text = chunk_rich_text(content["rich_text"])
+            groups = [rich_text[i:i + MAX_RICH_TEXT_SEGMENTS]
+                      for i in range(0, len(rich_text), MAX_RICH_TEXT_SEGMENTS)] or [rich_text]
+            pieces = [{**block, block_type: {**content, "rich_text": group}} for group in groups]
+        else:
+            pieces = [{**block, block_type: content}]
+        shaped.extend(pieces)
+        if not children:
+            continue
+        if depth < MAX_NESTING:
+            nested = shape_blocks(children, depth + 1)
+            kept, lifted = nested[:MAX_CHILDREN], nested[MAX_CHILDREN:]
+        else:
+            kept, lifted = [], shape_blocks(children, depth)
+        if kept:
+            pieces[-1][block_type]["children"] = kept
+        shaped.extend(lifted)
+    return shaped
+
+
+def _block_count(block) -> int:
+    content = block.get(block.get("type"))
+    children = content.get("children", []) if isinstance(content, dict) else []
+    return 1 + sum(_block_count(child) for child in children)
+
+
+def batch_blocks(blocks, first_reserved=0) -> list:
+    """按块数（100）、含子块的块总数（1000）与序列化大小把顶层块分批，至少返回一批（可能为空）
+    第一批随 pages.create 发送，first_reserved 为同一请求中属性等部分占用的字节数；其余批次依次追加"""
+    batches = []
+    batch, size, count = [], first_reserved, 0
+    for block in blocks:
+        block_size = encoded_size(block) + 1
+        block_count = _block_count(block)
+        full = (len(batch) >= MAX_CHILDREN
+                or size + block_size > MAX_REQUEST_BYTES
+                or count + block_count > MAX_REQUEST_BLOCKS)
+        # 第一批可以为空（属性本身已接近大小上限），之后的每批至少包含一个块
+        if full and (batch or not batches and first_reserved):
+            batches.append(batch)
+            batch, size, count = [], 0, 0
+        batch.append(block)
+        size += block_size
+        count += block_count
+    if batch or not batches:
+        batches.append(batch)
+    return batches
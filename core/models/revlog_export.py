@@ -0,0 +1,88 @@
+# 复习记录（revlog）导出：按笔记分块读取待同步笔记的复习记录，按笔记聚合为配套数据库的页面
+# 每块只查询一组笔记（c.nid IN (...)），不扫描整个 revlog；同一笔记的记录总在同一块中，页面划分与块大小无关
+import json
+from datetime import datetime
+from .payload_shaper import split_text
+
+REVLOG_CHUNK_SIZE = 200      # 每块读取的笔记数
+MAX_ROWS_PER_PAGE = 1000     # 每个页面最多容纳的复习记录（约 50KB 文本，远低于 rich_text 100 个片段的上限）
+
+# 配套数据库的属性及类型（由 ensure_database_properties 自动补充）
+REVLOG_PROPERTY_TYPES = {
+    "Anki ID": "number",
+    "Revlog Key": "rich_text",
+    "Reviews": "number",
+    "First Review": "date",
+    "Last Review": "date",
+    "Review Log": "rich_text",
+}
+# Review Log 中每条记录的列（均取自 revlog 表，nid 由 cards 表关联得到，不重复存放）
+REVLOG_COLUMNS = ("id", "cid", "ease", "ivl", "lastIvl", "factor", "time", "type")
+
+
+class RevlogExtractor:
+    """按笔记分块读取待同步笔记的复习记录"""
+
+    def __init__(self, col, note_ids, chunk_size=REVLOG_CHUNK_SIZE):
+        self.col = col
+        self.note_ids = sorted({int(note_id) for note_id in note_ids})
+        self.chunk_size = max(1, int(chunk_size))
+
+    def latest_id(self):
+        """当前最大的 revlog id，没有复习记录时为 None"""
+        return self.col.db.scalar("SELECT max(id) FROM revlog")
+
+    def note_chunks(self, after_nid=0) -> list:
+        """笔记id大于 after_nid 的待同步笔记，按 chunk_size 分块"""
+        note_ids = [note_id for note_id in self.note_ids if note_id > after_nid]
+        return [note_ids[i:i + self.chunk_size] for i in range(0, len(note_ids), self.chunk_size)]
+
+    def read_chunk(self, note_ids, after_id, upto_id) -> list:
+        """读取一块笔记的复习记录，行的格式为 (nid, *REVLOG_COLUMNS)，按 (nid, revlog.id) 升序
+        id 以整数字面量拼接，不受 SQLite 参数个数上限限制"""
+        ids = ",".join(str(int(note_id)) for note_id in note_ids)
+        return self.col.db.all(
+            "SELECT c.nid, r.id, r.cid, r.ease, r.ivl, r.lastIvl, r.factor, r.time, r.type "
+            f"FROM revlog r JOIN cards c ON c.id = r.cid WHERE c.nid IN ({ids}) AND r.id > ? AND r.id <= ? "
+            "ORDER BY c.nid, r.id",
+            after_id, upto_id
+        )
+
+
+def _rich_text(text) -> dict:
+    return {"rich_text": [{"text": {"content": piece}} for piece in split_text(text)]}
+
+
+def _review_time(revlog_id) -> dict:
+    return {"date": {"start": datetime.fromtimestamp(revlog_id / 1000).astimezone().isoformat()}}
+
+
+def revlog_operations(rows) -> list:
+    """把一块复习记录按笔记聚合为页面操作（格式与 ToNotionConverter.build_operation 一致，可交给 batch_update_database）
+    同一笔记的记录按顺序每 MAX_ROWS_PER_PAGE 条一个页面；Revlog Key（笔记id:首条记录id:末条记录id）只取决于
+    笔记与导出范围，与块大小无关，重新导出同一范围时据此跳过已创建的页面"""
+    by_note = {}
+    for nid, *columns in rows:
+        by_note.setdefault(nid, []).append(columns)
+    operations = []
+    for nid, reviews in by_note.items():
+        for start in range(0, len(reviews), MAX_ROWS_PER_PAGE):
+            group = reviews[start:start + MAX_ROWS_PER_PAGE]
+            key = f"{nid}:{group[0][0]}:{group[-1][0]}"
+            duplicate_filter = {"property": "Revlog Key", "rich_text": {"equals": key}}
+            operations.append({
+                "data": {
+                    "Anki ID": {"number": nid},
+                    "Revlog Key": _rich_text(key),
+                    "Reviews": {"number": len(group)},
+                    "First Review": _review_time(group[0][0]),
+                    "Last Review": _review_time(group[-1][0]),
+                    "Review Log": _rich_text(json.dumps(group, separators=(",", ":"))),
+                },
+                "children": [],
+                "extra_children": [],
+                "note_id": nid,
+                "duplicate_key": key,
+                "duplicate_check": {"filter": duplicate_filter},
+            })
+    return operations
@@ -0,0 +1,38 @@
+# 数据库结构规划：待同步笔记需要的属性只取决于涉及的笔记类型，与笔记条数无关
+# 一条 SQL 聚合出涉及的笔记类型（mid），字段名取自笔记类型定义，代替逐条读取笔记收集字段
+from .parse_and_converter import ToNotionConverter
+
+
+class SchemaPlanner:
+    """按笔记类型推导数据库属性的预期类型"""
+
+    _expected_types = {}    # mid → (mod, {字段名: 属性类型})
+
+    def __init__(self, col):
+        self.col = col
+
+    def note_type_ids(self, note_ids) -> list:
+        """待同步笔记涉及的笔记类型id（一条 SQL 聚合；id 以整数字面量拼接，不受 SQLite 参数个数上限限制）"""
+        if not note_ids:
+            return []
+        ids = ",".join(str(int(note_id)) for note_id in note_ids)
+        return self.col.db.list(f"SELECT DISTINCT mid FROM notes WHERE id IN ({ids})")
+
+    def note_type_property_types(self, mid) -> dict:
+        """一个笔记类型的 字段名 → 属性类型，笔记类型不存在时为空"""
+        model = self.col.models.get(mid)
+        if not model:
+            return {}
+        cached = self._expected_types.get(mid)
+        if cached is not None and cached[0] == model["mod"]:
+            return cached[1]
+        expected = {field["name"]: ToNotionConverter.property_type(field["name"]) for field in model["flds"]}
+        self._expected_types[mid] = (model["mod"], expected)
+        return expected
+
+    def required_fields(self, note_ids) -> set:
+        """待同步笔记的模板字段（与逐条收集 note.keys() 的结果相同）"""
+        fields = set()
+        for mid in self.note_type_ids(note_ids):
+            fields.update(self.note_type_property_types(mid))
+        return fields
@@ -0,0 +1,46 @@
+# 增量同步的水位线：记录每个同步范围上次成功同步到的位置，与页面映射保存在同一个 SQLite 文件中
+import os
+import sqlite3
+import threading
+from .page_map import DEFAULT_PAGE_MAP_PATH
+
+
+class WatermarkStore:
+    """同步范围（如 方向 + 数据库id + 查询条件）→ 水位线"""
+
+    def __init__(self, path=DEFAULT_PAGE_MAP_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks (scope TEXT PRIMARY KEY, value)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def scope(*parts) -> str:
+        return "|".join(str(part) for part in parts)
+
+    def get(self, scope, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM watermarks WHERE scope = ?", (scope,)).fetchone()
+        return row[0] if row else default
+
+    def set(self, scope, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO watermarks (scope, value) VALUES (?, ?) "
+                "ON CONFLICT (scope) DO UPDATE SET value = excluded.value",
+                (scope, value)
+            )
+            self._conn.commit()
+
+    def reset(self, scope):
+        """删除水位线，下次同步回到全量"""
+        with self._lock:
+            self._conn.execute("DELETE FROM watermarks WHERE scope = ?", (scope,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
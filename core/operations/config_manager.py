@@ -4,6 +4,9 @@ import json
 import os
 from typing import Dict, Any
 
+# 本文件位于 core/operations，config.json 在插件根目录（与设置对话框读写的是同一个文件）
+CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'config.json'))
+
 class ConfigManager:
     def __init__(self):
         self._config = {}
@@ -11,14 +14,12 @@ class ConfigManager:
 
         
     def load_config(self):
-        config_path = os.path.join(os.path.dirname(__file__), '../config.json')
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
+        if os.path.exists(CONFIG_PATH):
+            with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
                 self._config = json.load(f)
 
     def save_config(self):
-        config_path = os.path.join(os.path.dirname(__file__), '../config.json')
-        with open(config_path, 'w', encoding='utf-8') as f:
+        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
             json.dump(self._config, f, ensure_ascii=False, indent=2)
 
     def get(self, key: str, default=None) -> Any:
@@ -1,18 +1,77 @@
-# 专门负责多进程任务调度和管理，将耗时任务放到独立的进程中执行，避免阻塞主进程
-from multiprocessing import Process
+# 专门负责任务调度和管理，将耗时任务放到后台线程或独立的子进程中执行，避免阻塞主进程
+import threading
+from aqt import mw
+from aqt.operations import QueryOp
 from .config_manager import ConfigManager
 
 class SyncExecutor:
-    """多进程任务执行器（命令模式）"""
-    
+    """同步任务执行器（命令模式）"""
+
     def __init__(self):
         self.config = ConfigManager()
-    
+
     def execute_strategy(self, strategy):
-        """启动子进程执行策略"""
-        def worker():
-            strategy.execute(self.config)
-        worker()    
-        # p = Process(target=worker)
-        # p.start()
-        # 先不实现多进程，保持简单
\ No newline at end of file
+        """执行策略"""
+        if self.config.get('background_sync', True) and strategy.supports_background:
+            self._execute_in_background(strategy)
+        else:
+            strategy.execute_sync_strategy()
+
+    def _execute_in_background(self, strategy):
+        """通过 QueryOp 在后台线程执行同步，并显示带取消按钮的进度条"""
+        from ...gui.progress_dialog import SyncProgressDialog
+
+        # Step 1——提取id：读取集合的策略在主线程执行（find_notes 很快），其余（如查询 Notion）在后台线程执行
+        note_ids = list(strategy.get_ids_from_source()) if strategy.source_on_main else None
+        dialog = SyncProgressDialog(len(note_ids or ()), self.config.get('language', '中文'), mw)
+        dialog.show()
+
+        def report_progress(done, total):
+            mw.taskman.run_on_main(lambda: dialog.update_progress(done, total))
+
+        # process_isolated_sync 开启时，转换与上传交给独立子进程，后台线程只负责投递载荷
+        execute = strategy.execute_in_process if self.config.get('process_isolated_sync', False) else strategy.execute_in_slices
+
+        def op(col):
+            # 后台线程：不直接访问 col，集合读写交给 call_on_main
+            ids = note_ids if note_ids is not None else list(strategy.get_ids_from_source())
+            return execute(
+                ids,
+                call_on_main=self.call_on_main,
+                progress_callback=report_progress,
+                is_cancelled=dialog.is_cancelled
+            )
+
+        def on_success(result):
+            dialog.close()
+            strategy.finish_sync(result)
+
+        def on_failure(error):
+            dialog.close()
+            print("后台同步失败:", error)
+
+        query_op = QueryOp(parent=mw, op=op, success=on_success).failure(on_failure)
+        # 后台线程本身不使用集合，允许其与其它集合操作并行
+        if hasattr(query_op, 'without_collection'):
+            query_op = query_op.without_collection()
+        query_op.run_in_background()
+
+    @staticmethod
+    def call_on_main(function, *args, **kwargs):
+        """在主线程执行 function 并阻塞等待结果（供后台线程读写集合）"""
+        done = threading.Event()
+        outcome = {}
+
+        def runner():
+            try:
+                outcome['result'] = function(*args, **kwargs)
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                done.set()
+
+        mw.taskman.run_on_main(runner)
+        done.wait()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome.get('result')
@@ -0,0 +1,43 @@
+# 流式同步流水线：提取 → 转换 → 上传 通过生成器串联，各环节之间只保留有界缓冲，
+# 第一条笔记提取完成即可开始上传，峰值内存与笔记总数无关。
+# 本模块不依赖 aqt，子进程中同样可以使用。
+import asyncio
+import traceback
+
+
+def conversion_failure(snapshot, error) -> dict:
+    """转换失败的笔记记为失败结果，格式与 batch_update_database 的 failed 项一致"""
+    return {
+        'operation': {'note_id': snapshot.note_id},
+        'error': str(error),
+        'trace': traceback.format_exc(),
+        'retries': 0
+    }
+
+
+def convert_each(snapshots, convert, on_error):
+    """逐条转换笔记快照；转换失败的笔记交给 on_error 并跳过，不影响后续笔记"""
+    for snapshot in snapshots:
+        try:
+            yield convert(snapshot)
+        except Exception as e:
+            on_error(conversion_failure(snapshot, e))
+
+
+async def aconvert_each(snapshots, convert, on_error):
+    """convert_each 的异步版本，snapshots 为异步可迭代对象"""
+    async for snapshot in snapshots:
+        try:
+            yield convert(snapshot)
+        except Exception as e:
+            on_error(conversion_failure(snapshot, e))
+
+
+async def aiter_slices(slices, load_slice, is_cancelled=None):
+    """逐片加载并逐条产出；load_slice 可能阻塞（如等待主线程读取集合），放到线程池中执行，
+    不阻塞事件循环中的在途请求。同一时刻只持有一片数据"""
+    for chunk in slices:
+        if is_cancelled and is_cancelled():
+            return
+        for item in await asyncio.to_thread(load_slice, chunk):
+            yield item
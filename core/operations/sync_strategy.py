@@ -3,46 +3,62 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any ,Iterable
 from datetime import datetime
 from aqt import mw
-from ..utils import Helpers
-from ..models.note import Note
+from aqt.operations import CollectionOp
+from anki.utils import field_checksum, split_fields, strip_html_media
 import json
 import os
+import time
+import traceback
+from functools import partial
 from ..client.notion_client import NotionClient
-from ..models.parse_and_converter import ToNotionConverter,parse_notion_https_for_database_id
+from ..client.retry_policy import RetryPolicy
+from ..models.parse_and_converter import ToNotionConverter,parse_notion_https_for_database_id, BODY_FIELD, CARD_SCHEDULE_FIELD
 from aqt.qt import debug
 from .config_manager import ConfigManager
-from .note_factory import NoteFactory
+from .sync_worker import ProcessSyncWorker, MSG_SCHEMA, MSG_NOTES
+from .sync_pipeline import aconvert_each, aiter_slices, convert_each
+from ..models.bulk_extractor import BulkExtractor
+from ..models.extraction_context import ExtractionContext
+from ..models.note import NoteFactory
+from ..models.note_snapshot import NoteSnapshot
+from ..models.page_map import PageMap
+from ..models.revlog_export import REVLOG_CHUNK_SIZE, REVLOG_PROPERTY_TYPES, RevlogExtractor, revlog_operations
+from ..models.schema_planner import SchemaPlanner
+from ..models.conversion_cache import ConversionCache
+from ..models.watermark import WatermarkStore
 
 
 
 class SourceToTargetSyncStrategy(ABC):
     """同步策略抽象基类（策略模式）"""
-    
+
+    # 是否支持由 SyncExecutor 分片放到后台线程执行（需实现 execute_in_slices）
+    supports_background = False
+    # get_ids_from_source 是否需要在主线程执行（读取集合）；为 False 时后台执行时也在后台线程读取
+    source_on_main = True
+
     @abstractmethod
-    @staticmethod
-    def get_ids_from_source() -> Iterable:
+    def get_ids_from_source(self) -> Iterable:
         """从源侧获取需要传输的笔记id"""
         pass
-    
+
     @abstractmethod
     def ensure_database_structure_of_target(self, note_ids:Iterable) -> None:
         """确保目标侧的数据库格式符合要求"""
         pass
-    
-    @abstractmethod    
+
+    @abstractmethod
     def update_database_of_target(self,note_ids:Iterable)-> Iterable:
         """更新目标测的数据库"""
         pass
-    
+
     @abstractmethod
-    @staticmethod
-    def delete_source_notes(succeeded_note_ids:Iterable) -> None:
+    def delete_source_notes(self, succeeded_note_ids:Iterable) -> None:
         """如有需要，安全删除已成功同步的源侧笔记"""
         pass
-    
+
     @abstractmethod
-    @staticmethod
-    def show_sync_result(result) -> None:
+    def show_sync_result(self, result) -> None:
         """同步成功后，展现同步结果"""
         pass
 
@@ -52,7 +68,7 @@ class SourceToTargetSyncStrategy(ABC):
         Step1-提取待传输笔记的id，
         Step2-确保数据库结构符合预期，不存在或类型不匹配的属性自动更新
         Step3-更新notion数据库,Step4-删除源侧笔记（如有必要）,Step5-展示同步情况"""
-        
+
         # Step 1——提取id
         note_ids = self.get_ids_from_source()
 
@@ -62,6 +78,11 @@ class SourceToTargetSyncStrategy(ABC):
         # Step 3——更新notion数据库
         result = self.update_database_of_target(note_ids)
 
+        # Step 4、5——删除源侧笔记（如有必要）并展示同步情况
+        self.finish_sync(result)
+
+    def finish_sync(self, result):
+        """同步收尾：Step4-删除源侧笔记（如有必要），Step5-展示同步情况"""
         # Step 4——删除源侧笔记（如有必要）        
         # 根据返回结果提取实际成功同步的笔记ID
         # 添加 if op.get("operation") 的作用是为了筛选出那些实际进行了"操作"的记录。原因如下：
@@ -69,7 +90,7 @@ class SourceToTargetSyncStrategy(ABC):
         # 当我们计划删除源侧（Anki）的笔记时，我们希望只删除那些已经实际同步成功并且确实进行了创建或更新操作的笔记。通过判断 op.get("operation")，可以排除掉那些被跳过（记录中可能没有 operation 信息）的笔记，从而避免误删。
         succeeded_ids = [item["operation"]["note_id"] for item in result.get("success", []) if item.get("action") in ["create", "update"]]
         # 根据配置决定是否删除源笔记
-        config = mw.addonManager.getConfig("anki_repository_v2")
+        config = ConfigManager()
         if config.get("delete_source_note"):
             self.delete_source_notes(succeeded_ids)
 
@@ -78,190 +99,401 @@ class SourceToTargetSyncStrategy(ABC):
 
 class AnkiToNotionStrategy(SourceToTargetSyncStrategy):
     """Anki → Notion 同步策略"""
-    
+
+    supports_background = True
+
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
         # 初始化时获取最新配置
         self.config_manager.reload_config()
-        self.client = NotionClient(self.config_manager.get('notion_token'))
+        self.client = NotionClient(
+            self.config_manager.get('notion_token'),
+            requests_per_second=self.config_manager.get('notion_requests_per_second'),
+            burst=self.config_manager.get('notion_burst')
+        )
         self.database_id = parse_notion_https_for_database_id(self.config_manager.get('notion_database_url'))
-    
-    @staticmethod
-    def get_ids_from_source():
-        """获取待同步的Anki笔记"""
+
+    def get_ids_from_source(self):
+        """获取待同步的Anki笔记；incremental_sync 开启时只返回上次成功同步之后修改过（含复习）的笔记"""
         # 从配置获取查询条件（根据需求文档4.1.3）
-        query = mw.addonManager.getConfig(__name__).get('anki_query_string')
+        query = self.config_manager.get('anki_query_string')
+        # 在查询笔记之前取本次同步的起始时刻，同步成功后作为新的水位线：查询开始之后发生的修改下次仍会被选中；
+        # 同一时刻也是本次提取上下文的“当前时刻”
+        self.sync_started_at = int(time.time())
         # 获取完整Note对象（根据需求文档3.5）
         note_ids = mw.col.find_notes(query)
-        return note_ids
+        self._extraction_context = ExtractionContext(mw.col, now=self.sync_started_at)
+        if not self.config_manager.get('incremental_sync', False):
+            return note_ids
+        watermarks = WatermarkStore()
+        try:
+            watermark = watermarks.get(self.watermark_scope())
+        finally:
+            watermarks.close()
+        if watermark is None:
+            return note_ids
+        return self.filter_changed_since(note_ids, watermark)
+
+    def watermark_scope(self) -> str:
+        """水位线按 数据库 + 查询条件 区分，修改任意一项都会回到全量同步"""
+        return WatermarkStore.scope("anki_to_notion", self.database_id, self.config_manager.get('anki_query_string'))
+
+    @staticmethod
+    def filter_changed_since(note_ids, watermark) -> list:
+        """保留笔记或其卡片在 watermark（秒级时间戳）之后修改过的笔记；复习、改期都会更新 cards.mod"""
+        changed = set(mw.col.db.list(
+            "SELECT id FROM notes WHERE mod >= ? UNION SELECT nid FROM cards WHERE mod >= ?",
+            watermark, watermark
+        ))
+        return [note_id for note_id in note_ids if note_id in changed]
+
+    def finish_sync(self, result):
+        """先记录水位线，再执行删除源笔记与展示结果"""
+        self.advance_watermark(result)
+        super().finish_sync(result)
+
+    def advance_watermark(self, result):
+        """本次同步完整成功（未取消、无失败）时，把水位线前移到本次同步的起始时刻"""
+        if result.get("cancelled") or result.get("failed") or getattr(self, "sync_started_at", None) is None:
+            return
+        watermarks = WatermarkStore()
+        try:
+            watermarks.set(self.watermark_scope(), self.sync_started_at)
+        finally:
+            watermarks.close()
+
     def ensure_database_structure_of_target(self, note_ids):
         """自动更新数据库结构，补充缺失或类型不匹配的属性"""
-        try:
-            db_info = self.client.client.databases.retrieve(database_id=self.database_id)
-        except Exception as e:
-            print("无法获取数据库结构信息:", e)
-            return {"success": [], "failed": [{"error": "无法获取数据库结构信息"}]}
-
-        current_properties = db_info.get("properties", {})
-
-        # 收集所有待同步笔记中出现的字段
-        required_fields = set()
-        for note_id in note_ids:
-            note = mw.col.get_note(note_id)
-            required_fields.update(note.keys())
-        
-        # 添加必须的元数据字段
-        required_fields.update({'Anki ID', 'Deck', 'Tags', 'Note Type', 'First Field', 
-                              'Creation Time', 'Modification Time', 'Review Count', 
-                              'Ease Factor', 'Interval', 'Card Type', 'Due Date', 
-                              'Suspended', 'Lapses', 'Difficulty', 'Stability', 'Retrievability'})
-        if "notion正文" in required_fields:
-            required_fields.discard("notion正文")   #notion正文并不是必要字段（应该放到notion_children中，而不是属性中）
-        # 定义预期属性类型映射
-        expected_types = {}
-        for field in required_fields:
-            if field in {"Creation Time", "Modification Time", "Due Date"}:
-                expected_types[field] = "date"
-            elif field == "Tags":
-                expected_types[field] = "multi_select"
-            elif field in {"Anki ID", "Review Count", "Ease Factor", "Interval", "Lapses", "Difficulty", "Stability", "Retrievability"}:
-                expected_types[field] = "number"
-            elif field == "Suspended":
-                expected_types[field] = "checkbox"
-            elif field in {"Note Type", "First Field","Card Type"}:
-                expected_types[field] = "rich_text"
-            else:
-                expected_types[field] = "rich_text"
+        return self.apply_database_structure(self.plan_required_fields(note_ids))
 
-        new_properties = {}
-        for field, expected_type in expected_types.items():
-            if field not in current_properties or current_properties[field].get("type") != expected_type:
-                new_properties[field] = {expected_type: {}}
+    def plan_required_fields(self, note_ids) -> set:
+        """根据待同步笔记涉及的笔记类型得到字段集合，耗时与笔记条数无关（读取集合，需在主线程调用）"""
+        fields = SchemaPlanner(mw.col).required_fields(note_ids)
+        if self.export_all_cards():
+            fields.add(CARD_SCHEDULE_FIELD)
+        return fields
 
-        if new_properties:
-            try:
-                response = self.client.client.databases.update(
-                    database_id=self.database_id,
-                    properties=new_properties
-                )
-                print("自动更新数据库结构，添加/更新属性：", list(new_properties.keys()))
-            except Exception as e:
-                print("自动更新数据库属性失败:", e)
-    def update_database_of_target(self, note_ids):
+    def export_all_cards(self) -> bool:
+        """card_scheduling_export 为 all_cards 时导出每条笔记全部卡片的调度信息，默认只导出第一张卡片"""
+        return self.config_manager.get("card_scheduling_export", "first_card") == "all_cards"
+
+    def apply_database_structure(self, required_fields):
+        """根据字段集合补充缺失或类型不匹配的属性（只访问 Notion，可在后台线程调用）"""
+        # 字段集合同时决定重复索引需要读取哪些属性（首字段只可能是其中之一）
+        self.required_fields = set(required_fields)
+        return self.client.ensure_database_properties(
+            self.database_id,
+            ToNotionConverter.expected_property_types(required_fields),
+            retry_policy=RetryPolicy.from_config(self.config_manager)
+        )
+
+    def update_database_of_target(self, note_ids, progress_callback=None, is_cancelled=None):
         """
-        更新 Notion 数据库。每次调用时都通过 mw.addonManager.getConfig 获取最新配置，
+        更新 Notion 数据库。每次调用时都重新加载配置，
         这样用户在设置界面修改 duplicate_handling_way 后不必重启 Anki 就能生效。
+        提取、转换与上传以生成器串联，逐条进行，不会先构造全部操作
         """
         # 获取最新的config参数
-        config = self.config_manager.reload_config()
-        
-        
-        # 针对每条笔记构造 Notion 页面数据
-        batch_operations = []
-        for note_id in note_ids:
-            anki_note = NoteFactory.create("anki", note_id)
-            
-            operation = {
-                "data": self._convert_properties(anki_note.get_properties()),
-                "children": anki_note.get_children(),
-                "note_id": note_id
-            }
-            # 修改重复检查条件：
-            # 1. 从 "First Field" 读取真实的首字段名称
-            # 2. 再从 properties 中取出该字段的实际值
-            first_field_property_name = operation["data"]["First Field"]["rich_text"][0]["text"]["content"]
-            first_field_value = operation["data"][first_field_property_name]["rich_text"][0]["text"]["content"]
-            duplicate_check = {
-                "filter": {
-                    "and": [
-                        {
-                            "property": "Note Type",
-                            "rich_text": {
-                                "equals": operation["data"]["Note Type"]["rich_text"][0]["text"]["content"]
-                            }
-                        },
-                        {
-                            "property": first_field_property_name,
-                            "rich_text": {
-                                "equals": first_field_value
-                            }
-                        }
-                    ]
-                }
-            }
-            operation["duplicate_check"] = duplicate_check
-            batch_operations.append(operation)
-        
+        self.config_manager.reload_config()
+        self.client.limiter.reset_stats()
+
         # 调用 NotionClient 内的批量更新接口
-        result = self.client.batch_update_database(
-            database_id=self.database_id,
-            operations=batch_operations,
-            config=config
+        conversion_failed = []
+        page_map = self.open_page_map()
+        conversion_cache = ConversionCache.from_config(self.config_manager)
+        try:
+            result = self.client.batch_update_database(
+                database_id=self.database_id,
+                operations=convert_each(
+                    self.iter_snapshots(note_ids),
+                    partial(ToNotionConverter.build_operation, conversion_cache=conversion_cache),
+                    conversion_failed.append
+                ),
+                config=self.config_manager,
+                progress_callback=progress_callback,
+                is_cancelled=is_cancelled,
+                duplicate_index=self.prepare_duplicate_lookup(note_ids, page_map),
+                page_map=page_map
+            )
+        finally:
+            if page_map is not None:
+                page_map.close()
+            if conversion_cache is not None:
+                conversion_cache.close()
+        result["failed"].extend(conversion_failed)
+        if not result.get("cancelled"):
+            result["revlog"] = self.export_revlog(note_ids, is_cancelled=is_cancelled)
+        result["rate_limit"] = self.client.rate_limit_stats()
+        if conversion_cache is not None:
+            result["conversion_cache"] = conversion_cache.stats()
+        return result
+
+    def export_revlog(self, note_ids, call_on_main=None, is_cancelled=None):
+        """把待同步笔记的复习记录导出到 revlog_database_url 指定的配套数据库，未配置时返回 None
+        每次导出 (after, pending] 范围内的新记录：pending 为开始时最大的 revlog id，按笔记分块读取 → 聚合为页面 → 并发写入；
+        done 记录已完成的最大笔记id，started 记录已开始写入的最大笔记id。失败或取消时保留范围、进度与范围内的笔记id，
+        下次同步从 done 之后继续，done 与 started 之间的笔记按 Revlog Key 检查重复，已创建的页面不会重复创建"""
+        url = self.config_manager.get("revlog_database_url")
+        if not url:
+            return None
+        call_on_main = call_on_main or (lambda function, *args: function(*args))
+        is_cancelled = is_cancelled or (lambda: False)
+        database_id = parse_notion_https_for_database_id(url)
+        config = {
+            "notion_concurrency": self.config_manager.get("notion_concurrency", 3),
+            "retry_max_retries": self.config_manager.get("retry_max_retries", 3),
+            "retry_base_delay": self.config_manager.get("retry_base_delay", 1.0),
+            "retry_max_delay": self.config_manager.get("retry_max_delay", 30.0)
+        }
+        self.client.ensure_database_properties(database_id, REVLOG_PROPERTY_TYPES, RetryPolicy.from_config(config))
+
+        chunk_size = self.config_manager.get("revlog_chunk_size", REVLOG_CHUNK_SIZE)
+        extractor = RevlogExtractor(mw.col, note_ids, chunk_size)
+        scope = WatermarkStore.scope("revlog", database_id, self.config_manager.get('anki_query_string'))
+        notes_scope = WatermarkStore.scope(scope, "notes")     # 范围内待导出的笔记id（单独保存，进度更新时不必重写）
+        summary = {"rows": 0, "pages": 0, "failed": 0, "cancelled": False}
+        watermarks = WatermarkStore()
+        try:
+            state = json.loads(watermarks.get(scope) or '{"after": 0, "pending": null}')
+            if state["pending"] is None:
+                latest = call_on_main(extractor.latest_id)
+                if latest is None or latest <= state["after"]:
+                    return summary
+                state.update(pending=latest, done=0, started=0)
+                watermarks.set(notes_scope, json.dumps(extractor.note_ids))
+                watermarks.set(scope, json.dumps(state))
+            else:
+                # 续传：done、started 是开始该范围时所选笔记中的位置，仍按当时保存的笔记列表继续（增量同步每次选中的笔记不同）；
+                # 本次新选中的笔记并入列表后从头再走一遍，started 不变，已写入过的笔记按 Revlog Key 检查重复
+                notes = set(json.loads(watermarks.get(notes_scope) or "[]"))
+                if not notes.issuperset(extractor.note_ids):
+                    notes.update(extractor.note_ids)
+                    state["done"] = 0
+                    watermarks.set(notes_scope, json.dumps(sorted(notes)))
+                    watermarks.set(scope, json.dumps(state))
+                extractor = RevlogExtractor(mw.col, notes, chunk_size)
+            state.setdefault("done", 0)
+            state.setdefault("started", 0)
+            for chunk in extractor.note_chunks(state["done"]):
+                if is_cancelled():
+                    summary["cancelled"] = True
+                    break
+                rows = call_on_main(extractor.read_chunk, chunk, state["after"], state["pending"])
+                operations = revlog_operations(rows)
+                if operations:
+                    # 上次可能已部分写入的笔记检查重复，其余的直接创建
+                    checked = chunk[0] <= state["started"]
+                    if chunk[-1] > state["started"]:
+                        state["started"] = chunk[-1]
+                        watermarks.set(scope, json.dumps(state))
+                    result = self.client.batch_update_database(
+                        database_id, operations, {**config, "duplicate_handling_way": "keep" if checked else "copy"},
+                        is_cancelled=is_cancelled
+                    )
+                    summary["pages"] += sum(1 for item in result["success"] if item.get("action") == "create")
+                    summary["failed"] += len(result["failed"])
+                    if result["failed"] or result["cancelled"]:
+                        summary["cancelled"] = result["cancelled"]
+                        break
+                summary["rows"] += len(rows)
+                state["done"] = chunk[-1]
+                watermarks.set(scope, json.dumps(state))
+            else:
+                state = {"after": state["pending"], "pending": None}
+                watermarks.set(scope, json.dumps(state))
+                watermarks.reset(notes_scope)
+        finally:
+            watermarks.close()
+        return summary
+
+    def open_page_map(self):
+        """按配置打开持久化的笔记 → 页面映射，未启用时返回 None"""
+        if not self.config_manager.get("page_map", True):
+            return None
+        return PageMap()
+
+    def prepare_duplicate_lookup(self, note_ids, page_map):
+        """按配置准备重复索引（只访问 Notion 和本地映射，可在后台线程调用）；不需要时返回 None"""
+        return self.client.prepare_duplicate_lookup(
+            self.database_id,
+            self.config_manager,
+            note_ids,
+            getattr(self, "required_fields", None),
+            page_map
+        )
+
+    def extraction_context(self) -> ExtractionContext:
+        """本次同步的提取上下文（在 Step1 创建，未经过 Step1 时按需创建；读取集合，需在主线程调用）"""
+        if getattr(self, "_extraction_context", None) is None:
+            self._extraction_context = ExtractionContext(mw.col, now=getattr(self, "sync_started_at", None))
+        return self._extraction_context
+
+    def iter_snapshots(self, note_ids):
+        """按分片批量从集合中提取不可变的笔记快照（读取集合，需在主线程调用）"""
+        yield from BulkExtractor(self.extraction_context(), all_cards=self.export_all_cards()).iter_snapshots(note_ids)
+
+    def extract_snapshots(self, note_ids) -> list:
+        """提取一片笔记的快照（读取集合，需在主线程调用）"""
+        return list(self.iter_snapshots(note_ids))
+
+    def worker_settings(self) -> dict:
+        """子进程同步所需的全部设置（均为基本类型，可 pickle）"""
+        self.config_manager.reload_config()
+        return {
+            "notion_token": self.config_manager.get("notion_token"),
+            "database_id": self.database_id,
+            "duplicate_handling_way": self.config_manager.get("duplicate_handling_way", "keep"),
+            "duplicate_lookup": self.config_manager.get("duplicate_lookup", "auto"),
+            "duplicate_batch_size": self.config_manager.get("duplicate_batch_size", 100),
+            "page_map": self.config_manager.get("page_map", True),
+            "verify_page_map": self.config_manager.get("verify_page_map", False),
+            "conversion_cache_size": self.config_manager.get("conversion_cache_size", 2000),
+            "conversion_cache_persist": self.config_manager.get("conversion_cache_persist", True),
+            "notion_concurrency": self.config_manager.get("notion_concurrency", 3),
+            "notion_requests_per_second": self.config_manager.get("notion_requests_per_second"),
+            "notion_burst": self.config_manager.get("notion_burst"),
+            "retry_max_retries": self.config_manager.get("retry_max_retries", 3),
+            "retry_base_delay": self.config_manager.get("retry_base_delay", 1.0),
+            "retry_max_delay": self.config_manager.get("retry_max_delay", 30.0)
+        }
+
+    def execute_in_slices(self, note_ids, call_on_main, progress_callback=None, is_cancelled=None):
+        """分片执行 Step2、Step3（在后台线程调用）
+        集合读取通过 call_on_main 以小分片交给主线程完成，Notion 请求全部留在当前线程；
+        每条笔记之间检查 is_cancelled，取消后返回已完成部分的结果并带上 cancelled 标记"""
+        note_ids = list(note_ids)
+        slices = self._slices(note_ids)
+        is_cancelled = is_cancelled or (lambda: False)
+        result = {"success": [], "failed": [], "cancelled": False, "retries": 0}
+        self.client.limiter.reset_stats()
+
+        # Step 2——字段由主线程按笔记类型一次得出（一条 SQL），数据库结构在后台更新
+        if is_cancelled():
+            result["cancelled"] = True
+            return result
+        self.apply_database_structure(call_on_main(self.plan_required_fields, note_ids))
+
+        # Step 3——流水线：主线程逐片提取快照 → 后台转换 → 并发上传，缓冲区最多一片（整次同步每条笔记只读取一次）
+        self.config_manager.reload_config()
+        conversion_failed = []
+        conversion_cache = ConversionCache.from_config(self.config_manager)
+        operations = aconvert_each(
+            aiter_slices(slices, lambda chunk: call_on_main(self.extract_snapshots, chunk), is_cancelled),
+            partial(ToNotionConverter.build_operation, conversion_cache=conversion_cache),
+            conversion_failed.append
         )
+        page_map = self.open_page_map()
+        try:
+            upload_result = self.client.batch_update_database(
+                database_id=self.database_id,
+                operations=operations,
+                config=self.config_manager,
+                progress_callback=(lambda done: progress_callback(done, len(note_ids))) if progress_callback else None,
+                is_cancelled=is_cancelled,
+                duplicate_index=self.prepare_duplicate_lookup(note_ids, page_map),
+                page_map=page_map
+            )
+        finally:
+            if page_map is not None:
+                page_map.close()
+            if conversion_cache is not None:
+                conversion_cache.close()
+        result["success"] = upload_result["success"]
+        result["failed"] = upload_result["failed"] + conversion_failed
+        result["retries"] = upload_result.get("retries", 0)
+        result["cancelled"] = upload_result.get("cancelled", False) or is_cancelled()
+        if not result["cancelled"]:
+            result["revlog"] = self.export_revlog(note_ids, call_on_main, is_cancelled)
+        result["rate_limit"] = self.client.rate_limit_stats()
+        if conversion_cache is not None:
+            result["conversion_cache"] = conversion_cache.stats()
         return result
+
+    def execute_in_process(self, note_ids, call_on_main, progress_callback=None, is_cancelled=None):
+        """进程隔离模式下分片执行 Step2、Step3（在后台线程调用）
+        主进程只在主线程分片提取笔记快照并投递给子进程，转换与上传全部由子进程完成"""
+        note_ids = list(note_ids)
+        slices = self._slices(note_ids)
+        is_cancelled = is_cancelled or (lambda: False)
+        cancelled = False
+
+        worker = ProcessSyncWorker(
+            self.worker_settings(),
+            python_executable=self.config_manager.get("worker_python_executable") or None
+        )
+
+        def report_progress():
+            if progress_callback:
+                progress_callback(len(worker.success) + len(worker.failed), len(note_ids))
+
+        worker.start()
+        try:
+            # Step 2——字段由主线程按笔记类型一次得出，数据库结构由子进程更新
+            if is_cancelled():
+                cancelled = True
+            else:
+                required_fields = call_on_main(self.plan_required_fields, note_ids)
+                worker.send(MSG_SCHEMA, {"fields": sorted(required_fields), "note_ids": note_ids})
+
+            # Step 3——逐片提取快照并投递（转为基本类型的元组），同时收集已完成的结果
+            for chunk in slices:
+                if cancelled or is_cancelled():
+                    cancelled = True
+                    worker.cancel()
+                    break
+                worker.send(MSG_NOTES, NoteSnapshot.pack(call_on_main(self.extract_snapshots, chunk)))
+                if worker.drain():
+                    report_progress()
+            worker.join(on_progress=report_progress, is_cancelled=is_cancelled)
+        finally:
+            worker.terminate()
+        cancelled = cancelled or is_cancelled()
+        # 复习记录由当前进程导出：读取集合需要主线程，写入量远小于笔记本身
+        return {
+            "success": worker.success,
+            "failed": worker.failed,
+            "cancelled": cancelled,
+            "retries": sum(item.get("retries", 0) for item in worker.success + worker.failed),
+            "rate_limit": worker.stats,
+            "conversion_cache": worker.conversion_stats,
+            "revlog": None if cancelled else self.export_revlog(note_ids, call_on_main, is_cancelled)
+        }
+
+    def _slices(self, note_ids):
+        """按 sync_slice_size 切分笔记id，每片在主线程中一次性读取"""
+        slice_size = max(1, int(self.config_manager.get("sync_slice_size", 50)))
+        return [note_ids[i:i + slice_size] for i in range(0, len(note_ids), slice_size)]
+
     @staticmethod
     def delete_source_notes(succeeded_note_ids):
         """安全删除已成功同步的源笔记"""
         if not succeeded_note_ids:
             return
-        mw.col.remNotes(succeeded_note_ids)
-        mw.reset()
+        # 通过 CollectionOp 删除，Anki 会自动刷新界面并记录撤销点
+        CollectionOp(
+            parent=mw,
+            op=lambda col: col.remove_notes(list(succeeded_note_ids))
+        ).run_in_background()
+
     @staticmethod
     def show_sync_result(result):
         """弹窗显示同步结果"""
-        print("同步完成！")
-        print(f"成功: {len(result['success'])}，失败: {len(result['failed'])}")
-    
-    @staticmethod
-    def _process_note(note, model_field_ignore):
-        """处理单个anki笔记的字段映射,并将结果以字典的形式输出"""
-        return {
-            **{k: v for k, v in note.items() if k != model_field_ignore},
-            **Note.get_meta_fields_from_anki(note)
-        }
-
-
-    @staticmethod
-    def _convert_properties(properties):
-        """
-        根据处理后的笔记数据构建 Notion 页面属性字典
-        """
-        properties = {}
-        for field, value in properties.items():
-            if value is None:
-                continue
-            if field in {"Creation Time", "Modification Time", "Due Date"}:
-                properties[field] = {"date": {"start": str(value)}}
-            elif field == "Tags":
-                if isinstance(value, str):
-                    tags = [tag.strip() for tag in value.split(",") if tag.strip()]
-                    properties[field] = {"multi_select": [{"name": tag} for tag in tags]}
-                else:
-                    properties[field] = {"multi_select": value}
-            elif field in {"Anki ID", "Review Count", "Ease Factor", "Interval", "Lapses", "Difficulty", "Stability", "Retrievability"}:
-                try:
-                    # 处理可能存在的嵌套数值结构
-                    if isinstance(value, dict) and 'number' in value:
-                        numeric_value = value['number']
-                    else:
-                        numeric_value = float(value) if '.' in str(value) else int(value)
-                    properties[field] = {"number": numeric_value}
-                except (ValueError, TypeError):
-                    print(f"警告：字段 {field} 的值 {value} 无法转换为数字，已设置为 0")
-                    properties[field] = {"number": 0}
-            elif field == "Suspended":
-                properties[field] = {"checkbox": bool(value)}
-            elif field == "Note Type":
-                properties[field] = {"rich_text": [{"text": {"content": str(value)}}]}
-            elif field == "First Field":
-                properties[field] = {"rich_text": [{"text": {"content": str(value)}}]}
-                # 同时添加辅助字段 first_field 用于重复检查
-                properties["first_field"] = {"rich_text": [{"text": {"content": str(value)}}]}
-            elif field == "Card Type":
-                properties[field] = {"rich_text": [{"text": {"content": str(value)}}]}
-            else:
-                properties[field] = {"rich_text": [{"text": {"content": str(value)}}]}
-        return properties
+        print("同步已取消！" if result.get("cancelled") else "同步完成！")
+        print(f"成功: {len(result['success'])}，失败: {len(result['failed'])}，重试: {result.get('retries', 0)} 次")
+        unchanged = sum(1 for item in result['success'] if item.get('action') == 'unchanged')
+        if unchanged:
+            print(f"其中内容未变、未发送请求: {unchanged}")
+        if result.get("revlog"):
+            stats = result["revlog"]
+            print(f"复习记录: 导出 {stats['rows']} 条，新建页面 {stats['pages']} 个，失败 {stats['failed']} 个"
+                  + ("（未完成，下次同步继续）" if stats["failed"] or stats["cancelled"] else ""))
+        if result.get("conversion_cache"):
+            stats = result["conversion_cache"]
+            print(f"正文转换缓存: 命中 {stats['hits']} 次（其中磁盘 {stats['disk_hits']} 次），实际转换 {stats['misses']} 次")
+        if result.get("rate_limit"):
+            stats = result["rate_limit"]
+            print(f"限速: 请求 {stats['requests']} 次，等待令牌 {stats['throttled_seconds']:.1f} 秒，"
+                  f"429 响应 {stats['rate_limited_responses']} 次（Retry-After 共 {stats['retry_after_seconds']:.1f} 秒）")
 
     
 
@@ -270,33 +502,213 @@ class AnkiToNotionStrategy(SourceToTargetSyncStrategy):
 
 class NotionToAnkiStrategy(SourceToTargetSyncStrategy):
     """Notion → Anki 同步策略"""
-    
 
+    READY_TAG = "readyMove"
+    supports_background = True
+    source_on_main = False      # 读取源侧页面只请求 Notion，不访问集合
+
+    def __init__(self, config_manager: ConfigManager = None):
+        self.config_manager = config_manager or ConfigManager()
+        self.config_manager.reload_config()
+        self.client = NotionClient(
+            self.config_manager.get('notion_token'),
+            requests_per_second=self.config_manager.get('notion_requests_per_second'),
+            burst=self.config_manager.get('notion_burst')
+        )
+        self.database_id = parse_notion_https_for_database_id(self.config_manager.get('notion_database_url'))
+        self.retry_policy = RetryPolicy.from_config(self.config_manager)
+
+    def watermark_scope(self) -> str:
+        return WatermarkStore.scope("notion_to_anki", self.database_id, self.READY_TAG)
+
+    def load_watermark(self):
+        """返回 (编辑时间, 该时刻已处理的页面id集合)，从未同步过时为 (None, 空集合)"""
+        watermarks = WatermarkStore()
+        try:
+            state = watermarks.get(self.watermark_scope())
+        finally:
+            watermarks.close()
+        if not state:
+            return None, set()
+        state = json.loads(state)
+        return state["time"], set(state["page_ids"])
+
+    def get_ids_from_source(self) -> Iterable:
+        """读取待导入的 Notion 页面（页面对象本身，而不只是id：属性随查询结果一起返回，无需再逐页读取）"""
+        since, processed = self.load_watermark()
+        pages = self.client.iter_pages_edited_since(
+            self.database_id, since, tag=self.READY_TAG, retry_policy=self.retry_policy
+        )
+        return [page for page in pages if page["id"] not in processed]
+
+    def ensure_database_structure_of_target(self, pages:Iterable) -> None:
+        """检查页面引用的笔记类型在 Anki 中是否存在（不存在的页面在导入时记为失败）"""
+        note_types = {NoteFactory.create("notion", page).get_properties().get("Note Type") for page in pages}
+        missing = sorted(name for name in note_types if name and not mw.col.models.by_name(name))
+        if missing:
+            print("Anki 中不存在以下笔记类型，对应页面将无法导入:", missing)
+
+    def update_database_of_target(self, pages:Iterable)-> Iterable:
+        """在当前（主）线程按编辑时间顺序逐页导入 Anki，见 import_pages"""
+        return self.import_pages(pages, call_on_main=lambda function, *args: function(*args))
+
+    def execute_in_slices(self, pages, call_on_main, progress_callback=None, is_cancelled=None):
+        """分片执行 Step2、Step3（在后台线程调用）"""
+        call_on_main(self.ensure_database_structure_of_target, pages)
+        return self.import_pages(pages, call_on_main, progress_callback, is_cancelled)
+
+    def execute_in_process(self, pages, call_on_main, progress_callback=None, is_cancelled=None):
+        """写入集合只能在主进程完成，进程隔离模式与 execute_in_slices 相同"""
+        return self.execute_in_slices(pages, call_on_main, progress_callback, is_cancelled)
+
+    def import_pages(self, pages, call_on_main, progress_callback=None, is_cancelled=None):
+        """按编辑时间顺序逐页导入 Anki；结果中 operation.note_id 为源侧（Notion）页面id
+        读取正文块树、归档页面等 Notion 请求留在当前线程，查找与写入笔记通过 call_on_main 以小分片交给主线程；
+        retain_notion_children 开启时每个分片导入前只读取该分片页面的正文块树，渲染后写入 notion正文 字段；
+        整次导入合并为一个撤销点，结束后刷新界面"""
+        self.config_manager.reload_config()
+        mode = self.config_manager.get("duplicate_handling_way", "keep").lower()
+        retain_children = self.config_manager.get("retain_notion_children", False)
+        slice_size = max(1, int(self.config_manager.get("sync_slice_size", 50)))
+        is_cancelled = is_cancelled or (lambda: False)
+        result = {"success": [], "failed": [], "cancelled": False}
+        pages = list(pages)
+        undo_entry = call_on_main(self.begin_import) if pages else None
+        for start in range(0, len(pages), slice_size):
+            if is_cancelled():
+                result["cancelled"] = True
+                break
+            chunk = pages[start:start + slice_size]
+            fetch_errors = {}
+            if retain_children:
+                trees, fetch_errors = self.client.fetch_block_trees([page["id"] for page in chunk], self.config_manager)
+                for page in chunk:
+                    page["children"] = trees.get(page["id"], [])
+                # 读取正文可能较慢，写入前再检查一次
+                if is_cancelled():
+                    result["cancelled"] = True
+                    break
+            imported = call_on_main(self.import_slice, chunk, mode, retain_children, fetch_errors, undo_entry)
+            result["success"] += imported["success"]
+            result["failed"] += imported["failed"]
+            if progress_callback:
+                progress_callback(start + len(chunk), len(pages))
+        if undo_entry is not None:
+            call_on_main(self.end_import)
+        # 归档源页面需显式开启（archive_notion_source_pages），与 Anki → Notion 的 delete_source_note 无关
+        if self.config_manager.get("archive_notion_source_pages", False):
+            succeeded_ids = [item["operation"]["note_id"] for item in result["success"] if item["action"] in ("create", "update")]
+            result["archive_failed"] = self.delete_source_notes(succeeded_ids)
+        return result
 
     @staticmethod
-    def get_ids_from_source() -> Iterable:
-        """从源侧获取需要传输的笔记id"""
-        pass
-    
+    def begin_import():
+        """新建一个撤销点（需在主线程调用），各分片写入后合并到这里，整次导入可一次撤销"""
+        return mw.col.add_custom_undo_entry("从 Notion 导入")
 
-    def ensure_database_structure_of_target(self, note_ids:Iterable) -> None:
-        """确保目标侧的数据库格式符合要求"""
-        pass
-    
- 
-    def update_database_of_target(self,note_ids:Iterable)-> Iterable:
-        """更新目标测的数据库"""
-        pass
-    
+    @staticmethod
+    def end_import():
+        """导入结束：刷新主界面与浏览器（需在主线程调用）"""
+        mw.reset()
+
+    def import_slice(self, pages, mode, retain_children, fetch_errors, undo_entry=None):
+        """导入一个分片的页面（读写集合，需在主线程调用），写入合并到 undo_entry 撤销点"""
+        result = {"success": [], "failed": []}
+        for page in pages:
+            operation = {"note_id": page["id"], "last_edited_time": page.get("last_edited_time")}
+            if page["id"] in fetch_errors:
+                result["failed"].append({"operation": operation, "error": f"读取正文失败: {fetch_errors[page['id']]}", "trace": ""})
+                continue
+            try:
+                action, anki_note_id = self.import_note(NoteFactory.create("notion", page), mode, retain_children)
+                result["success"].append({"operation": operation, "action": action, "anki_note_id": anki_note_id})
+            except Exception as e:
+                result["failed"].append({"operation": operation, "error": str(e), "trace": traceback.format_exc()})
+        if undo_entry is not None:
+            mw.col.merge_undo_entries(undo_entry)
+        return result
+
+    def import_note(self, notion_note, mode, retain_children=False):
+        """导入单个页面，返回 (操作, Anki 笔记id)；重复笔记按 duplicate_handling_way 处理"""
+        properties = notion_note.get_properties()
+        model = mw.col.models.by_name(properties.get("Note Type") or "")
+        if not model:
+            raise ValueError(f"Anki 中不存在笔记类型: {properties.get('Note Type')}")
+
+        existing = None if mode == "copy" else self.find_existing_note(properties, model)
+        if existing is not None and mode != "overwrite":
+            return "skip", existing.id
+
+        note = existing if existing is not None else mw.col.new_note(model)
+        for field_name in note.keys():
+            if field_name != BODY_FIELD and properties.get(field_name) is not None:
+                note[field_name] = str(properties[field_name])
+        if retain_children and BODY_FIELD in note.keys():
+            note[BODY_FIELD] = notion_note.get_body_html()
+        note.tags = [tag for tag in properties.get("Tags") or [] if tag != self.READY_TAG]
+        if existing is not None:
+            mw.col.update_note(note)
+            return "update", note.id
+        mw.col.add_note(note, mw.col.decks.id(properties.get("Deck") or "Default"))
+        return "create", note.id
 
     @staticmethod
-    def delete_source_notes(succeeded_note_ids:Iterable) -> None:
-        """如有需要，安全删除已成功同步的源侧笔记"""
-        pass
-    
+    def find_existing_note(properties, model):
+        """查找重复笔记：优先按 Anki ID，其次按 笔记类型 + 首字段（与 Anki 自身的重复检查一致）"""
+        anki_id = properties.get("Anki ID")
+        if anki_id:
+            note_id = mw.col.db.scalar("SELECT id FROM notes WHERE id = ? AND mid = ?", int(anki_id), model["id"])
+            if note_id:
+                return mw.col.get_note(note_id)
+        first_field = model["flds"][0]["name"]
+        value = str(properties.get(first_field) or "")
+        stripped = strip_html_media(value)
+        for note_id, fields in mw.col.db.execute(
+            "SELECT id, flds FROM notes WHERE csum = ? AND mid = ?", field_checksum(value), model["id"]
+        ):
+            if strip_html_media(split_fields(fields)[0]) == stripped:
+                return mw.col.get_note(note_id)
+        return None
+
+    def delete_source_notes(self, succeeded_page_ids:Iterable) -> list:
+        """归档已成功导入的 Notion 页面，返回归档失败的页面id"""
+        if not succeeded_page_ids:
+            return []
+        return self.client.archive_pages(succeeded_page_ids, self.retry_policy)
+
+    def finish_sync(self, result):
+        """记录续传位置并展示结果（源页面的归档已在导入时按 archive_notion_source_pages 完成）"""
+        self.advance_watermark(result)
+        self.show_sync_result(result)
+
+    def advance_watermark(self, result):
+        """水位线前移到第一条失败页面之前最后一个已处理的编辑时间，并记下该时刻已处理的页面"""
+        processed = sorted(
+            result["success"] + result["failed"],
+            key=lambda item: item["operation"]["last_edited_time"] or ""
+        )
+        since, processed_ids = self.load_watermark()
+        for item in processed:
+            if "error" in item:
+                break
+            edited = item["operation"]["last_edited_time"]
+            if edited != since:
+                since, processed_ids = edited, set()
+            processed_ids.add(item["operation"]["note_id"])
+        if since is None:
+            return
+        watermarks = WatermarkStore()
+        try:
+            watermarks.set(self.watermark_scope(), json.dumps({"time": since, "page_ids": sorted(processed_ids)}))
+        finally:
+            watermarks.close()
 
     @staticmethod
     def show_sync_result(result) -> None:
-        """同步成功后，展现同步结果"""
-        pass
-        pass
\ No newline at end of file
+        """展现导入结果"""
+        print("导入已取消！" if result.get("cancelled") else "导入完成！")
+        print(f"成功: {len(result['success'])}，失败: {len(result['failed'])}")
+        if result.get("archive_failed"):
+            print(f"归档失败的页面: {len(result['archive_failed'])}")
+        for item in result["failed"]:
+            print(f"页面 {item['operation']['note_id']} 导入失败: {item['error']}")
@@ -0,0 +1,206 @@
+# 进程隔离的同步工作进程：主进程只负责从集合中提取笔记快照，
+# 子进程持有 NotionClient，以流水线方式完成 HTML 转换、JSON 编码与全部 HTTP 请求，
+# 避免 CPU 密集的转换和网络等待与 Anki 的 GUI 线程争夺 GIL。
+#
+# 注意：本模块在子进程中通过 runpy 以脚本方式运行（不经过插件包的 __init__，也不导入 aqt），
+# 因此模块顶层只能使用标准库，子进程所需的插件模块在 worker_main 中以绝对路径导入。
+# 子进程由 worker_launcher.start_process 启动，不会重新执行主进程的 __main__（Anki 的入口）。
+# 子进程需要一个 Python 解释器：打包版 Anki 的 sys.executable 是 Anki 程序本身，须通过 worker_python_executable
+# 指定与 Anki 内置 Python 主次版本相同的解释器（插件的 lib 目录只含纯 Python 包，不需要另外安装依赖）。
+import multiprocessing
+import os
+import queue
+import runpy
+import sys
+import traceback
+from functools import partial
+
+WORKER_RUN_NAME = "__anki_repository_sync_worker__"
+PLUGIN_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# 消息类型：主进程 → 子进程
+MSG_SCHEMA = "schema"        # 数据库字段集合与全部笔记id（第一条消息）
+MSG_NOTES = "notes"          # 一批笔记快照（NoteSnapshot.pack 的结果）
+MSG_DONE = "done"            # 没有更多任务
+# 消息类型：子进程 → 主进程
+MSG_RESULT = "result"        # 单条笔记的同步结果
+MSG_FINISHED = "finished"    # 子进程正常结束（附带限速计数与转换缓存统计）
+MSG_ERROR = "error"          # 子进程发生致命错误
+
+
+def worker_main(settings, task_queue, result_queue, cancel_event):
+    """子进程主循环：以流水线方式接收笔记快照，转换后并发上传，每条笔记完成即回传结果"""
+    for path in (os.path.join(PLUGIN_ROOT, 'lib'), PLUGIN_ROOT):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    try:
+        import asyncio
+        from core.client.notion_client import NotionClient
+        from core.client.retry_policy import RetryPolicy
+        from core.models.conversion_cache import ConversionCache
+        from core.models.note_snapshot import NoteSnapshot
+        from core.models.page_map import PageMap
+        from core.models.parse_and_converter import ToNotionConverter
+        from core.operations.sync_pipeline import aconvert_each
+
+        client = NotionClient(
+            settings["notion_token"],
+            requests_per_second=settings.get("notion_requests_per_second"),
+            burst=settings.get("notion_burst")
+        )
+        database_id = settings["database_id"]
+        # batch_update_database 只通过 get 读取配置，settings 字典可直接充当配置
+        config = settings
+
+        # 第一条消息是字段集合（在 Step2 被取消时为 MSG_DONE）：先更新数据库结构、准备重复检查，再开始上传
+        kind, body = task_queue.get()
+        if kind == MSG_DONE:
+            result_queue.put((MSG_FINISHED, {"rate_limit": client.rate_limit_stats(), "conversion_cache": None}))
+            return
+        client.ensure_database_properties(
+            database_id,
+            ToNotionConverter.expected_property_types(body["fields"]),
+            RetryPolicy.from_config(config)
+        )
+        page_map = PageMap() if config.get("page_map", True) else None
+        duplicate_index = client.prepare_duplicate_lookup(database_id, config, body["note_ids"], body["fields"], page_map)
+
+        def send_result(succeeded, item):
+            result_queue.put((MSG_RESULT, item))
+
+        async def queued_snapshots():
+            # 队列读取会阻塞，放到线程池中等待，不影响事件循环中的在途请求
+            while True:
+                kind, body = await asyncio.to_thread(task_queue.get)
+                if kind == MSG_DONE:
+                    return
+                for snapshot in NoteSnapshot.unpack(body):
+                    yield snapshot
+
+        conversion_cache = ConversionCache.from_config(config)
+        try:
+            client.batch_update_database(
+                database_id=database_id,
+                operations=aconvert_each(
+                    queued_snapshots(),
+                    partial(ToNotionConverter.build_operation, conversion_cache=conversion_cache),
+                    lambda item: send_result(False, item)
+                ),
+                config=config,
+                is_cancelled=cancel_event.is_set,
+                on_result=send_result,
+                duplicate_index=duplicate_index,
+                page_map=page_map
+            )
+        finally:
+            if page_map is not None:
+                page_map.close()
+            if conversion_cache is not None:
+                conversion_cache.close()
+        result_queue.put((MSG_FINISHED, {
+            "rate_limit": client.rate_limit_stats(),
+            "conversion_cache": conversion_cache.stats() if conversion_cache is not None else None
+        }))
+    except BaseException:
+        result_queue.put((MSG_ERROR, traceback.format_exc()))
+
+
+class ProcessSyncWorker:
+    """主进程侧的子进程句柄：负责启动子进程、投递笔记快照与收集结果"""
+
+    def __init__(self, settings, python_executable=None, max_pending_batches=4):
+        # 在方法内导入：本模块在子进程中以脚本方式运行，顶层不能使用相对导入
+        from .worker_launcher import spawn_executable
+        self._context = multiprocessing.get_context("spawn")
+        # 打包版 Anki 的 sys.executable 不是 python 解释器，可通过配置指定（只在创建队列与启动子进程期间生效）
+        self._python_executable = python_executable
+        with spawn_executable(python_executable):
+            # 有界队列：主进程提取速度超过上传速度时自动阻塞（背压）
+            self.task_queue = self._context.Queue(maxsize=max_pending_batches)
+            self.result_queue = self._context.Queue()
+            self.cancel_event = self._context.Event()
+        self.process = self._context.Process(
+            target=runpy.run_path,
+            args=(os.path.abspath(__file__),),
+            kwargs={
+                "init_globals": {
+                    "worker_args": (settings, self.task_queue, self.result_queue, self.cancel_event)
+                },
+                "run_name": WORKER_RUN_NAME
+            },
+            daemon=True
+        )
+        self.success = []
+        self.failed = []
+        self.stats = None
+        self.conversion_stats = None
+        self.finished = False
+
+    def start(self):
+        from .worker_launcher import start_process
+        start_process(self.process, self._python_executable)
+
+    def cancel(self):
+        """通知子进程在两条笔记之间停止"""
+        self.cancel_event.set()
+
+    def send(self, kind, body=None):
+        """投递任务；队列已满时一边等待一边收集结果，避免进度停滞"""
+        while not self.finished:
+            self._check_alive()
+            try:
+                self.task_queue.put((kind, body), timeout=0.2)
+                return
+            except queue.Full:
+                self.drain()
+
+    def drain(self, timeout=0.0):
+        """收集子进程已回传的结果，返回本次收到的结果条数"""
+        received = 0
+        while True:
+            try:
+                kind, body = self.result_queue.get(timeout=timeout)
+            except queue.Empty:
+                return received
+            if kind == MSG_RESULT:
+                (self.failed if 'error' in body else self.success).append(body)
+                received += 1
+            elif kind == MSG_FINISHED:
+                self.finished = True
+                self.stats = body["rate_limit"]
+                self.conversion_stats = body["conversion_cache"]
+                return received
+            elif kind == MSG_ERROR:
+                self.finished = True
+                raise RuntimeError(f"同步子进程异常退出:\n{body}")
+            timeout = 0.0
+
+    def join(self, on_progress=None, is_cancelled=None):
+        """发送结束标记并等待子进程处理完剩余任务"""
+        self.send(MSG_DONE)
+        while not self.finished:
+            self._check_alive()
+            if is_cancelled and is_cancelled():
+                self.cancel()
+            if self.drain(timeout=0.2) and on_progress:
+                on_progress()
+        self.process.join(timeout=5)
+
+    def terminate(self):
+        """强制结束仍在运行的子进程（异常退出时的兜底）"""
+        # 子进程取消后可能不再读取队列，避免主进程退出时等待队列中未消费的数据
+        self.task_queue.cancel_join_thread()
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+
+    def _check_alive(self):
+        if not self.finished and not self.process.is_alive() and self.process.exitcode is not None:
+            # 进程已退出，先取走残留消息再判断是否异常
+            self.drain()
+            if not self.finished:
+                raise RuntimeError(f"同步子进程意外退出，退出码 {self.process.exitcode}")
+
+
+if __name__ == WORKER_RUN_NAME:
+    worker_main(*worker_args)
@@ -0,0 +1,44 @@
+# 以 spawn 方式启动同步子进程
+# spawn 子进程启动时会按主进程 __main__ 的 __spec__ 或 __file__ 重新导入主模块（作为 __mp_main__），
+# 在 Anki 中这是 Anki 自身的入口，子进程会再次初始化 Anki（打包版的入口甚至不是 Python 文件）。
+# start_process 在启动期间把 __main__ 临时换成一个空模块（既没有 __spec__ 也没有 __file__），子进程因此跳过这一步
+# 指定的 Python 解释器同样只在启动期间生效：multiprocessing 的 set_executable 修改的是模块级的全局设置
+# （各个 context 共用），不恢复会影响 Anki 与其他插件之后启动的进程
+import multiprocessing.spawn
+import sys
+import threading
+import types
+from contextlib import contextmanager
+
+_LAUNCH_LOCK = threading.RLock()
+_EMPTY_MAIN = types.ModuleType("__main__")
+
+
+@contextmanager
+def spawn_executable(executable=None):
+    """with 块内启动的 spawn 进程（包括创建队列时启动的 resource_tracker）使用 executable，结束后恢复原值；
+    executable 为空时不做改动"""
+    if not executable:
+        yield
+        return
+    with _LAUNCH_LOCK:
+        previous = multiprocessing.spawn.get_executable()
+        multiprocessing.spawn.set_executable(executable)
+        try:
+            yield
+        finally:
+            multiprocessing.spawn.set_executable(previous)
+
+
+def start_process(process, executable=None):
+    """启动 multiprocessing 的 spawn 进程，子进程不重新执行主进程的 __main__"""
+    with _LAUNCH_LOCK, spawn_executable(executable):
+        main = sys.modules.get("__main__")
+        sys.modules["__main__"] = _EMPTY_MAIN
+        try:
+            process.start()
+        finally:
+            if main is None:
+                del sys.modules["__main__"]
+            else:
+                sys.modules["__main__"] = main
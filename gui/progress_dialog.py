@@ -0,0 +1,55 @@
+from aqt.qt import QProgressDialog, Qt
+import threading
+
+# 语言文本字典
+LANGUAGE_TEXTS = {
+    '中文': {
+        'window_title': 'AnkiRepository 同步',
+        'preparing': '正在准备同步……',
+        'progress': '正在同步：{done}/{total}',
+        'cancel': '取消',
+        'cancelling': '正在取消，等待当前笔记完成……'
+    },
+    'English': {
+        'window_title': 'AnkiRepository Sync',
+        'preparing': 'Preparing sync...',
+        'progress': 'Syncing: {done}/{total}',
+        'cancel': 'Cancel',
+        'cancelling': 'Cancelling, waiting for the current note...'
+    }
+}
+
+class SyncProgressDialog(QProgressDialog):
+    """同步进度对话框：实时进度条 + 取消按钮"""
+
+    def __init__(self, total, language='中文', parent=None):
+        self.texts = LANGUAGE_TEXTS.get(language, LANGUAGE_TEXTS['中文'])
+        super(SyncProgressDialog, self).__init__(
+            self.texts['preparing'], self.texts['cancel'], 0, max(total, 1), parent
+        )
+        self.cancel_event = threading.Event()
+        self.setWindowTitle(self.texts['window_title'])
+        self.setWindowModality(Qt.WindowModality.NonModal)
+        self.setMinimumDuration(0)
+        # 进度到达最大值时不自动关闭/重置，由执行器在同步结束后关闭
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+        self.setValue(0)
+        self.canceled.connect(self.request_cancel)
+
+    def request_cancel(self):
+        """用户点击取消：只设置标记，当前笔记处理完毕后后台线程自行停止"""
+        self.cancel_event.set()
+        self.setLabelText(self.texts['cancelling'])
+
+    def is_cancelled(self) -> bool:
+        """供后台线程调用，线程安全"""
+        return self.cancel_event.is_set()
+
+    def update_progress(self, done, total):
+        """更新进度（需在主线程调用）"""
+        if self.cancel_event.is_set():
+            return
+        self.setMaximum(max(total, 1))
+        self.setValue(done)
+        self.setLabelText(self.texts['progress'].format(done=done, total=total))
@@ -31,6 +31,7 @@ LANGUAGE_TEXTS = {
         'anki_query_string': 'Anki 查询字符串:',
         'duplicate_handling': '重复卡片处理方式(keep/overwrite/copy):',
         'delete_source_note': '删除源侧笔记',
+        'archive_notion_source_pages': '导入 Anki 后归档 Notion 页面',
         'save': '保存',
         'prompt': '提示',
         'settings_saved': '设置已保存',
@@ -44,6 +45,7 @@ LANGUAGE_TEXTS = {
         'anki_query_string': 'Anki Query String:',
         'duplicate_handling': 'Duplicate Handling (keep/overwrite/copy):',
         'delete_source_note': 'Delete Source Note',
+        'archive_notion_source_pages': 'Archive Notion Pages After Import',
         'save': 'Save',
         'prompt': 'Prompt',
         'settings_saved': 'Settings Saved',
@@ -104,6 +106,10 @@ class SettingsDialog(QDialog):
         self.delete_source_checkbox = QCheckBox(self.texts['delete_source_note'])
         self.layout.addWidget(self.delete_source_checkbox)
 
+        # Archive Notion Source Pages
+        self.archive_source_checkbox = QCheckBox(self.texts['archive_notion_source_pages'])
+        self.layout.addWidget(self.archive_source_checkbox)
+
         # Retain Notion Content
         self.notion_children_checkbox = QCheckBox(self.texts['notion_children_option'])
         self.layout.addWidget(self.notion_children_checkbox)
@@ -138,6 +144,7 @@ class SettingsDialog(QDialog):
         self.anki_query_label.setText(self.texts['anki_query_string'])
         self.duplicate_handling_label.setText(self.texts['duplicate_handling'])
         self.delete_source_checkbox.setText(self.texts['delete_source_note'])
+        self.archive_source_checkbox.setText(self.texts['archive_notion_source_pages'])
         self.notion_children_checkbox.setText(self.texts['notion_children_option'])
         self.save_button.setText(self.texts['save'])
 
@@ -148,6 +155,7 @@ class SettingsDialog(QDialog):
         self.anki_query_input.setText(self.config.get('anki_query_string', ''))
         self.duplicate_handling_input.setText(self.config.get('duplicate_handling_way', 'keep'))
         self.delete_source_checkbox.setChecked(self.config.get('delete_source_note', True))
+        self.archive_source_checkbox.setChecked(self.config.get('archive_notion_source_pages', False))
         self.notion_children_checkbox.setChecked(self.config.get('retain_notion_children', False))
         self.language_combo.setCurrentText(self.config.get('language', '中文'))
 
@@ -159,6 +167,7 @@ class SettingsDialog(QDialog):
             'anki_query_string': self.anki_query_input.text(),
             'duplicate_handling_way': self.duplicate_handling_input.text(),
             'delete_source_note': self.delete_source_checkbox.isChecked(),
+            'archive_notion_source_pages': self.archive_source_checkbox.isChecked(),
             'retain_notion_children': self.notion_children_checkbox.isChecked(),
             'language': self.language_combo.currentText()
         })
@@ -0,0 +1,32 @@
+# 测试只覆盖不依赖 Anki 的模块：插件根目录与 lib（内置的 notion_client、httpx）加入 sys.path
+import os
+import sys
+import types
+
+import pytest
+
+PLUGIN_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for path in (os.path.join(PLUGIN_ROOT, 'lib'), PLUGIN_ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def fake_aqt(monkeypatch):
+    """以空模块代替 aqt 与 anki.utils，使依赖它们的模块可以在 Anki 之外导入"""
+    aqt = types.ModuleType("aqt")
+    aqt.mw = None
+    operations = types.ModuleType("aqt.operations")
+    operations.CollectionOp = operations.QueryOp = object
+    qt = types.ModuleType("aqt.qt")
+    qt.debug = lambda: None
+    anki = types.ModuleType("anki")
+    utils = types.ModuleType("anki.utils")
+    utils.field_checksum = utils.strip_html_media = lambda value: value
+    utils.split_fields = lambda value: value.split("\x1f")
+    for name, module in (("aqt", aqt), ("aqt.operations", operations), ("aqt.qt", qt),
+                         ("anki", anki), ("anki.utils", utils)):
+        monkeypatch.setitem(sys.modules, name, module)
+    # 重新导入，确保模块顶层（类定义）在本次测试中执行
+    for name in [name for name in sys.modules if name.startswith("core.operations") or name == "core.models.note"]:
+        monkeypatch.delitem(sys.modules, name)
@@ -0,0 +1,146 @@
+# 内存中的 Anki 集合：notes、cards、revlog 三张表（列与 Anki 相同）与同步代码用到的 col.db 查询接口
+import itertools
+import sqlite3
+import types
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE notes (id INTEGER PRIMARY KEY, guid TEXT, mid INTEGER, mod INTEGER, usn INTEGER, tags TEXT,
+                    flds TEXT, sfld TEXT, csum INTEGER, flags INTEGER, data TEXT);
+CREATE TABLE cards (id INTEGER PRIMARY KEY, nid INTEGER, did INTEGER, ord INTEGER, mod INTEGER, usn INTEGER,
+                    type INTEGER, queue INTEGER, due INTEGER, ivl INTEGER, factor INTEGER, reps INTEGER,
+                    lapses INTEGER, left INTEGER, odue INTEGER, odid INTEGER, flags INTEGER, data TEXT);
+CREATE TABLE revlog (id INTEGER PRIMARY KEY, cid INTEGER, usn INTEGER, ease INTEGER, ivl INTEGER, lastIvl INTEGER,
+                     factor INTEGER, time INTEGER, type INTEGER);
+"""
+
+
+class FakeDB:
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript(SCHEMA)
+
+    def all(self, sql, *args):
+        return [list(row) for row in self.conn.execute(sql, args)]
+
+    def list(self, sql, *args):
+        return [row[0] for row in self.conn.execute(sql, args)]
+
+    def scalar(self, sql, *args):
+        row = self.conn.execute(sql, args).fetchone()
+        return row[0] if row else None
+
+    def execute(self, sql, *args):
+        return self.conn.execute(sql, args)
+
+
+class FakeNote:
+    """anki.notes.Note 的最小替身：字段按名称读写，add_note / update_note 时写回 notes 表"""
+
+    def __init__(self, model, note_id=0, values=None, tags=()):
+        self.id = note_id
+        self.mid = model["id"]
+        self.fields = {field["name"]: "" for field in model["flds"]}
+        self.fields.update(zip(self.fields, values or ()))
+        self.tags = list(tags)
+
+    def keys(self):
+        return list(self.fields)
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __setitem__(self, name, value):
+        self.fields[name] = value
+
+    def __contains__(self, name):
+        return name in self.fields
+
+
+class FakeModels:
+    def __init__(self):
+        self.models = {}
+
+    def add(self, name, field_names):
+        model = {"id": len(self.models) + 1, "name": name, "mod": 0, "flds": [{"name": field} for field in field_names]}
+        self.models[model["id"]] = model
+        return model
+
+    def by_name(self, name):
+        return next((model for model in self.models.values() if model["name"] == name), None)
+
+    def get(self, mid):
+        return self.models.get(mid)
+
+
+class FakeDecks:
+    def __init__(self):
+        self.ids = {"Default": 1}
+
+    def id(self, name):
+        return self.ids.setdefault(name, len(self.ids) + 1)
+
+    def all_names_and_ids(self):
+        return [types.SimpleNamespace(id=did, name=name) for name, did in self.ids.items()]
+
+    def get(self, did):
+        # 与 Anki 相同：不存在的牌组回退到默认牌组
+        return {"id": did, "name": next((name for name, id_ in self.ids.items() if id_ == did), "Default")}
+
+
+class FakeCollection:
+    def __init__(self):
+        self.db = FakeDB()
+        self.models = FakeModels()
+        self.decks = FakeDecks()
+        # 调度日 100 对应 2026-03-01，下一次换日在 2026-03-02 凌晨 4 点
+        self.sched = types.SimpleNamespace(today=100, day_cutoff=datetime(2026, 3, 2, 4).timestamp())
+        self._note_ids = itertools.count(1000)
+        self.added = []    # (笔记id, 牌组id)
+        self.undo_entries = []    # add_custom_undo_entry 新建的撤销点名称，id 为下标 + 1
+        self.merged_undo = []     # merge_undo_entries 合并到的撤销点id
+
+    def new_note(self, model):
+        return FakeNote(model)
+
+    def add_note(self, note, deck_id):
+        note.id = next(self._note_ids)
+        values = list(note.fields.values())
+        self.insert_note(note.id, mod=0, mid=note.mid, fields=values, tags=" ".join(note.tags))
+        self.added.append((note.id, deck_id))
+
+    def update_note(self, note):
+        values = list(note.fields.values())
+        self.db.execute("UPDATE notes SET flds = ?, sfld = ?, csum = ?, tags = ? WHERE id = ?",
+                        "\x1f".join(values), values[0], values[0], " ".join(note.tags), note.id)
+
+    def add_custom_undo_entry(self, name):
+        self.undo_entries.append(name)
+        return len(self.undo_entries)
+
+    def merge_undo_entries(self, target):
+        self.merged_undo.append(target)
+
+    def get_note(self, note_id):
+        mid, fields, tags = self.db.all("SELECT mid, flds, tags FROM notes WHERE id = ?", note_id)[0]
+        return FakeNote(self.models.get(mid), note_id, fields.split("\x1f"), tags.split())
+
+    def insert_note(self, note_id, mod, mid=1, fields=("front", "back"), tags="", cards=()):
+        """cards 为 (卡片id, 卡片 mod) 或包含 cards 表列的字典"""
+        # 测试中 anki.utils.field_checksum 为恒等函数，csum 直接存首字段
+        self.db.execute("INSERT INTO notes VALUES (?, ?, ?, ?, -1, ?, ?, ?, ?, 0, '')",
+                        note_id, f"guid{note_id}", mid, mod, tags, "\x1f".join(fields), fields[0], fields[0])
+        for ord_, card in enumerate(cards):
+            if not isinstance(card, dict):
+                card = {"id": card[0], "mod": card[1]}
+            row = {"nid": note_id, "did": 1, "ord": ord_, "usn": -1, "type": 0, "queue": 0, "due": 0, "ivl": 0,
+                   "factor": 0, "reps": 0, "lapses": 0, "left": 0, "odue": 0, "odid": 0, "flags": 0, "data": "",
+                   **card}
+            self.db.execute(f"INSERT INTO cards ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})", *row.values())
+
+    def insert_revlog(self, revlog_id, card_id, ease=3, ivl=1, last_ivl=0, factor=2500, time=5000, type_=1):
+        self.db.execute("INSERT INTO revlog VALUES (?, ?, -1, ?, ?, ?, ?, ?, ?)",
+                        revlog_id, card_id, ease, ivl, last_ivl, factor, time, type_)
+
+    def find_notes(self, query):
+        return self.db.list("SELECT id FROM notes ORDER BY id")
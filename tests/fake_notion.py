@@ -0,0 +1,132 @@
+# 内存中的 Notion 数据库：替换 notion_client 客户端的 request（所有端点最终都经过它），不发出任何网络请求
+import asyncio
+import itertools
+import re
+
+import httpx
+from notion_client import AsyncClient, Client
+from notion_client.errors import APIResponseError
+
+
+def api_error(status, code, message="error", headers=None):
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "https://api.notion.com"))
+    return APIResponseError(response, message, code)
+
+
+def text_value(prop):
+    segments = (prop or {}).get("rich_text") or (prop or {}).get("title") or []
+    return "".join(segment["text"]["content"] for segment in segments)
+
+
+class FakeNotion:
+    """pages / blocks / databases 端点的最小实现；failures 中排队的异常在匹配的请求上依次抛出"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.schema = {}
+        self.pages = {}
+        self.children = {}
+        self.requests = []
+        self.failures = []
+        self._ids = itertools.count(1)
+
+    def install(self, monkeypatch):
+        fake = self
+
+        async def async_request(client, path, method, query=None, body=None, auth=None):
+            await asyncio.sleep(fake.latency(path, body) if callable(fake.latency) else fake.latency)
+            return fake.handle(path, method, query, body)
+
+        def request(client, path, method, query=None, body=None, auth=None):
+            return fake.handle(path, method, query, body)
+
+        monkeypatch.setattr(AsyncClient, "request", async_request)
+        monkeypatch.setattr(Client, "request", request)
+        return self
+
+    def fail(self, method, path, error, applied=False):
+        """下一次匹配 method 与 path（正则）的请求抛出 error；applied 为 True 时请求先生效再抛出（如超时）"""
+        self.failures.append((method, re.compile(path), error, applied))
+
+    def add_page(self, properties, children=(), archived=False, last_edited_time="2026-01-01T00:00:00.000Z"):
+        page_id = f"page-{next(self._ids)}"
+        self.pages[page_id] = {"object": "page", "id": page_id, "properties": properties, "archived": archived,
+                               "last_edited_time": last_edited_time}
+        self.children[page_id] = [dict(block, id=f"block-{next(self._ids)}") for block in children]
+        return page_id
+
+    def live_pages(self):
+        return [page for page in self.pages.values() if not page["archived"]]
+
+    def count(self, method, path):
+        pattern = re.compile(path)
+        return sum(1 for request in self.requests if request[0] == method and pattern.fullmatch(request[1]))
+
+    def handle(self, path, method, query, body):
+        self.requests.append((method, path, body))
+        for failure in self.failures:
+            if failure[0] == method and failure[1].fullmatch(path):
+                self.failures.remove(failure)
+                if failure[3]:
+                    self._dispatch(path, method, query or {}, body or {})
+                raise failure[2]
+        return self._dispatch(path, method, query or {}, body or {})
+
+    def _dispatch(self, path, method, query, body):
+        parts = path.split("/")
+        if parts[0] == "databases" and parts[-1] == "query":
+            pages = [page for page in self.live_pages() if self._matches(page, body.get("filter"))]
+            if any(sort.get("timestamp") == "last_edited_time" for sort in body.get("sorts", [])):
+                pages.sort(key=lambda page: page["last_edited_time"])
+            start = int(body.get("start_cursor") or 0)
+            end = start + body.get("page_size", 100)
+            return {"object": "list", "results": pages[start:end], "has_more": end < len(pages),
+                    "next_cursor": str(end) if end < len(pages) else None}
+        if parts[0] == "databases" and len(parts) == 2:
+            for name, definition in body.get("properties", {}).items():
+                self.schema[name] = {"id": f"id-{name}", "name": name, "type": next(iter(definition))}
+            return {"object": "database", "id": parts[1], "properties": self.schema}
+        if path == "pages" and method == "POST":
+            return self.pages[self.add_page(body.get("properties", {}), body.get("children", []))]
+        if parts[0] == "pages" and method == "PATCH":
+            page = self.pages.get(parts[1])
+            if page is None or page["archived"]:
+                raise api_error(404, "object_not_found")
+            page["properties"].update(body.get("properties", {}))
+            page["archived"] = body.get("archived", page["archived"])
+            return page
+        if parts[0] == "blocks" and parts[-1] == "children":
+            blocks = self.children.setdefault(parts[1], [])
+            if method == "PATCH":
+                blocks.extend(dict(block, id=f"block-{next(self._ids)}") for block in body["children"])
+                return {"object": "list", "results": []}
+            start = int(query.get("start_cursor") or 0)
+            end = start + int(query.get("page_size", 100))
+            return {"object": "list", "results": blocks[start:end], "has_more": end < len(blocks),
+                    "next_cursor": str(end) if end < len(blocks) else None}
+        if parts[0] == "blocks" and method == "DELETE":
+            for blocks in self.children.values():
+                for block in blocks:
+                    if block["id"] == parts[1]:
+                        blocks.remove(block)
+                        return dict(block, archived=True)
+            raise api_error(404, "object_not_found")
+        raise api_error(400, "invalid_request_url", path)
+
+    def _matches(self, page, condition):
+        if not condition:
+            return True
+        if "and" in condition:
+            return all(self._matches(page, part) for part in condition["and"])
+        if "or" in condition:
+            return any(self._matches(page, part) for part in condition["or"])
+        if condition.get("timestamp") == "last_edited_time":
+            return page["last_edited_time"] >= condition["last_edited_time"]["on_or_after"]
+        prop = page["properties"].get(condition.get("property"))
+        if "rich_text" in condition:
+            return text_value(prop) == condition["rich_text"]["equals"]
+        if "number" in condition:
+            return (prop or {}).get("number") == condition["number"]["equals"]
+        if "multi_select" in condition:
+            return condition["multi_select"]["contains"] in [tag["name"] for tag in (prop or {}).get("multi_select", [])]
+        return True
@@ -0,0 +1,280 @@
+import pytest
+
+from core.client.async_batch_writer import AsyncBatchWriter
+from core.client.duplicate_index import DuplicateIndex
+from core.client.rate_limiter import TokenBucketRateLimiter
+from core.client.retry_policy import RetryPolicy
+from core.models.page_map import PageMap
+from core.models.parse_and_converter import ToNotionConverter
+from fake_notion import FakeNotion, api_error, text_value
+from notion_client.errors import RequestTimeoutError
+
+DB = "db"
+
+
+def _text(value):
+    return {"rich_text": [{"text": {"content": value}}]}
+
+
+def _operation(note_id, front, back="back", mod=100):
+    data = {"Note Type": _text("Basic"), "First Field": _text("Front"), "Front": _text(front), "Back": _text(back)}
+    return {
+        "data": data,
+        "children": [],
+        "content_hash": ToNotionConverter.content_hash(data, []),
+        "note_id": note_id,
+        "mod": mod,
+        "duplicate_key": ("Basic", front),
+        "duplicate_check": {"filter": {"and": [
+            {"property": "Note Type", "rich_text": {"equals": "Basic"}},
+            {"property": "Front", "rich_text": {"equals": front}},
+        ]}},
+    }
+
+
+def _writer(concurrency=3):
+    return AsyncBatchWriter("token", TokenBucketRateLimiter(1000, 100), concurrency=concurrency,
+                            retry_policy=RetryPolicy(max_retries=2, base_delay=0))
+
+
+@pytest.fixture
+def notion(monkeypatch):
+    return FakeNotion(latency=0.01).install(monkeypatch)
+
+
+def test_results_keep_operation_order(notion):
+    # 第一条最慢，完成顺序与操作顺序不同
+    notion.latency = lambda path, body: 0.05 if body and text_value(body.get("properties", {}).get("Front")) == "0" else 0.0
+    operations = [_operation(i, str(i)) for i in range(6)]
+    result = _writer().run(DB, operations, "copy")
+    assert [item["operation"]["note_id"] for item in result["success"]] == list(range(6))
+    assert [item["action"] for item in result["success"]] == ["create"] * 6
+    assert not result["failed"] and not result["cancelled"]
+
+
+def test_same_duplicate_key_is_written_once(notion):
+    # 重复检查条件相同的操作串行执行，第二条能看到第一条创建的页面
+    operations = [_operation(1, "same"), _operation(2, "same"), _operation(3, "other")]
+    result = _writer().run(DB, operations, "keep")
+    assert [item["action"] for item in result["success"]] == ["create", "skip", "create"]
+    assert len(notion.live_pages()) == 2
+
+
+def test_overwrite_updates_existing_page(notion):
+    page_id = notion.add_page(_operation(0, "front")["data"])
+    result = _writer().run(DB, [_operation(1, "front", back="new")], "overwrite")
+    assert result["success"][0]["action"] == "update"
+    assert result["success"][0]["page_id"] == page_id
+    assert text_value(notion.pages[page_id]["properties"]["Back"]) == "new"
+
+
+def test_failure_does_not_stop_other_operations(notion):
+    notion.fail("POST", "pages", api_error(400, "validation_error"))
+    result = _writer(concurrency=1).run(DB, [_operation(1, "a"), _operation(2, "b")], "copy")
+    assert [item["operation"]["note_id"] for item in result["failed"]] == [1]
+    assert [item["operation"]["note_id"] for item in result["success"]] == [2]
+
+
+def test_cancel_stops_between_operations(notion):
+    done = []
+    result = _writer(concurrency=1).run(
+        DB, [_operation(i, str(i)) for i in range(5)], "copy",
+        progress_callback=done.append, is_cancelled=lambda: len(done) >= 2
+    )
+    assert result["cancelled"]
+    assert len(result["success"]) == 2
+    assert len(notion.live_pages()) == 2
+
+
+def test_create_timeout_is_verified_before_retrying(notion):
+    # 超时时页面其实已经创建：重试前用重复检查条件核实，不会创建第二个页面
+    notion.fail("POST", "pages", RequestTimeoutError(), applied=True)
+    result = _writer().run(DB, [_operation(1, "a")], "keep")
+    assert result["success"][0]["action"] == "create"
+    assert result["success"][0]["retries"] == 1
+    assert len(notion.live_pages()) == 1
+    assert notion.count("POST", "pages") == 1
+
+
+def test_create_rejected_with_5xx_is_retried(notion):
+    notion.fail("POST", "pages", api_error(503, "service_unavailable"))
+    result = _writer().run(DB, [_operation(1, "a")], "keep")
+    assert result["success"][0]["action"] == "create"
+    assert result["retries"] == 1
+    assert len(notion.live_pages()) == 1
+
+
+def test_copy_mode_does_not_retry_ambiguous_create(notion):
+    # copy 模式没有核实条件，结果不确定的创建不重试，避免产生重复页面
+    notion.fail("POST", "pages", RequestTimeoutError(), applied=True)
+    result = _writer().run(DB, [_operation(1, "a")], "copy")
+    assert len(result["failed"]) == 1
+    assert len(notion.live_pages()) == 1
+
+
+def test_transient_query_failure_is_retried(notion):
+    notion.fail("POST", "databases/db/query", api_error(502, "internal_server_error"))
+    result = _writer().run(DB, [_operation(1, "a")], "keep")
+    assert result["success"][0]["retries"] == 1
+
+
+def test_duplicate_index_replaces_per_note_queries(notion):
+    existing = notion.add_page(_operation(0, "a")["data"])
+    index = DuplicateIndex()
+    index.add(("Basic", "a"), existing)
+    index.complete = True    # 相当于整库扫描过的索引
+    result = _writer().run(DB, [_operation(1, "a"), _operation(2, "b"), _operation(3, "b")], "keep",
+                           duplicate_index=index)
+    assert [item["action"] for item in result["success"]] == ["skip", "create", "skip"]
+    assert notion.count("POST", "databases/db/query") == 0
+    # 新建的页面写回索引
+    assert index.lookup(("Basic", "b")) == result["success"][1]["page_id"]
+
+
+def test_incomplete_duplicate_index_prefetches_keys_in_batches(notion):
+    existing = notion.add_page(_operation(0, "a")["data"])
+    operations = [_operation(note_id, value) for note_id, value in enumerate("abcab", 1)]
+    result = _writer().run(DB, operations, "keep", duplicate_index=DuplicateIndex())
+    assert [item["action"] for item in result["success"]] == ["skip", "create", "create", "skip", "skip"]
+    assert result["success"][0]["page_id"] == existing
+    # 三个不同的键只用一次 or 组合查询
+    assert notion.count("POST", "databases/db/query") == 1
+
+
+@pytest.fixture
+def page_map(tmp_path):
+    page_map = PageMap(str(tmp_path / "page_map.sqlite3"))
+    yield page_map
+    page_map.close()
+
+
+def test_page_map_known_note_skips_lookup(notion, page_map):
+    page_id = notion.add_page(_operation(1, "a")["data"])
+    page_map.record(1, DB, page_id, mod=50)
+    result = _writer().run(DB, [_operation(1, "a")], "keep", page_map=page_map)
+    assert result["success"][0]["action"] == "skip"
+    assert notion.count("POST", "databases/db/query") == 0
+    # 跳过的笔记不更新推送时的 mod
+    assert page_map.get(1, DB)[:2] == (page_id, 50)
+
+
+def test_page_map_known_note_is_overwritten_in_place(notion, page_map):
+    page_id = notion.add_page(_operation(1, "old")["data"])
+    page_map.record(1, DB, page_id)
+    # 首字段改变后按条件查询找不到原页面，映射仍能定位
+    result = _writer().run(DB, [_operation(1, "new", mod=200)], "overwrite", page_map=page_map)
+    assert result["success"][0] == {"operation": {"note_id": 1}, "action": "update", "page_id": page_id, "retries": 0}
+    assert text_value(notion.pages[page_id]["properties"]["Front"]) == "new"
+    assert page_map.get(1, DB)[:2] == (page_id, 200)
+
+
+def test_page_map_entry_for_deleted_page_is_replaced(notion, page_map):
+    page_id = notion.add_page(_operation(1, "a")["data"], archived=True)
+    page_map.record(1, DB, page_id)
+    result = _writer().run(DB, [_operation(1, "a")], "overwrite", page_map=page_map)
+    assert result["success"][0]["action"] == "create"
+    assert page_map.lookup(1, DB) == result["success"][0]["page_id"] != page_id
+
+
+def test_created_pages_are_recorded(notion, page_map):
+    result = _writer().run(DB, [_operation(1, "a"), _operation(2, "b")], "keep", page_map=page_map)
+    assert page_map.known_note_ids(DB, [1, 2]) == {1, 2}
+    assert page_map.lookup(2, DB) == result["success"][1]["page_id"]
+
+
+def test_unchanged_content_sends_no_requests(notion, page_map):
+    page_id = notion.add_page(_operation(1, "a")["data"])
+    page_map.record(1, DB, page_id, mod=50, content_hash=_operation(1, "a")["content_hash"])
+    result = _writer().run(DB, [_operation(1, "a", mod=60)], "overwrite", page_map=page_map)
+    assert result["success"][0]["action"] == "unchanged"
+    assert notion.requests == []
+    # 内容未变时映射保持上次推送时的状态
+    assert page_map.get(1, DB)[1] == 50
+
+
+def test_changed_content_is_pushed_and_hash_recorded(notion, page_map):
+    page_id = notion.add_page(_operation(1, "a")["data"])
+    page_map.record(1, DB, page_id, mod=50, content_hash=_operation(1, "a")["content_hash"])
+    changed = _operation(1, "a", back="edited", mod=60)
+    result = _writer().run(DB, [changed], "overwrite", page_map=page_map)
+    assert result["success"][0]["action"] == "update"
+    assert page_map.get(1, DB) == (page_id, 60, changed["content_hash"])
+
+
+def _with_body(op, batches):
+    op["children"] = [_block(text) for text in batches[0]]
+    op["extra_children"] = [[_block(text) for text in batch] for batch in batches[1:]]
+    op["content_hash"] = ToNotionConverter.content_hash(op["data"], [block for batch in batches for block in map(_block, batch)])
+    return op
+
+
+def _block(text):
+    return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}}
+
+
+def _body_texts(notion, page_id):
+    return [block["paragraph"]["rich_text"][0]["text"]["content"] for block in notion.children[page_id]]
+
+
+def test_extra_children_are_appended_in_order(notion):
+    result = _writer().run(DB, [_with_body(_operation(1, "a"), [["1", "2"], ["3"], ["4", "5"]])], "keep")
+    assert _body_texts(notion, result["success"][0]["page_id"]) == ["1", "2", "3", "4", "5"]
+
+
+def test_ambiguous_append_is_checked_before_retry(notion):
+    # 超时的追加实际已生效：核对块数后不再重发
+    notion.fail("PATCH", "blocks/.*/children", RequestTimeoutError(), applied=True)
+    result = _writer().run(DB, [_with_body(_operation(1, "a"), [["1"], ["2", "3"], ["4"]])], "keep")
+    assert _body_texts(notion, result["success"][0]["page_id"]) == ["1", "2", "3", "4"]
+    assert notion.count("GET", "blocks/.*/children") == 1
+
+
+def test_failed_append_is_retried(notion):
+    notion.fail("PATCH", "blocks/.*/children", RequestTimeoutError())
+    result = _writer().run(DB, [_with_body(_operation(1, "a"), [["1"], ["2"]])], "keep")
+    assert _body_texts(notion, result["success"][0]["page_id"]) == ["1", "2"]
+    assert result["success"][0]["retries"] == 1
+
+
+def test_overwrite_replaces_page_body(notion):
+    page_id = notion.add_page(_operation(0, "a")["data"], [_block("old 1"), _block("old 2")])
+    result = _writer().run(DB, [_with_body(_operation(1, "a"), [["new 1"], ["new 2"]])], "overwrite")
+    assert result["success"][0]["action"] == "update"
+    assert _body_texts(notion, page_id) == ["new 1", "new 2"]
+
+
+def test_property_only_change_leaves_body_alone(notion, page_map):
+    pushed = _with_body(_operation(1, "a"), [["body"]])
+    page_id = notion.add_page(pushed["data"], pushed["children"])
+    page_map.record(1, DB, page_id, mod=50, content_hash=pushed["content_hash"])
+    changed = _with_body(_operation(1, "a", back="new back", mod=60), [["body"]])
+    result = _writer().run(DB, [changed], "overwrite", page_map=page_map)
+    assert result["success"][0]["action"] == "update"
+    assert not [request for request in notion.requests if request[1].startswith("blocks/")]
+    assert _body_texts(notion, page_id) == ["body"]
+
+
+def test_changed_body_is_replaced_for_known_page(notion, page_map):
+    pushed = _with_body(_operation(1, "a"), [["body"]])
+    page_id = notion.add_page(pushed["data"], pushed["children"])
+    page_map.record(1, DB, page_id, mod=50, content_hash=pushed["content_hash"])
+    edited = _with_body(_operation(1, "a", mod=60), [["edited"]])
+    _writer().run(DB, [edited], "overwrite", page_map=page_map)
+    assert _body_texts(notion, page_id) == ["edited"]
+    assert page_map.get(1, DB) == (page_id, 60, edited["content_hash"])
+
+
+def test_page_with_partial_body_is_archived(notion):
+    notion.fail("PATCH", "blocks/.*/children", api_error(400, "validation_error"))
+    result = _writer().run(DB, [_with_body(_operation(1, "a"), [["1"], ["2"]])], "keep")
+    assert len(result["failed"]) == 1
+    assert notion.live_pages() == []
+
+
+def test_partial_page_is_recorded_without_hash_when_archive_fails(notion, page_map):
+    notion.fail("PATCH", "blocks/.*/children", api_error(400, "validation_error"))
+    notion.fail("PATCH", "pages/.*", api_error(400, "validation_error"))
+    result = _writer().run(DB, [_with_body(_operation(1, "a"), [["1"], ["2"]])], "keep", page_map=page_map)
+    assert len(result["failed"]) == 1
+    (page,) = notion.live_pages()
+    assert page_map.get(1, DB)[0] == page["id"] and page_map.get(1, DB)[2] is None
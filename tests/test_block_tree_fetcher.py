@@ -0,0 +1,48 @@
+from core.client.block_tree_fetcher import BlockTreeFetcher
+from core.client.rate_limiter import TokenBucketRateLimiter
+from core.client.retry_policy import RetryPolicy
+from fake_notion import FakeNotion, api_error
+
+
+def _block(text, **fields):
+    return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": [{"text": {"content": text}}]}, **fields}
+
+
+def _texts(blocks):
+    return [(block["paragraph"]["rich_text"][0]["text"]["content"], _texts(block.get("children", [])))
+            for block in blocks if block["type"] == "paragraph"]
+
+
+def _fetcher():
+    return BlockTreeFetcher("token", TokenBucketRateLimiter(1000, 100), concurrency=2,
+                            retry_policy=RetryPolicy(max_retries=1, base_delay=0))
+
+
+def test_fetch_expands_nested_children_breadth_first(monkeypatch):
+    fake = FakeNotion(latency=0.001).install(monkeypatch)
+    page = fake.add_page({}, [_block("a", has_children=True)] + [_block(str(i)) for i in range(150)])
+    parent = fake.children[page][0]["id"]
+    fake.children[parent] = [_block("a.1", has_children=True, id="a1")]
+    fake.children["a1"] = [_block("a.1.1")]
+    trees, errors = _fetcher().fetch([page])
+    assert errors == {}
+    assert _texts(trees[page])[0] == ("a", [("a.1", [("a.1.1", [])])])
+    assert len(trees[page]) == 151    # 分页读取超过 100 个子块
+
+
+def test_child_pages_are_not_descended(monkeypatch):
+    fake = FakeNotion().install(monkeypatch)
+    page = fake.add_page({}, [{"object": "block", "type": "child_page", "child_page": {"title": "x"}, "has_children": True}])
+    trees, _ = _fetcher().fetch([page])
+    assert "children" not in trees[page][0]
+    assert fake.count("GET", "blocks/.*/children") == 1
+
+
+def test_failed_page_does_not_affect_others(monkeypatch):
+    fake = FakeNotion().install(monkeypatch)
+    good = fake.add_page({}, [_block("ok")])
+    bad = fake.add_page({}, [_block("x")])
+    fake.fail("GET", f"blocks/{bad}/children", api_error(404, "object_not_found"))
+    trees, errors = _fetcher().fetch([good, bad])
+    assert _texts(trees[good]) == [("ok", [])]
+    assert list(errors) == [bad] and bad not in trees
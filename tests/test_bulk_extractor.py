@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+
+from core.models import bulk_extractor
+from core.models.bulk_extractor import BulkExtractor
+from core.models.extraction_context import ExtractionContext
+from fake_collection import FakeCollection
+
+NOW = datetime(2026, 3, 1, 12).timestamp()
+
+
+def _extractor(col):
+    return BulkExtractor(ExtractionContext(col, now=NOW))
+
+
+def _collection():
+    col = FakeCollection()
+    model = col.models.add("Basic", ["Front", "Back", "notion正文"])
+    deck = col.decks.id("Deck::Sub")
+    col.insert_note(1700000000000, mod=1710000000, mid=model["id"], fields=("front", "back", " <b>body</b> "),
+                    tags="a b", cards=[
+                        # 按 ord 排序的第一张卡片：复习卡，5 天后到期
+                        {"id": 11, "did": deck, "type": 2, "queue": 2, "due": 105, "ivl": 7, "factor": 2500,
+                         "reps": 4, "lapses": 1, "data": json.dumps({"d": 5.0, "s": 12.5})},
+                        {"id": 12, "did": 1, "type": 0, "queue": -1, "due": 3},
+                    ])
+    col.insert_note(1700000000001, mod=1710000001, mid=model["id"], fields=("second", "", ""),
+                    cards=[{"id": 21, "did": 1, "type": 0, "queue": -1, "due": 3}])
+    col.insert_note(1700000000002, mod=1710000002, mid=model["id"], fields=("no cards", "", ""))
+    return col
+
+
+def test_snapshot_from_first_card():
+    (snapshot,) = _extractor(_collection()).extract([1700000000000])
+    properties = snapshot.properties()
+    assert snapshot.note_id == 1700000000000 and snapshot.mod == 1710000000
+    assert snapshot.body_html == "<b>body</b>"
+    assert "notion正文" not in properties
+    assert (properties["Front"], properties["Back"], properties["Tags"]) == ("front", "back", "a, b")
+    assert (properties["Deck"], properties["Note Type"], properties["First Field"]) == ("Deck::Sub", "Basic", "Front")
+    assert (properties["Review Count"], properties["Ease Factor"], properties["Interval"], properties["Lapses"]) == (4, 2.5, 7, 1)
+    assert properties["Due Date"] == "2026-03-06T00:00:00"
+    assert (properties["Difficulty"], properties["Stability"]) == ({"number": 5.0}, {"number": 12.5})
+    assert properties["Suspended"] is False
+
+
+def test_suspended_and_cardless_notes():
+    suspended, cardless = _extractor(_collection()).extract([1700000000001, 1700000000002])
+    assert suspended.suspended is True and suspended.due is None
+    assert cardless.deck == "" and cardless.card_type is None
+
+
+def test_iter_snapshots_keeps_order_across_chunks_and_skips_missing(monkeypatch):
+    monkeypatch.setattr(bulk_extractor, "SQL_CHUNK_SIZE", 2)
+    col = _collection()
+    queries = []
+    original = col.db.all
+    col.db.all = lambda sql, *args: queries.append(sql) or original(sql, *args)
+    note_ids = [1700000000002, 42, 1700000000000, 1700000000001]
+    assert [snapshot.note_id for snapshot in _extractor(col).iter_snapshots(note_ids)] == [
+        1700000000002, 1700000000000, 1700000000001]
+    # 每个分片两条 SQL（notes 与 cards）
+    assert len(queries) == 4
+
+
+def test_all_cards_schedule_in_ord_order():
+    col = _collection()
+    (first_card,) = _extractor(col).extract([1700000000000])
+    assert first_card.card_schedule is None and "Card Scheduling" not in first_card.properties()
+    (snapshot,) = BulkExtractor(ExtractionContext(col, now=NOW), all_cards=True).extract([1700000000000])
+    cards = json.loads(snapshot.properties()["Card Scheduling"])
+    assert [card["ord"] for card in cards] == [0, 1]
+    assert cards[0] == {"ord": 0, "type": 2, "queue": 2, "due": 105, "ivl": 7, "factor": 2500, "reps": 4,
+                        "lapses": 1, "due_date": "2026-03-06T00:00:00", "d": 5.0, "s": 12.5}
+    assert cards[1]["queue"] == -1 and "due_date" not in cards[1]
+    # 顶层的调度属性仍取自第一张卡片
+    assert snapshot.astuple()[:-1] == first_card.astuple()[:-1]
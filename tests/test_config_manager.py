@@ -0,0 +1,24 @@
+import json
+import os
+
+from core.operations import config_manager
+from core.operations.config_manager import ConfigManager
+
+PLUGIN_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_reads_config_from_plugin_root():
+    assert config_manager.CONFIG_PATH == os.path.join(PLUGIN_ROOT, "config.json")
+    with open(os.path.join(PLUGIN_ROOT, "config.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    assert ConfigManager().get("notion_token") == expected["notion_token"]
+
+
+def test_set_writes_back_to_the_same_file(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    path.write_text('{"language": "English"}', encoding="utf-8")
+    monkeypatch.setattr(config_manager, "CONFIG_PATH", str(path))
+    manager = ConfigManager()
+    manager.set("notion_token", "secret")
+    assert json.loads(path.read_text(encoding="utf-8")) == {"language": "English", "notion_token": "secret"}
+    assert ConfigManager().get("notion_token") == "secret"
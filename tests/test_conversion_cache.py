@@ -0,0 +1,48 @@
+from core.models.conversion_cache import ConversionCache
+
+
+def _counting_convert():
+    calls = []
+
+    def convert(html):
+        calls.append(html)
+        return [{"type": "paragraph", "paragraph": {"rich_text": [{"text": {"content": html}}]}}]
+    return convert, calls
+
+
+def test_same_html_is_converted_once_and_hits_are_independent_copies():
+    cache = ConversionCache(max_entries=10)
+    convert, calls = _counting_convert()
+    first = cache.get_or_convert("<b>x</b>", convert)
+    first[0]["type"] = "changed"
+    second = cache.get_or_convert("<b>x</b>", convert)
+    assert calls == ["<b>x</b>"]
+    assert second[0]["type"] == "paragraph"
+    assert cache.stats() == {"hits": 1, "disk_hits": 0, "misses": 1, "entries": 1}
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ConversionCache(max_entries=2)
+    convert, calls = _counting_convert()
+    for html in ("a", "b", "a", "c", "a", "b"):
+        cache.get_or_convert(html, convert)
+    assert calls == ["a", "b", "c", "b"]
+
+
+def test_persisted_entries_survive_restart(tmp_path):
+    path = str(tmp_path / "conversion_cache.sqlite3")
+    convert, calls = _counting_convert()
+    cache = ConversionCache(path=path)
+    cache.get_or_convert("a", convert)
+    cache.close()
+    cache = ConversionCache(path=path)
+    assert cache.get_or_convert("a", convert)[0]["paragraph"]["rich_text"][0]["text"]["content"] == "a"
+    assert calls == ["a"]
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+
+def test_from_config_size_zero_disables_cache():
+    assert ConversionCache.from_config({"conversion_cache_size": 0}) is None
+    cache = ConversionCache.from_config({"conversion_cache_size": 5, "conversion_cache_persist": False})
+    assert cache.max_entries == 5 and cache._conn is None
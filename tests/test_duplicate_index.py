@@ -0,0 +1,138 @@
+import asyncio
+
+from core.client.duplicate_index import DuplicateIndex, rich_text_value
+from core.client.notion_client import NotionClient
+from core.models.page_map import PageMap
+from fake_notion import FakeNotion
+
+
+def _text(value):
+    return {"rich_text": [{"plain_text": value}]}
+
+
+def _page(page_id, note_type, front):
+    return {"id": page_id, "properties": {
+        "Note Type": _text(note_type), "First Field": _text("Front"), "Front": _text(front)}}
+
+
+class FakeDatabases:
+    """按 page_size 分页返回固定的页面，记录每次查询的参数"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.queries = []
+
+    def retrieve(self, database_id):
+        return {"properties": {name: {"id": f"id-{name}"} for name in ("Note Type", "First Field", "Front", "Back")}}
+
+    def query(self, **kwargs):
+        self.queries.append(kwargs)
+        start = int(kwargs.get("start_cursor") or 0)
+        end = start + kwargs["page_size"]
+        return {"results": self.pages[start:end], "has_more": end < len(self.pages), "next_cursor": str(end)}
+
+
+class FakeClient:
+    def __init__(self, pages):
+        self.databases = FakeDatabases(pages)
+
+
+class FakeAsyncDatabases(FakeDatabases):
+    """按 or 条件中的首字段值过滤页面"""
+
+    async def query(self, **kwargs):
+        self.queries.append(kwargs)
+        values = {condition["and"][1]["rich_text"]["equals"] for condition in kwargs["filter"]["or"]}
+        results = [page for page in self.pages if DuplicateIndex.key_of_page(page)[1] in values]
+        return {"results": results, "has_more": False}
+
+
+class FakeAsyncClient:
+    def __init__(self, pages):
+        self.databases = FakeAsyncDatabases(pages)
+
+
+def _operation(note_type, front):
+    return {
+        "duplicate_key": (note_type, front),
+        "duplicate_check": {"filter": {"and": [
+            {"property": "Note Type", "rich_text": {"equals": note_type}},
+            {"property": "Front", "rich_text": {"equals": front}},
+        ]}},
+    }
+
+
+def test_rich_text_value():
+    assert rich_text_value(None) == ""
+    assert rich_text_value({"title": [{"text": {"content": "a"}}, {"plain_text": "b"}]}) == "ab"
+
+
+def test_key_of_page_uses_first_field_name():
+    assert DuplicateIndex.key_of_page(_page("p", "Basic", "hello")) == ("Basic", "hello")
+    assert DuplicateIndex.key_of_page({"properties": {"Note Type": _text("Basic")}}) is None
+
+
+def test_load_scans_all_pages_and_keeps_first_duplicate():
+    pages = [_page(f"p{i}", "Basic", f"front {i}") for i in range(250)] + [_page("dup", "Basic", "front 0")]
+    client = FakeClient(pages)
+    index = DuplicateIndex().load(client, "db", property_names=["Front"])
+    assert index.complete
+    assert len(index) == 250
+    assert index.lookup(("Basic", "front 0")) == "p0"
+    assert index.page_ids == {page["id"] for page in pages}
+    assert index.scan_requests == 3
+    # 只请求构造键所需的属性
+    assert sorted(client.databases.queries[0]["filter_properties"]) == ["id-First Field", "id-Front", "id-Note Type"]
+
+
+def test_load_stops_at_max_requests():
+    client = FakeClient([_page(f"p{i}", "Basic", str(i)) for i in range(250)])
+    index = DuplicateIndex().load(client, "db", max_requests=2)
+    assert not index.complete
+    assert len(index) == 200
+
+
+def test_prefetch_queries_only_unknown_keys_in_batches():
+    client = FakeAsyncClient([_page("p1", "Basic", "a"), _page("p2", "Basic", "c")])
+    index = DuplicateIndex()
+    index.add(("Basic", "known"), "p0")
+    operations = [_operation("Basic", value) for value in ("a", "b", "known", "a", "c")]
+
+    async def run():
+        return [op async for op in index.prefetch(client, "db", operations, batch_size=2)]
+
+    assert asyncio.run(run()) == operations
+    assert index.lookup(("Basic", "a")) == "p1"
+    assert index.lookup(("Basic", "b")) is None
+    assert index.lookup(("Basic", "c")) == "p2"
+    queried = [len(query["filter"]["or"]) for query in client.databases.queries]
+    assert queried == [2, 1]
+
+
+def _client_with_pages(monkeypatch, count):
+    fake = FakeNotion().install(monkeypatch)
+    for i in range(count):
+        fake.add_page({"Note Type": _text("Basic"), "First Field": _text("Front"), "Front": _text(str(i))})
+    return fake, NotionClient("token", requests_per_second=1000, burst=100)
+
+
+def test_auto_lookup_caps_scan_even_with_mapped_pages(monkeypatch, tmp_path):
+    fake, client = _client_with_pages(monkeypatch, 350)
+    page_map = PageMap(str(tmp_path / "page_map.sqlite3"))
+    page_map.record(1, "db", "page-1")
+    # 50 条待检查笔记按批查询只需 1 次请求：扫描最多 1 次请求，未扫完就改为按批查询
+    index = client.build_lookup_index("db", {"duplicate_lookup": "auto"}, 50, page_map=page_map)
+    assert not index.complete and fake.count("POST", "databases/db/query") == 1
+    page_map.close()
+
+
+def test_auto_lookup_skips_scan_when_mapped_pages_already_cost_more(monkeypatch, tmp_path):
+    fake, client = _client_with_pages(monkeypatch, 10)
+    page_map = PageMap(str(tmp_path / "page_map.sqlite3"))
+    for note_id in range(150):
+        page_map.record(note_id, "db", f"page-{note_id}")
+    index = client.build_lookup_index("db", {"duplicate_lookup": "auto"}, 50, page_map=page_map)
+    assert not index.complete and fake.count("POST", "databases/db/query") == 0
+    # 数据库较小时扫描在预算内完成
+    assert client.build_lookup_index("db", {"duplicate_lookup": "auto"}, 50).complete
+    page_map.close()
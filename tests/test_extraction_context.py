@@ -0,0 +1,32 @@
+from datetime import date, datetime
+
+from core.models.extraction_context import ExtractionContext
+from fake_collection import FakeCollection
+
+
+def test_names_are_looked_up_once_per_id():
+    col = FakeCollection()
+    col.models.add("Basic", ["Front", "Back"])
+    calls = []
+    original_deck, original_model = col.decks.get, col.models.get
+    col.decks.get = lambda did: calls.append(("deck", did)) or original_deck(did)
+    col.models.get = lambda mid: calls.append(("model", mid)) or original_model(mid)
+    context = ExtractionContext(col)
+    for _ in range(3):
+        assert context.deck_name(1) == "Default"
+        assert context.note_type(1) == ("Basic", ["Front", "Back"])
+        assert context.note_type(99) == ("", [])
+    assert calls == [("deck", 1), ("model", 1), ("model", 99)]
+
+
+def test_scheduler_state_is_fixed_at_creation():
+    col = FakeCollection()
+    context = ExtractionContext(col, now=datetime(2026, 3, 1, 23, 59).timestamp())
+    col.sched.today = 101
+    assert (context.today, context.today_date) == (100, date(2026, 3, 1))
+
+
+def test_today_date_follows_scheduler_rollover_not_midnight():
+    # 午夜之后、换日之前，sched.today 仍是前一天
+    context = ExtractionContext(FakeCollection(), now=datetime(2026, 3, 2, 2).timestamp())
+    assert context.today_date == date(2026, 3, 1)
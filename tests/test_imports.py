@@ -0,0 +1,28 @@
+import importlib
+import sys
+
+
+def test_sync_strategy_imports(fake_aqt):
+    sync_strategy = importlib.import_module("core.operations.sync_strategy")
+    assert not sync_strategy.AnkiToNotionStrategy.__abstractmethods__
+    assert not sync_strategy.NotionToAnkiStrategy.__abstractmethods__
+
+
+def test_sync_executor_imports(fake_aqt):
+    sync_executor = importlib.import_module("core.operations.sync_executor")
+    assert sync_executor.SyncExecutor.execute_strategy
+
+
+def test_sync_worker_top_level_is_stdlib_only():
+    # 子进程以脚本方式运行 sync_worker，顶层不能导入插件模块与 aqt
+    import runpy
+    from core.operations import sync_worker
+    namespace = runpy.run_path(sync_worker.__file__, run_name="not_the_worker")
+    assert "worker_main" in namespace
+
+
+def test_note_models_do_not_need_aqt(monkeypatch):
+    monkeypatch.setitem(sys.modules, "aqt", None)    # 导入 aqt 时抛出 ImportError
+    monkeypatch.delitem(sys.modules, "core.models.note", raising=False)
+    note = importlib.import_module("core.models.note")
+    assert not hasattr(note, "AnkiNote")
@@ -0,0 +1,71 @@
+import pickle
+from datetime import timezone
+
+import pytest
+
+from core.models.note_snapshot import NoteSnapshot
+from core.models.parse_and_converter import ToNotionConverter
+
+
+def _snapshot(front="hello", body_html="", note_id=1700000000000):
+    return NoteSnapshot(
+        note_id, 1710000000, timezone.utc,
+        "Deck", "a, b", "Basic", "Front",
+        2, None, 3, 2.5, 10, 0, False,
+        5.0, None, None,
+        ("Front", "Back"), (front, "back"), body_html
+    )
+
+
+def test_snapshot_is_immutable():
+    snapshot = _snapshot()
+    with pytest.raises(AttributeError):
+        snapshot.deck = "other"
+    assert not hasattr(snapshot, "__dict__")
+
+
+def test_pack_unpack_round_trip():
+    snapshots = [_snapshot(), _snapshot("x", "<b>body</b>", note_id=1700000000001)]
+    rows = NoteSnapshot.pack(snapshots)
+    assert all(type(row) is tuple for row in rows)
+    assert NoteSnapshot.unpack(pickle.loads(pickle.dumps(rows))) == snapshots
+
+
+def test_properties_derive_ids_and_times():
+    properties = _snapshot().properties()
+    assert properties["Anki ID"] == "1700000000000"
+    assert properties["Creation Time"] == "2023-11-14T22:13:20+00:00"
+    assert properties["Difficulty"] == {"number": 5.0}
+    assert "Stability" not in properties
+    assert (properties["Front"], properties["Back"]) == ("hello", "back")
+
+
+def test_build_operation_from_snapshot():
+    operation = ToNotionConverter.build_operation(_snapshot(body_html="<b>x</b>"))
+    assert operation["note_id"] == 1700000000000 and operation["mod"] == 1710000000
+    assert operation["duplicate_key"] == ("Basic", "hello")
+    assert operation["children"][0]["type"] == "paragraph"
+
+
+def test_build_operation_encodes_properties_and_body():
+    operation = ToNotionConverter.build_operation(_snapshot(body_html="<p>body</p>"))
+    data = operation["data"]
+    assert data["Anki ID"] == {"number": 1700000000000}
+    assert data["Tags"] == {"multi_select": [{"name": "a"}, {"name": "b"}]}
+    assert data["Difficulty"] == {"number": 5.0}
+    assert "Stability" not in data and "Due Date" not in data
+    assert operation["duplicate_check"]["filter"]["and"][1] == {"property": "Front", "rich_text": {"equals": "hello"}}
+    assert [block["type"] for block in operation["children"]] == ["paragraph"]
+    assert operation["extra_children"] == []
+    assert operation["content_hash"] == ToNotionConverter.content_hash(data, operation["children"])
+
+
+def test_build_operation_long_first_field_and_body():
+    front = "f" * 4500
+    operation = ToNotionConverter.build_operation(_snapshot(front, "<div>x</div>" * 250))
+    # 长字段切成多个片段，重复检查使用完整的值
+    assert len(operation["data"]["Front"]["rich_text"]) == 3
+    assert operation["duplicate_key"] == ("Basic", front)
+    # 正文超过单次请求的块数上限时，其余部分放入 extra_children
+    assert len(operation["children"]) == 100
+    assert sum(len(batch) for batch in operation["extra_children"]) == 150
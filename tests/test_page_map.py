@@ -0,0 +1,91 @@
+import pytest
+
+from core.models.page_map import PageMap
+
+DB = "database-1"
+
+
+@pytest.fixture
+def page_map(tmp_path):
+    page_map = PageMap(str(tmp_path / "page_map.sqlite3"), flush_every=3)
+    yield page_map
+    page_map.close()
+
+
+def test_lookup_unknown_note_returns_none(page_map):
+    assert page_map.lookup(1, DB) is None
+    assert page_map.get(1, DB) is None
+
+
+def test_record_is_visible_before_flush(page_map):
+    page_map.record(1, DB, "page-1", mod=10, content_hash="a:b")
+    assert page_map.get(1, DB) == ("page-1", 10, "a:b")
+    assert page_map.known_note_ids(DB, [1, 2]) == {1}
+
+
+def test_record_without_mod_keeps_previous_values(page_map):
+    page_map.record(1, DB, "page-1", mod=10, content_hash="a:b")
+    page_map.flush()
+    page_map.record(1, DB, "page-1")
+    # 合并未写入的记录与已写入的记录
+    assert page_map.get(1, DB) == ("page-1", 10, "a:b")
+    page_map.flush()
+    assert page_map.get(1, DB) == ("page-1", 10, "a:b")
+
+
+def test_mappings_are_scoped_by_database(page_map):
+    page_map.record(1, DB, "page-1")
+    page_map.record(1, "database-2", "page-2")
+    assert page_map.lookup(1, DB) == "page-1"
+    assert page_map.lookup(1, "database-2") == "page-2"
+    assert page_map.count(DB) == 1
+    assert len(page_map) == 2
+
+
+def test_flushes_every_n_records(tmp_path):
+    path = str(tmp_path / "page_map.sqlite3")
+    page_map = PageMap(path, flush_every=2)
+    page_map.record(1, DB, "page-1")
+    page_map.record(2, DB, "page-2")
+    # 另一个连接能读到已提交的记录
+    other = PageMap(path)
+    assert other.known_note_ids(DB, [1, 2]) == {1, 2}
+    other.close()
+    page_map.close()
+
+
+def test_close_persists_pending_records(tmp_path):
+    path = str(tmp_path / "page_map.sqlite3")
+    page_map = PageMap(path)
+    page_map.record(1, DB, "page-1", mod=5)
+    page_map.close()
+    reopened = PageMap(path)
+    assert reopened.get(1, DB) == ("page-1", 5, None)
+    reopened.close()
+
+
+def test_known_note_ids_handles_many_ids(page_map):
+    for note_id in range(0, 1200, 2):
+        page_map.record(note_id, DB, f"page-{note_id}")
+    assert page_map.known_note_ids(DB, range(1200)) == set(range(0, 1200, 2))
+
+
+def test_forget_pages_and_prune(page_map):
+    for note_id in range(1, 5):
+        page_map.record(note_id, DB, f"page-{note_id}")
+    page_map.forget_pages(DB, ["page-1"])
+    assert page_map.lookup(1, DB) is None
+    assert page_map.prune(DB, ["page-2", "page-3"]) == 1
+    assert page_map.known_note_ids(DB, range(1, 5)) == {2, 3}
+
+
+def test_reads_do_not_commit_pending_records(tmp_path):
+    path = str(tmp_path / "page_map.sqlite3")
+    page_map = PageMap(path, flush_every=100)
+    page_map.record(1, DB, "page-1", mod=5)
+    assert page_map.get(1, DB) == ("page-1", 5, None)
+    assert page_map.known_note_ids(DB, [1]) == {1}
+    other = PageMap(path)
+    assert other.get(1, DB) is None
+    other.close()
+    page_map.close()
@@ -0,0 +1,155 @@
+from benchmarks.bench_property_encoder import legacy_convert, synthetic_notes
+from core.models.parse_and_converter import (
+    BODY_FIELD, META_FIELDS, ToAnkiConverter, ToNotionConverter, parse_notion_https_for_database_id
+)
+from core.models.payload_shaper import MAX_TEXT_LENGTH
+
+convert = ToNotionConverter.convert_anki_html_to_notion_children
+
+
+def _segments(block):
+    return block[block["type"]]["rich_text"]
+
+
+def test_parse_database_id_from_url():
+    url = "https://www.notion.so/work/Vocabulary-0123456789abcdef0123456789abcdef?v=fedcba9876543210fedcba9876543210"
+    assert parse_notion_https_for_database_id(url) == "01234567-89ab-cdef-0123-456789abcdef"
+    assert parse_notion_https_for_database_id("https://www.notion.so/nothing") is None
+
+
+def test_content_hash_is_stable_and_order_independent():
+    data = {"Front": {"rich_text": [{"text": {"content": "a"}}]}, "Deck": {"rich_text": []}}
+    reordered = dict(reversed(list(data.items())))
+    assert ToNotionConverter.content_hash(data, []) == ToNotionConverter.content_hash(reordered, [])
+    assert ToNotionConverter.content_hash(data, []) != ToNotionConverter.content_hash(data, [{"type": "paragraph"}])
+    assert ToNotionConverter.content_hash(data, []) != ToNotionConverter.content_hash({**data, "Back": {"number": 1}}, [])
+
+
+def test_annotations_become_rich_text_segments():
+    (block,) = convert("<b>bold</b> and <i><u>both</u></i>")
+    assert block["type"] == "paragraph"
+    assert [(segment["text"]["content"], segment.get("annotations")) for segment in _segments(block)] == [
+        ("bold", {"bold": True}), (" and ", None), ("both", {"italic": True, "underline": True})]
+
+
+def test_structure_tags_become_blocks():
+    blocks = convert("<h1>Title</h1><div>x<br>y</div><ul><li>one</li><li>two</li></ul><pre><code>x=1</code></pre>")
+    assert [block["type"] for block in blocks] == [
+        "heading_1", "paragraph", "bulleted_list_item", "bulleted_list_item", "code"]
+    assert _segments(blocks[1])[0]["text"]["content"] == "x\ny"
+
+
+def test_nested_list_goes_into_parent_item():
+    (item,) = convert("<ol><li>one<ul><li>inner</li></ul></li></ol>")
+    assert item["type"] == "numbered_list_item"
+    (child,) = item["numbered_list_item"]["children"]
+    assert (child["type"], _segments(child)[0]["text"]["content"]) == ("bulleted_list_item", "inner")
+
+
+def test_entities_comments_and_links():
+    (block,) = convert('a &amp; b<!-- <b>c</b> --> <a href="https://example.com?a=1&amp;b=2">link</a>')
+    segments = _segments(block)
+    assert segments[0]["text"]["content"] == "a & b "
+    assert segments[1]["text"] == {"content": "link", "link": {"url": "https://example.com?a=1&b=2"}}
+
+
+def test_unsafe_link_scheme_is_dropped():
+    (block,) = convert('<a href="javascript:alert(1)">x</a>')
+    assert "link" not in _segments(block)[0]["text"]
+
+
+def test_code_block_language():
+    (block,) = convert('<pre><code class="language-Python">x &lt; 1</code></pre>')
+    assert block["code"]["language"] == "python"
+    assert _segments(block)[0]["text"]["content"] == "x < 1"
+
+
+def test_empty_html_gives_no_blocks():
+    assert convert("") == []
+
+
+def test_render_blocks_groups_list_items_and_keeps_formatting():
+    blocks = [
+        {"type": "bulleted_list_item", "bulleted_list_item": {"rich_text": [{"text": {"content": "one"}}]}},
+        {"type": "bulleted_list_item", "bulleted_list_item": {"rich_text": [
+            {"text": {"content": "a<b", "link": {"url": "https://example.com"}}, "annotations": {"bold": True}}]}},
+        {"type": "equation", "equation": {"expression": "x^2"}},
+        {"type": "code", "code": {"language": "python", "rich_text": [{"plain_text": "x < 1"}]}},
+    ]
+    assert ToAnkiConverter.render_blocks(blocks) == (
+        '<ul><li>one</li><li><a href="https://example.com"><b>a&lt;b</b></a></li></ul>'
+        '<div>\\[x^2\\]</div><pre><code class="language-python">x &lt; 1</code></pre>')
+
+
+def test_render_blocks_round_trip():
+    html = "<h2>h</h2><div><b>bold</b> <i>it</i></div><ul><li>one</li><li>two<ol><li>x</li></ol></li></ul>"
+    assert convert(ToAnkiConverter.render_blocks(convert(html))) == convert(html)
+
+
+def test_expected_property_types():
+    expected = ToNotionConverter.expected_property_types({"Front", BODY_FIELD})
+    assert set(expected) == META_FIELDS | {"Front"}
+    assert expected["Tags"] == "multi_select"
+    assert expected["Anki ID"] == "number"
+    assert expected["Creation Time"] == "date"
+    assert expected["Front"] == "rich_text"
+
+
+def test_convert_properties_numbers():
+    properties = ToNotionConverter.convert_properties({
+        "Anki ID": "1700000000000", "Interval": 3, "Ease Factor": "2.5", "Lapses": "1e3",
+        "Review Count": float("nan"), "Difficulty": {"number": 4.2}, "Stability": "n/a", "Retrievability": None})
+    assert {field: value["number"] for field, value in properties.items()} == {
+        "Anki ID": 1700000000000, "Interval": 3, "Ease Factor": 2.5, "Lapses": 1000.0,
+        "Review Count": 0, "Difficulty": 4.2, "Stability": 0}
+
+
+def test_convert_properties_splits_long_text():
+    properties = ToNotionConverter.convert_properties({"Front": "x" * (MAX_TEXT_LENGTH + 1), "Tags": "a, b", "Suspended": 0})
+    assert [len(segment["text"]["content"]) for segment in properties["Front"]["rich_text"]] == [MAX_TEXT_LENGTH, 1]
+    assert properties["Tags"] == {"multi_select": [{"name": "a"}, {"name": "b"}]}
+    assert properties["Suspended"] == {"checkbox": False}
+
+
+def test_convert_properties_matches_legacy_pipeline():
+    for note_properties in synthetic_notes(count=300, seed=1):
+        assert ToNotionConverter.convert_properties(note_properties) == legacy_convert(note_properties)
+
+
+def test_content_hash_separates_properties_and_body():
+    data_hash, body_hash = ToNotionConverter.content_hash({"a": 1}, []).split(":")
+    assert ToNotionConverter.content_hash({"a": 1}, [{"x": 1}]).split(":")[0] == data_hash
+    assert ToNotionConverter.content_hash({"a": 2}, []).split(":")[1] == body_hash
+
+
+def test_tag_case_self_closing_tags_and_attributes():
+    blocks = convert('<DIV><B>x</B><br/>y</DIV><p><A HREF="https://a.example" class="c">z</A></p>'
+                     '<pre><code id="c" class="language-JavaScript">fn</code></pre>')
+    assert [(segment["text"]["content"], segment.get("annotations")) for segment in _segments(blocks[0])] == [
+        ("x", {"bold": True}), ("\ny", None)]
+    assert _segments(blocks[1])[0]["text"]["link"] == {"url": "https://a.example"}
+    assert blocks[2]["code"]["language"] == "javascript"
+
+
+def test_literal_less_than_is_text():
+    assert [_segments(block)[0]["text"]["content"] for block in convert("<p>if a<b: pass</p><div>1 <2</div>")] == [
+        "if a<b: pass", "1 <2"]
+    (block,) = convert("<pre>if a<b and c<d: x</pre>")
+    assert _segments(block)[0]["text"]["content"] == "if a<b and c<d: x"
+
+
+def test_style_and_script_contents_are_dropped():
+    blocks = convert("<p>x</p><style>p { color: red }</style><SCRIPT type='a'>if (a<b) {}</SCRIPT><p>y</p><style>")
+    assert [_segments(block)[0]["text"]["content"] for block in blocks] == ["x", "y"]
+
+
+def test_code_block_merges_runs_that_differ_only_in_formatting():
+    (block,) = convert('<pre>a<b>b</b><span>c</span>\n<i>d</i><a href="https://a.example">e</a>f</pre>')
+    assert [segment["text"] for segment in _segments(block)] == [
+        {"content": "abc\nd"}, {"content": "e", "link": {"url": "https://a.example"}}, {"content": "f"}]
+
+
+def test_span_and_font_keep_surrounding_format():
+    (block,) = convert('<b>a <span style="color: red">b</span> <FONT color=red>c</FONT></b> <b class="x">d</b>')
+    assert [(segment["text"]["content"], segment.get("annotations")) for segment in _segments(block)] == [
+        ("a b c", {"bold": True}), (" ", None), ("d", {"bold": True})]
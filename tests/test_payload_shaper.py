@@ -0,0 +1,75 @@
+from core.models.payload_shaper import (
+    MAX_CHILDREN, MAX_RICH_TEXT_SEGMENTS, MAX_TEXT_LENGTH,
+    batch_blocks, chunk_rich_text, encoded_size, shape_blocks, split_text
+)
+
+
+def _paragraph(text, children=None):
+    block = {"object": "block", "type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}}
+    if children:
+        block["paragraph"]["children"] = children
+    return block
+
+
+def _utf16_length(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def test_split_text_short_text_is_unchanged():
+    assert split_text("abc") == ["abc"]
+
+
+def test_split_text_respects_limit_and_keeps_content():
+    text = "x" * (MAX_TEXT_LENGTH * 2 + 5)
+    pieces = split_text(text)
+    assert [len(piece) for piece in pieces] == [MAX_TEXT_LENGTH, MAX_TEXT_LENGTH, 5]
+    assert "".join(pieces) == text
+
+
+def test_split_text_counts_utf16_code_units():
+    # emoji 占两个 UTF-16 码元，按字符数切分会超出 Notion 的上限
+    text = "😀" * MAX_TEXT_LENGTH
+    pieces = split_text(text)
+    assert all(_utf16_length(piece) <= MAX_TEXT_LENGTH for piece in pieces)
+    assert "".join(pieces) == text
+
+
+def test_chunk_rich_text_keeps_annotations():
+    segment = {"type": "text", "text": {"content": "y" * (MAX_TEXT_LENGTH + 1)}, "annotations": {"bold": True}}
+    shaped = chunk_rich_text([segment])
+    assert len(shaped) == 2
+    assert all(piece["annotations"] == {"bold": True} for piece in shaped)
+
+
+def test_shape_blocks_splits_long_rich_text_into_blocks():
+    block = {"object": "block", "type": "paragraph", "paragraph": {
+        "rich_text": [{"type": "text", "text": {"content": "z"}} for _ in range(MAX_RICH_TEXT_SEGMENTS + 1)]}}
+    shaped = shape_blocks([block])
+    assert [len(piece["paragraph"]["rich_text"]) for piece in shaped] == [MAX_RICH_TEXT_SEGMENTS, 1]
+
+
+def test_shape_blocks_lifts_children_beyond_nesting_limit():
+    block = _paragraph("a", [_paragraph("b", [_paragraph("c")])])
+    shaped = shape_blocks([block])
+    # 第三层的块提升到第二层，紧随其父块之后
+    assert [child["paragraph"]["rich_text"][0]["text"]["content"] for child in shaped[0]["paragraph"]["children"]] == ["b", "c"]
+    assert "children" not in shaped[0]["paragraph"]["children"][0]["paragraph"]
+
+
+def test_batch_blocks_limits_children_per_request():
+    blocks = [_paragraph(str(i)) for i in range(MAX_CHILDREN * 2 + 1)]
+    batches = batch_blocks(blocks)
+    assert [len(batch) for batch in batches] == [MAX_CHILDREN, MAX_CHILDREN, 1]
+    assert [block for batch in batches for block in batch] == blocks
+
+
+def test_batch_blocks_empty_body_gives_one_empty_batch():
+    assert batch_blocks([]) == [[]]
+
+
+def test_batch_blocks_respects_request_size():
+    blocks = [_paragraph("w" * 1900) for _ in range(60)]
+    reserved = 400_000
+    batches = batch_blocks(blocks, first_reserved=reserved)
+    assert reserved + sum(encoded_size(block) for block in batches[0]) <= 450_000
+    assert sum(len(batch) for batch in batches) == len(blocks)
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from core.client import rate_limiter
+from core.client.rate_limiter import TokenBucketRateLimiter, get_shared_rate_limiter, parse_retry_after
+from core.client.throttled_client import ThrottledAsyncClient, ThrottledClient
+from fake_notion import FakeNotion, api_error
+
+
+@pytest.mark.parametrize("value, expected", [("2", 2.0), ("0.5", 0.5), ("-1", 0.0), (None, 1.0), ("soon", 1.0)])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_burst_then_paced_by_rate():
+    limiter = TokenBucketRateLimiter(requests_per_second=10, burst=2)
+    delays = [limiter._reserve() for _ in range(4)]
+    assert delays[:2] == [0.0, 0.0]
+    # 令牌用完后按速率预约：第 3、4 个请求分别等待约 0.1、0.2 秒
+    assert delays[2] == pytest.approx(0.1, abs=0.01)
+    assert delays[3] == pytest.approx(0.2, abs=0.01)
+    stats = limiter.stats()
+    assert stats["requests"] == 4
+    assert stats["throttled_requests"] == 2
+
+
+def test_reservations_are_shared_between_threads():
+    limiter = TokenBucketRateLimiter(requests_per_second=100, burst=1)
+    delays = []
+    threads = [threading.Thread(target=lambda: delays.append(limiter._reserve())) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 每个请求预约到不同的时刻，总等待约为 (n-1) * n / 2 个间隔
+    assert sorted(round(delay * 100) for delay in delays) == list(range(20))
+
+
+def test_rate_limited_pauses_every_caller():
+    limiter = TokenBucketRateLimiter(requests_per_second=1000, burst=10)
+    limiter.on_rate_limited(0.5)
+    assert limiter._reserve() >= 0.49
+    assert limiter.stats()["rate_limited_responses"] == 1
+
+
+def test_shared_limiter_is_reconfigured(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_shared_limiter", None)
+    limiter = get_shared_rate_limiter(5, 2)
+    assert get_shared_rate_limiter(8) is limiter
+    assert (limiter.requests_per_second, limiter.burst) == (8.0, 2)
+
+
+def test_throttled_clients_retry_429_after_pausing_the_bucket(monkeypatch):
+    notion = FakeNotion().install(monkeypatch)
+    limiter = TokenBucketRateLimiter(requests_per_second=1000, burst=10)
+    notion.fail("POST", "databases/db/query", api_error(429, "rate_limited", headers={"Retry-After": "0"}))
+    assert ThrottledClient(limiter, auth="token").databases.query(database_id="db")["results"] == []
+    notion.fail("POST", "databases/db/query", api_error(429, "rate_limited", headers={"Retry-After": "0"}))
+
+    async def query():
+        client = ThrottledAsyncClient(limiter, auth="token")
+        try:
+            return await client.databases.query(database_id="db")
+        finally:
+            await client.aclose()
+    assert asyncio.run(query())["results"] == []
+    assert limiter.stats()["rate_limited_responses"] == 2
+    assert limiter.stats()["requests"] == 4
+
+
+def test_throttled_client_gives_up_after_max_retries(monkeypatch):
+    notion = FakeNotion().install(monkeypatch)
+    for _ in range(3):
+        notion.fail("POST", "databases/db/query", api_error(429, "rate_limited", headers={"Retry-After": "0"}))
+    client = ThrottledClient(TokenBucketRateLimiter(1000, 10), max_rate_limit_retries=2, auth="token")
+    with pytest.raises(Exception) as info:
+        client.databases.query(database_id="db")
+    assert info.value.status == 429
@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+import pytest
+from notion_client.errors import APIResponseError, HTTPResponseError, RequestTimeoutError
+
+from core.client.retry_policy import RetryPolicy
+
+
+def _response(status):
+    return httpx.Response(status, request=httpx.Request("POST", "https://api.notion.com/v1/pages"))
+
+
+def _api_error(status, code):
+    return APIResponseError(_response(status), "error", code)
+
+
+@pytest.mark.parametrize("error, retryable, ambiguous", [
+    (RequestTimeoutError(), True, True),
+    (_api_error(429, "rate_limited"), False, False),    # 429 只由 ThrottledClient 重发
+    (_api_error(409, "conflict_error"), True, False),
+    (_api_error(503, "service_unavailable"), True, True),
+    (_api_error(400, "validation_error"), False, False),
+    (_api_error(404, "object_not_found"), False, False),
+    (HTTPResponseError(_response(429)), False, False),
+    (HTTPResponseError(_response(502)), True, True),
+    (HTTPResponseError(_response(400)), False, False),
+    (ValueError("bug"), False, False),
+])
+def test_error_classification(error, retryable, ambiguous):
+    assert RetryPolicy.is_retryable(error) is retryable
+    assert RetryPolicy.is_ambiguous(error) is ambiguous
+
+
+def test_from_config_reads_settings_and_clamps():
+    policy = RetryPolicy.from_config({"retry_max_retries": -1, "retry_base_delay": 2, "retry_max_delay": 1})
+    assert policy.max_retries == 0
+    assert policy.base_delay == 2.0
+    # max_delay 不小于 base_delay
+    assert policy.max_delay == 2.0
+
+
+def test_backoff_is_capped():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    for attempt in range(10):
+        assert 0 <= policy.backoff(attempt) <= min(5.0, 2 ** attempt)
+
+
+def _flaky(errors, result="ok"):
+    """依次抛出 errors 中的异常，之后返回 result"""
+    calls = []
+
+    def function(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return function, calls
+
+
+def test_call_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    function, calls = _flaky([RequestTimeoutError(), HTTPResponseError(_response(503))])
+    counter = {}
+    assert RetryPolicy(max_retries=3).call(function, counter, page_id="p") == "ok"
+    assert calls == [{"page_id": "p"}] * 3
+    assert counter == {"retries": 2}
+
+
+def test_call_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    function, calls = _flaky([RequestTimeoutError()] * 5)
+    with pytest.raises(RequestTimeoutError):
+        RetryPolicy(max_retries=2).call(function)
+    assert len(calls) == 3
+
+
+def test_call_does_not_retry_client_errors(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    function, calls = _flaky([_api_error(400, "validation_error")])
+    with pytest.raises(APIResponseError):
+        RetryPolicy().call(function)
+    assert len(calls) == 1
+
+
+def test_call_async_retries(monkeypatch):
+    async def no_sleep(seconds):
+        pass
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+    errors = [_api_error(409, "conflict_error")]
+    calls = []
+
+    async def function(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    counter = {}
+    assert asyncio.run(RetryPolicy().call_async(function, counter)) == "ok"
+    assert len(calls) == 2
+    assert counter == {"retries": 1}
+
+
+def test_call_leaves_rate_limits_to_the_throttled_client(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    function, calls = _flaky([_api_error(429, "rate_limited")])
+    with pytest.raises(APIResponseError):
+        RetryPolicy(max_retries=3).call(function)
+    assert len(calls) == 1
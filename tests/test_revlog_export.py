@@ -0,0 +1,53 @@
+import json
+
+from core.models import revlog_export
+from core.models.revlog_export import RevlogExtractor, revlog_operations
+from fake_collection import FakeCollection
+
+
+def _collection():
+    col = FakeCollection()
+    for nid in (1, 2, 3):
+        col.insert_note(nid, mod=0, cards=[(nid * 10, 0)])
+    # 复习记录按 id 交错分布在三条笔记上
+    for revlog_id in range(1000, 1012):
+        col.insert_revlog(revlog_id, (revlog_id % 3 + 1) * 10, ivl=revlog_id - 1000)
+    return col
+
+
+def test_note_chunks_and_latest_id():
+    extractor = RevlogExtractor(_collection(), [3, 1, 2, 1], chunk_size=2)
+    assert extractor.latest_id() == 1011
+    assert extractor.note_chunks() == [[1, 2], [3]]
+    assert extractor.note_chunks(after_nid=1) == [[2, 3]]
+    assert RevlogExtractor(FakeCollection(), [1]).latest_id() is None
+
+
+def test_read_chunk_reads_selected_notes_within_range():
+    extractor = RevlogExtractor(_collection(), [1, 2], chunk_size=5)
+    rows = extractor.read_chunk([1, 2], 1000, 1009)
+    # 按 (笔记id, revlog id) 排序，范围为 (after_id, upto_id]
+    assert [(row[0], row[1]) for row in rows] == [(1, 1002), (1, 1005), (1, 1008), (2, 1003), (2, 1006), (2, 1009)]
+    assert extractor.read_chunk([1], 1008, 1011) == [[1, 1011, 10, 3, 11, 0, 2500, 5000, 1]]
+    assert extractor.read_chunk([3], 1011, 1011) == []
+
+
+def test_revlog_operations_group_rows_per_note(monkeypatch):
+    monkeypatch.setattr(revlog_export, "MAX_ROWS_PER_PAGE", 2)
+    rows = [(1, 100, 10, 3, 1, 0, 2500, 5000, 1), (2, 101, 20, 3, 1, 0, 2500, 5000, 1),
+            (1, 102, 10, 1, 0, 1, 2300, 7000, 1), (1, 103, 10, 3, 2, 0, 2300, 4000, 1)]
+    operations = revlog_operations(rows)
+    assert [operation["duplicate_key"] for operation in operations] == ["1:100:102", "1:103:103", "2:101:101"]
+    first = operations[0]["data"]
+    assert first["Anki ID"] == {"number": 1} and first["Reviews"] == {"number": 2}
+    assert json.loads(first["Review Log"]["rich_text"][0]["text"]["content"]) == [
+        [100, 10, 3, 1, 0, 2500, 5000, 1], [102, 10, 1, 0, 1, 2300, 7000, 1]]
+    assert operations[0]["duplicate_check"] == {"filter": {"property": "Revlog Key", "rich_text": {"equals": "1:100:102"}}}
+
+
+def test_revlog_keys_do_not_depend_on_chunk_size():
+    def keys(chunk_size):
+        extractor = RevlogExtractor(_collection(), [1, 2, 3], chunk_size=chunk_size)
+        return [operation["duplicate_key"] for chunk in extractor.note_chunks()
+                for operation in revlog_operations(extractor.read_chunk(chunk, 0, 1011))]
+    assert keys(1) == keys(2) == keys(3) == ["1:1002:1011", "2:1000:1009", "3:1001:1010"]
@@ -0,0 +1,44 @@
+import pytest
+
+from core.models.schema_planner import SchemaPlanner
+from fake_collection import FakeCollection
+
+
+@pytest.fixture
+def col(monkeypatch):
+    monkeypatch.setattr(SchemaPlanner, "_expected_types", {})
+    col = FakeCollection()
+    basic = col.models.add("Basic", ["Front", "Back"])
+    vocab = col.models.add("Vocabulary", ["Word", "Tags", "notion正文"])
+    col.models.add("Unused", ["Unused"])
+    col.insert_note(1, mod=0, mid=basic["id"])
+    col.insert_note(2, mod=0, mid=basic["id"])
+    col.insert_note(3, mod=0, mid=vocab["id"], fields=("w", "", ""))
+    return col
+
+
+def test_required_fields_come_from_involved_note_types(col):
+    planner = SchemaPlanner(col)
+    assert planner.required_fields([1, 2]) == {"Front", "Back"}
+    assert planner.required_fields([1, 3, 404]) == {"Front", "Back", "Word", "Tags", "notion正文"}
+    assert planner.required_fields([]) == set()
+    # 与模板字段同名的元数据字段使用元数据的属性类型
+    assert planner.note_type_property_types(2)["Tags"] == "multi_select"
+
+
+def test_property_types_are_cached_until_note_type_changes(col):
+    planner = SchemaPlanner(col)
+    assert planner.note_type_property_types(1) == {"Front": "rich_text", "Back": "rich_text"}
+    model = col.models.get(1)
+    model["flds"].append({"name": "Extra"})
+    assert "Extra" not in planner.note_type_property_types(1)
+    model["mod"] += 1
+    assert "Extra" in planner.note_type_property_types(1)
+
+
+def test_ids_are_inlined_instead_of_bound(col):
+    queries = []
+    col.db.list = lambda sql, *args: queries.append((sql, args)) or []
+    SchemaPlanner(col).required_fields(range(40000))
+    ((sql, args),) = queries
+    assert args == () and sql.count(",") == 39999
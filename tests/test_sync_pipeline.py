@@ -0,0 +1,46 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.operations.sync_pipeline import aconvert_each, aiter_slices, convert_each
+
+
+def _convert(snapshot):
+    if snapshot.note_id == 2:
+        raise ValueError("bad note")
+    return snapshot.note_id * 10
+
+
+def test_convert_each_skips_failures():
+    failures = []
+    converted = list(convert_each((SimpleNamespace(note_id=i) for i in range(1, 4)), _convert, failures.append))
+    assert converted == [10, 30]
+    assert [failure["operation"]["note_id"] for failure in failures] == [2]
+    assert failures[0]["error"] == "bad note"
+
+
+def test_aconvert_each_is_lazy():
+    pulled = []
+
+    async def payloads():
+        for i in range(1, 4):
+            pulled.append(i)
+            yield SimpleNamespace(note_id=i)
+
+    async def first():
+        async for converted in aconvert_each(payloads(), _convert, lambda failure: None):
+            return converted
+    assert asyncio.run(first()) == 10
+    assert pulled == [1]
+
+
+def test_aiter_slices_loads_one_slice_at_a_time_and_stops_on_cancel():
+    loaded = []
+
+    def load(chunk):
+        loaded.append(chunk)
+        return [item * 2 for item in chunk]
+
+    async def collect():
+        return [item async for item in aiter_slices([[1, 2], [3], [4]], load, is_cancelled=lambda: len(loaded) >= 2)]
+    assert asyncio.run(collect()) == [2, 4, 6]
+    assert loaded == [[1, 2], [3]]
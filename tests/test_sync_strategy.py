@@ -0,0 +1,340 @@
+import importlib
+import json
+import types
+
+import pytest
+
+from core.models.watermark import WatermarkStore
+from fake_collection import FakeCollection
+from fake_notion import FakeNotion, api_error, text_value
+
+
+class FakeConfig(dict):
+    def __init__(self, **values):
+        # 共享限速器按最新配置调整速率，测试中不限速
+        super().__init__(notion_requests_per_second=1000, notion_burst=100, **values)
+
+    def reload_config(self):
+        pass
+
+
+@pytest.fixture
+def sync_strategy(fake_aqt, monkeypatch, tmp_path):
+    module = importlib.import_module("core.operations.sync_strategy")
+    col = FakeCollection()
+    module.resets = []
+    monkeypatch.setattr(module, "mw", types.SimpleNamespace(col=col, reset=lambda: module.resets.append(True)))
+
+    class TmpWatermarkStore(WatermarkStore):
+        def __init__(self, path=str(tmp_path / "page_map.sqlite3")):
+            super().__init__(path)
+    monkeypatch.setattr(module, "WatermarkStore", TmpWatermarkStore)
+    module.col = col
+    return module
+
+
+def _anki_to_notion(sync_strategy, **config):
+    config = FakeConfig(notion_database_url="https://www.notion.so/0123456789abcdef0123456789abcdef",
+                        anki_query_string="deck:current", **config)
+    return sync_strategy.AnkiToNotionStrategy(config)
+
+
+def test_full_sync_without_watermark(sync_strategy):
+    sync_strategy.col.insert_note(1, mod=100)
+    sync_strategy.col.insert_note(2, mod=200)
+    strategy = _anki_to_notion(sync_strategy, incremental_sync=True)
+    assert list(strategy.get_ids_from_source()) == [1, 2]
+
+
+def test_incremental_sync_selects_notes_or_cards_changed_since_watermark(sync_strategy):
+    col = sync_strategy.col
+    col.insert_note(1, mod=100, cards=[(11, 300)])    # 复习更新了卡片的 mod
+    col.insert_note(2, mod=100, cards=[(21, 100)])
+    col.insert_note(3, mod=260, cards=[(31, 100)])
+    strategy = _anki_to_notion(sync_strategy, incremental_sync=True)
+    strategy.get_ids_from_source()
+    strategy.sync_started_at = 250
+    strategy.advance_watermark({"success": [], "failed": []})
+    assert list(strategy.get_ids_from_source()) == [1, 3]
+    # 关闭增量同步时回到全量
+    assert list(_anki_to_notion(sync_strategy).get_ids_from_source()) == [1, 2, 3]
+
+
+def test_sync_start_is_taken_before_the_note_query(sync_strategy, monkeypatch):
+    col = sync_strategy.col
+    strategy = _anki_to_notion(sync_strategy, incremental_sync=True)
+    started_at_query = []
+    find_notes = col.find_notes
+    monkeypatch.setattr(col, "find_notes", lambda query: started_at_query.append(
+        getattr(strategy, "sync_started_at", None)) or find_notes(query))
+    strategy.get_ids_from_source()
+    assert started_at_query == [strategy.sync_started_at] and strategy.sync_started_at is not None
+
+
+def test_watermark_only_advances_after_complete_success(sync_strategy):
+    strategy = _anki_to_notion(sync_strategy, incremental_sync=True)
+    strategy.get_ids_from_source()
+    store = sync_strategy.WatermarkStore()
+    for result in ({"cancelled": True}, {"failed": [{"error": "x"}]}):
+        strategy.advance_watermark(result)
+        assert store.get(strategy.watermark_scope()) is None
+    strategy.advance_watermark({"success": [], "failed": []})
+    assert store.get(strategy.watermark_scope()) == strategy.sync_started_at
+    store.close()
+
+
+def _notion_page(fake, front, tags=("readyMove",), note_type="Basic", anki_id=None, edited="2026-01-01T00:00:00.000Z"):
+    properties = {
+        "Note Type": {"type": "select", "select": {"name": note_type}},
+        "Front": {"type": "rich_text", "rich_text": [{"plain_text": front}]},
+        "Back": {"type": "rich_text", "rich_text": [{"plain_text": front + " back"}]},
+        "Tags": {"type": "multi_select", "multi_select": [{"name": tag} for tag in tags]},
+    }
+    if anki_id:
+        properties["Anki ID"] = {"type": "rich_text", "rich_text": [{"plain_text": str(anki_id)}]}
+    return fake.add_page(properties, last_edited_time=edited)
+
+
+def _pull(strategy):
+    result = strategy.update_database_of_target(strategy.get_ids_from_source())
+    strategy.advance_watermark(result)
+    return result
+
+
+@pytest.fixture
+def notion_to_anki(sync_strategy, monkeypatch):
+    fake = FakeNotion().install(monkeypatch)
+    sync_strategy.col.models.add("Basic", ["Front", "Back"])
+
+    def make(mode="keep"):
+        return sync_strategy.NotionToAnkiStrategy(FakeConfig(
+            notion_database_url="https://www.notion.so/0123456789abcdef0123456789abcdef",
+            duplicate_handling_way=mode, retry_max_retries=0))
+    return fake, make
+
+
+def test_notion_pull_imports_tagged_pages_and_resumes_after_failure(sync_strategy, notion_to_anki):
+    fake, make = notion_to_anki
+    col = sync_strategy.col
+    _notion_page(fake, "one", tags=("readyMove", "vocab"))
+    _notion_page(fake, "untagged", tags=("vocab",))
+    _notion_page(fake, "two", note_type="Cloze")    # 笔记类型不存在：导入失败
+    result = _pull(make())
+    assert [item["action"] for item in result["success"]] == ["create"]
+    assert len(result["failed"]) == 1
+    note = col.get_note(result["success"][0]["anki_note_id"])
+    assert (note["Front"], note.tags) == ("one", ["vocab"])
+
+    # 同一分钟内已导入的页面不会重复导入，失败的页面在下次拉取时重试
+    col.models.add("Cloze", ["Front", "Back"])
+    result = _pull(make())
+    assert [note_id for note_id, _ in col.added] == [1000, 1001]
+    assert [item["action"] for item in result["success"]] == ["create"]
+    assert _pull(make()) == {"success": [], "failed": [], "cancelled": False}
+
+
+def test_notion_pull_in_slices_hands_collection_work_to_main(sync_strategy, notion_to_anki):
+    fake, make = notion_to_anki
+    for front in ("one", "two", "three"):
+        _notion_page(fake, front)
+    strategy = make()
+    strategy.config_manager["sync_slice_size"] = 2
+    on_main, progress = [], []
+
+    def call_on_main(function, *args):
+        on_main.append(function.__name__)
+        return function(*args)
+
+    result = strategy.execute_in_slices(strategy.get_ids_from_source(), call_on_main,
+                                        progress_callback=lambda done, total: progress.append((done, total)))
+    assert on_main == ["ensure_database_structure_of_target", "begin_import", "import_slice", "import_slice", "end_import"]
+    assert progress == [(2, 3), (3, 3)]
+    assert len(result["success"]) == 3 and not result["cancelled"]
+    # 两个分片的写入合并为一个撤销点，结束后刷新界面
+    assert sync_strategy.col.undo_entries == ["从 Notion 导入"]
+    assert sync_strategy.col.merged_undo == [1, 1]
+    assert sync_strategy.resets == [True]
+
+
+def test_notion_pull_stops_between_slices_when_cancelled(sync_strategy, notion_to_anki):
+    fake, make = notion_to_anki
+    for front in ("one", "two", "three"):
+        _notion_page(fake, front)
+    strategy = make()
+    strategy.config_manager["sync_slice_size"] = 2
+    progress = []
+    result = strategy.execute_in_slices(strategy.get_ids_from_source(), lambda function, *args: function(*args),
+                                        progress_callback=lambda done, total: progress.append(done),
+                                        is_cancelled=lambda: bool(progress))
+    assert result["cancelled"] and len(result["success"]) == 2
+
+
+def test_notion_pull_fetches_page_bodies_per_slice(sync_strategy, notion_to_anki):
+    fake, make = notion_to_anki
+    for front in ("one", "two", "three"):
+        _notion_page(fake, front)
+    strategy = make()
+    strategy.config_manager.update(sync_slice_size=2, retain_notion_children=True)
+    fetched = []
+
+    def is_cancelled():
+        fetched.append(fake.count("GET", r"blocks/.*/children"))
+        return len(fetched) > 2
+
+    result = strategy.execute_in_slices(strategy.get_ids_from_source(), lambda function, *args: function(*args),
+                                        is_cancelled=is_cancelled)
+    # 第一个分片导入前只读取了两个页面的正文；取消后第三个页面的正文不再读取
+    assert fetched == [0, 2, 2]
+    assert result["cancelled"] and len(result["success"]) == 2
+    assert sync_strategy.resets == [True]
+
+
+def test_notion_pull_archives_source_pages_only_when_enabled(sync_strategy, notion_to_anki):
+    fake, make = notion_to_anki
+    first = _notion_page(fake, "one")
+    _pull(make())
+    assert fake.count("PATCH", r"pages/.*") == 0 and len(fake.live_pages()) == 1
+
+    second = _notion_page(fake, "two", edited="2026-01-02T00:00:00.000Z")
+    strategy = make()
+    strategy.config_manager["archive_notion_source_pages"] = True
+    result = _pull(strategy)
+    assert result["archive_failed"] == []
+    assert [page["id"] for page in fake.live_pages()] == [first]
+    assert fake.pages[second]["archived"]
+
+
+def test_notion_pull_applies_duplicate_handling(sync_strategy, notion_to_anki):
+    fake, make = notion_to_anki
+    col = sync_strategy.col
+    col.insert_note(1, mod=0, fields=("same", "old back"))
+    _notion_page(fake, "same")
+    assert _pull(make("keep"))["success"][0]["action"] == "skip"
+
+    _notion_page(fake, "same", edited="2026-01-02T00:00:00.000Z")
+    result = _pull(make("overwrite"))
+    assert [(item["action"], item["anki_note_id"]) for item in result["success"]] == [("update", 1)]
+    assert col.get_note(1)["Back"] == "same back"
+
+    _notion_page(fake, "same", edited="2026-01-03T00:00:00.000Z")
+    assert _pull(make("copy"))["success"][0]["action"] == "create"
+
+
+def test_notion_pull_renders_page_body_into_body_field(sync_strategy, notion_to_anki):
+    fake, make = notion_to_anki
+    sync_strategy.col.models.add("Body", ["Front", "notion正文"])
+    page = _notion_page(fake, "with body", note_type="Body")
+    fake.children[page] = [{"object": "block", "type": "paragraph",
+                            "paragraph": {"rich_text": [{"text": {"content": "x"}, "annotations": {"bold": True}}]}}]
+    strategy = make()
+    strategy.config_manager["retain_notion_children"] = True
+    result = _pull(strategy)
+    note = sync_strategy.col.get_note(result["success"][0]["anki_note_id"])
+    assert note["notion正文"] == "<div><b>x</b></div>"
+
+
+def _collection_with_notes(sync_strategy):
+    col = sync_strategy.col
+    model = col.models.add("Basic", ["Front", "Back"])
+    for note_id in (1700000000000, 1700000000001):
+        col.insert_note(note_id, mod=1710000000, mid=model["id"], fields=(f"front {note_id}", "back"),
+                        cards=[{"id": note_id * 10, "type": 0, "queue": 0}, {"id": note_id * 10 + 1, "type": 0, "queue": -1}])
+    col.sched.day_cutoff = 1710000000
+    return col
+
+
+def test_anki_to_notion_uploads_notes(sync_strategy, monkeypatch):
+    fake = FakeNotion().install(monkeypatch)
+    _collection_with_notes(sync_strategy)
+    strategy = _anki_to_notion(sync_strategy, page_map=False, conversion_cache_size=0)
+    note_ids = strategy.get_ids_from_source()
+    strategy.ensure_database_structure_of_target(note_ids)
+    result = strategy.update_database_of_target(note_ids)
+    assert [item["action"] for item in result["success"]] == ["create", "create"]
+    assert sorted(text_value(page["properties"]["Front"]) for page in fake.live_pages()) == [
+        "front 1700000000000", "front 1700000000001"]
+    assert fake.schema["Front"]["type"] == "rich_text"
+
+
+def test_anki_to_notion_exports_all_cards_when_configured(sync_strategy, monkeypatch):
+    fake = FakeNotion().install(monkeypatch)
+    _collection_with_notes(sync_strategy)
+    strategy = _anki_to_notion(sync_strategy, page_map=False, conversion_cache_size=0,
+                               card_scheduling_export="all_cards")
+    note_ids = strategy.get_ids_from_source()
+    strategy.ensure_database_structure_of_target(note_ids)
+    strategy.update_database_of_target(note_ids)
+    assert fake.schema["Card Scheduling"]["type"] == "rich_text"
+    for page in fake.live_pages():
+        assert [card["queue"] for card in json.loads(text_value(page["properties"]["Card Scheduling"]))] == [0, -1]
+
+
+def _revlog_keys(fake):
+    return sorted(text_value(page["properties"]["Revlog Key"]) for page in fake.live_pages())
+
+
+def test_revlog_export_resumes_partially_written_chunk(sync_strategy, monkeypatch):
+    fake = FakeNotion().install(monkeypatch)
+    monkeypatch.setattr(importlib.import_module("core.models.revlog_export"), "MAX_ROWS_PER_PAGE", 1)
+    col = sync_strategy.col
+    for nid in (1, 2, 3):
+        col.insert_note(nid, mod=0, cards=[(nid * 10, 0)])
+    for revlog_id in range(1000, 1009):
+        col.insert_revlog(revlog_id, (revlog_id % 3 + 1) * 10)
+
+    def strategy(chunk_size):
+        return _anki_to_notion(sync_strategy, revlog_chunk_size=chunk_size, retry_max_retries=0,
+                               revlog_database_url="https://www.notion.so/fedcba9876543210fedcba9876543210")
+    expected = sorted(f"{revlog_id % 3 + 1}:{revlog_id}:{revlog_id}" for revlog_id in range(1000, 1009))
+
+    # 第二块（笔记 2）写入了一部分后失败
+    calls = {"pages": 0}
+    original = fake.handle
+
+    def fail_fifth_create(path, method, query, body):
+        if path == "pages" and method == "POST":
+            calls["pages"] += 1
+            if calls["pages"] == 5:
+                raise api_error(400, "validation_error")
+        return original(path, method, query, body)
+    monkeypatch.setattr(fake, "handle", fail_fifth_create)
+    summary = strategy(1).export_revlog([1, 2, 3])
+    assert (summary["rows"], summary["failed"]) == (3, 1)
+    assert len(_revlog_keys(fake)) == 5
+
+    # 换一个块大小续传：已部分写入的笔记检查重复，不会重复创建
+    summary = strategy(2).export_revlog([1, 2, 3])
+    assert (summary["rows"], summary["pages"], summary["failed"]) == (6, 4, 0)
+    assert _revlog_keys(fake) == expected
+    assert strategy(2).export_revlog([1, 2, 3])["rows"] == 0
+
+    # 之后只导出新的复习记录
+    col.insert_revlog(1009, 20)
+    assert strategy(2).export_revlog([1, 2, 3])["rows"] == 1
+    assert "2:1009:1009" in _revlog_keys(fake)
+
+
+def test_revlog_export_resumes_with_the_notes_of_the_open_range(sync_strategy, monkeypatch):
+    fake = FakeNotion().install(monkeypatch)
+    col = sync_strategy.col
+    for nid in (1, 2, 3, 4):
+        col.insert_note(nid, mod=0, cards=[(nid * 10, 0)])
+        col.insert_revlog(1000 + nid, nid * 10)
+    strategy = _anki_to_notion(sync_strategy, revlog_chunk_size=1, retry_max_retries=0,
+                               revlog_database_url="https://www.notion.so/fedcba9876543210fedcba9876543210")
+
+    # 写入笔记 2 的页面时失败
+    original = fake.handle
+
+    def fail_second_create(path, method, query, body):
+        if path == "pages" and method == "POST" and len(fake.live_pages()) == 1:
+            raise api_error(400, "validation_error")
+        return original(path, method, query, body)
+    monkeypatch.setattr(fake, "handle", fail_second_create)
+    assert strategy.export_revlog([1, 2, 3])["failed"] == 1
+    monkeypatch.setattr(fake, "handle", original)
+
+    # 增量同步下次只选中了笔记 3、4：笔记 2 仍在未完成的范围内，笔记 4 并入范围
+    assert strategy.export_revlog([3, 4])["failed"] == 0
+    assert _revlog_keys(fake) == [f"{nid}:{1000 + nid}:{1000 + nid}" for nid in (1, 2, 3, 4)]
+    assert strategy.export_revlog([3, 4])["rows"] == 0
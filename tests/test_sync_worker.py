@@ -0,0 +1,57 @@
+import queue
+import threading
+
+import pytest
+
+from datetime import timezone
+
+from core.models.note_snapshot import NoteSnapshot
+from core.operations import sync_worker
+from fake_notion import FakeNotion
+
+
+def _snapshot(note_id, front, first_field="Front"):
+    return NoteSnapshot(1700000000000 + note_id, 1710000000, timezone.utc, "Deck", "", "Basic", first_field,
+                        0, None, 0, 0, 0, 0, False, None, None, None, ("Front",), (front,), "")
+
+
+@pytest.fixture
+def notion(monkeypatch):
+    return FakeNotion().install(monkeypatch)
+
+
+def _run_worker(*tasks):
+    task_queue, result_queue = queue.Queue(), queue.Queue()
+    for task in (*tasks, (sync_worker.MSG_DONE, None)):
+        task_queue.put(task)
+    settings = {"notion_token": "token", "database_id": "db", "duplicate_handling_way": "keep",
+                "notion_requests_per_second": 1000, "notion_burst": 100, "page_map": False,
+                "conversion_cache_persist": False}
+    sync_worker.worker_main(settings, task_queue, result_queue, threading.Event())
+    messages = []
+    while not result_queue.empty():
+        messages.append(result_queue.get())
+    return messages
+
+
+def test_worker_main_uploads_and_reports_compact_results(notion):
+    messages = _run_worker(
+        (sync_worker.MSG_SCHEMA, {"fields": ["Front"], "note_ids": [1, 2, 3]}),
+        # 首字段不存在的笔记转换失败
+        (sync_worker.MSG_NOTES, NoteSnapshot.pack([_snapshot(1, "a"), _snapshot(2, "x", first_field="Missing")])),
+        (sync_worker.MSG_NOTES, NoteSnapshot.pack([_snapshot(3, "b")])),
+    )
+    assert messages[-1][0] == sync_worker.MSG_FINISHED
+    results = {body["operation"]["note_id"] - 1700000000000: body for kind, body in messages[:-1]}
+    # 转换失败的笔记单独记为失败，其它笔记照常上传
+    assert "error" in results[2]
+    # 回传给主进程的结果不含完整的请求数据与响应
+    assert results[1]["operation"] == {"note_id": 1700000000001} and "response" not in results[1]
+    assert results[3]["action"] == "create"
+    assert len(notion.live_pages()) == 2
+    assert notion.schema["Front"]["type"] == "rich_text"
+
+
+def test_worker_main_reports_fatal_errors(notion):
+    messages = _run_worker(("unknown", None))
+    assert messages[-1][0] == sync_worker.MSG_ERROR
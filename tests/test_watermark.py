@@ -0,0 +1,41 @@
+import pytest
+
+from core.models.watermark import WatermarkStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WatermarkStore(str(tmp_path / "page_map.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_scope_joins_parts():
+    assert WatermarkStore.scope("anki_to_notion", "db", 3) == "anki_to_notion|db|3"
+
+
+def test_get_returns_default_when_unset(store):
+    assert store.get("scope") is None
+    assert store.get("scope", 0) == 0
+
+
+def test_set_overwrites_and_reset_removes(store):
+    store.set("scope", 100)
+    store.set("scope", 200)
+    assert store.get("scope") == 200
+    store.reset("scope")
+    assert store.get("scope", 0) == 0
+
+
+def test_values_persist_and_share_file_with_page_map(tmp_path):
+    from core.models.page_map import PageMap
+    path = str(tmp_path / "page_map.sqlite3")
+    store = WatermarkStore(path)
+    store.set("scope", "2024-01-01T00:00:00.000Z")
+    store.close()
+    page_map = PageMap(path)
+    page_map.record(1, "db", "page-1")
+    page_map.close()
+    reopened = WatermarkStore(path)
+    assert reopened.get("scope") == "2024-01-01T00:00:00.000Z"
+    reopened.close()
@@ -0,0 +1,55 @@
+import multiprocessing.spawn
+import os
+import sys
+
+import pytest
+
+from core.operations.worker_launcher import start_process
+
+
+class FakeProcess:
+    def __init__(self, error=None):
+        self.error = error
+        self.main = None
+
+    def start(self):
+        self.main = sys.modules["__main__"]
+        if self.error:
+            raise self.error
+
+
+def test_start_process_hides_main_while_starting():
+    main = sys.modules["__main__"]
+    process = FakeProcess()
+    start_process(process)
+    # 启动期间的 __main__ 没有 __spec__ 与 __file__，spawn 子进程不会重新导入它
+    assert process.main is not main
+    assert getattr(process.main, "__spec__", None) is None and not hasattr(process.main, "__file__")
+    assert sys.modules["__main__"] is main
+
+
+def test_start_process_restores_main_when_start_fails():
+    main = sys.modules["__main__"]
+    with pytest.raises(OSError):
+        start_process(FakeProcess(OSError("spawn failed")))
+    assert sys.modules["__main__"] is main
+
+
+class ExecutableProbe(FakeProcess):
+    def start(self):
+        self.executable = multiprocessing.spawn.get_executable()
+        super().start()
+
+
+@pytest.mark.parametrize("error", [None, OSError("spawn failed")])
+def test_start_process_sets_executable_only_while_starting(error):
+    previous = multiprocessing.spawn.get_executable()
+    process = ExecutableProbe(error)
+    if error:
+        with pytest.raises(OSError):
+            start_process(process, "/opt/python3/bin/python3")
+    else:
+        start_process(process, "/opt/python3/bin/python3")
+    assert os.fsdecode(process.executable) == "/opt/python3/bin/python3"
+    # set_executable 修改的是 multiprocessing 的全局设置，启动后恢复原值
+    assert multiprocessing.spawn.get_executable() == previous